@@ -1,10 +1,11 @@
+import time
+import threading
+from collections import OrderedDict
 import streamlit as st
 import pandas as pd
-import plotly.graph_objects as go
 from src.utils import load_config, save_config
-from src.fetcher import fetch_stock_data
-from src.indicators import calculate_indicators
-from src.scorer import evaluate_stock
+from src.warmstart import load_warm_start, load_warm_tails, save_warm_start
+from src.profiling import profiler
 
 # ページ設定
 # ページ設定
@@ -156,6 +157,20 @@ else: # 短期足 (1m, 5m etc)
 selected_period_label = st.sidebar.selectbox("分析期間 (Period)", list(period_map.keys()), index=period_index)
 period = period_map[selected_period_label]
 
+# マルチタイムフレーム分析（いちばん細かい足を1回だけ取得し、上位の足はそこから作る）
+multi_timeframe = st.sidebar.checkbox("マルチタイムフレーム分析")
+mtf_labels = []
+if multi_timeframe:
+    mtf_labels = st.sidebar.multiselect("組み合わせる時間足", list(interval_options.keys()),
+                                        default=["15分", "1時間", "1日"])
+
+# スクリーナー（main_cli.py --universe で作った全銘柄の索引を条件で絞り込む）
+screen_expr = st.sidebar.text_input("スクリーナー条件", placeholder="GoldenCross and MACDBullish and Volume > 1e6",
+                                    help="列: Close, Change, Volume, RSI, MASpread, MACDHist, GoldenCross, MACDBullish, Score, Signal")
+
+# 診断情報（処理時間・キャッシュの当たり外れ）の表示
+show_diagnostics = st.sidebar.checkbox("診断情報を表示")
+
 # リアルタイム更新の設定
 st.sidebar.markdown("---")
 st.sidebar.subheader("🕒 リアルタイム更新")
@@ -163,55 +178,213 @@ auto_refresh = st.sidebar.checkbox("自動更新を有効にする")
 refresh_interval = st.sidebar.slider("更新間隔 (秒)", 10, 300, 60)
 
 if auto_refresh:
-    import time
     from streamlit_autorefresh import st_autorefresh
     # ページを一定間隔でリロードさせる
     st_autorefresh(interval=refresh_interval * 1000, key="stock_refresh")
 
+# 前回の分析結果（保存済みの JSON を読むだけ）を先に表示し、最新の結果が出たら消す
+warm_placeholder = st.empty()
+warm = load_warm_start(selected_tickers, interval, period, settings)
+if warm is not None:
+    with warm_placeholder.container():
+        st.subheader("📊 前回の分析結果")
+        saved_at = time.strftime("%m/%d %H:%M", time.localtime(warm["saved_at"]))
+        st.caption(f"{saved_at} 時点の結果です。「分析開始」で最新の結果に更新します")
+        warm_df = pd.DataFrame(warm["ranking"]).rename(columns={"Reasons": "Trend"})
+        st.dataframe(warm_df[['Ticker', 'Name', 'Close', 'Score', 'Signal', 'Trend']], use_container_width=True)
+        if warm["tails"]:
+            tails = load_warm_tails(selected_tickers, interval, period, settings)
+            closes = pd.DataFrame({t: df['Close'].reset_index(drop=True) for t, df in tails.items()})
+            if not closes.empty:
+                st.caption("直近の値動き（最初のバー = 100）")
+                st.line_chart(closes / closes.bfill().iloc[0] * 100)
+
+# 分析・チャート用のモジュールは前回の結果を表示してから読み込む
+from src.analysis import analyze_timeframes, iter_analyze, ranking_frame, result_from_rows, TopRanking
+from src.scheduler import RefreshScheduler, load_snapshot
+from src.screener import ScreenerIndex
+from src.history import ResultHistory
+from src.scorer import render_reasons
+from src.downsample import chart_data, MAX_CHART_POINTS
+
+# 分析結果のキャッシュ（全セッションで共有）
+# 同じ (銘柄, 期間, 時間足, 設定) の結果は、バー1本分の時間が過ぎるまで再計算しない
+CACHE_SECONDS = {
+    "1m": 60,
+    "5m": 5 * 60,
+    "15m": 15 * 60,
+    "1h": 60 * 60,
+    "1d": 60 * 60,  # 日足も場中は値が動くので最大1時間
+}
+
+
+@st.cache_resource
+def get_scheduler():
+    """サーバープロセスに1つだけバックグラウンド更新スレッドを起動する（閲覧者数によらず取得は1回）"""
+    scheduler = RefreshScheduler()
+    scheduler.start()
+    return scheduler
+
+
+# 共有キャッシュに残す分析結果の数と、途中経過の表を描き直す最短の間隔（秒）
+RESULT_CACHE_ENTRIES = 32
+REDRAW_SECONDS = 0.5
+
+
+@st.cache_resource
+def get_result_cache():
+    """分析結果のキャッシュ（全セッションで共有）。古いものから捨てる"""
+    return {"lock": threading.Lock(), "results": OrderedDict()}
+
+
+def run_analysis(tickers, period, interval, settings, time_bucket, placeholder, record=True):
+    """
+    データ取得・指標計算・スコア計算をまとめて行い、結果をキャッシュする。
+    time_bucket は時間足ごとの区切り番号で、次の区切りになるとキャッシュが切り替わる。
+    キャッシュがない場合は、銘柄が届くたびに途中までのランキングを placeholder に表示する。
+    record=False の場合は履歴に追記しない（自動更新中はバックグラウンドの更新処理が記録する）。
+    """
+    cache = get_result_cache()
+    key = (tuple(tickers), period, interval, tuple(sorted(settings.items())), time_bucket)
+    with cache["lock"]:
+        if key in cache["results"]:
+            cache["results"].move_to_end(key)
+            profiler.count("result_cache_hits")
+            return cache["results"][key]
+    profiler.count("result_cache_misses")
+
+    ranking = TopRanking()
+    drawn_at = 0.0
+    for received, row in enumerate(iter_analyze(tickers, period, interval, settings, keep_data=True), 1):
+        ranking.push(row)
+        if time.monotonic() - drawn_at >= REDRAW_SECONDS:
+            with placeholder.container():
+                st.progress(received / len(tickers), text=f"受信済み {received} / {len(tickers)} 銘柄")
+                partial = pd.DataFrame(ranking.rows())
+                st.dataframe(partial[['Ticker', 'Name', 'Close', 'Score', 'Signal']], use_container_width=True)
+            drawn_at = time.monotonic()
+    placeholder.empty()
+
+    result = result_from_rows(ranking.rows(), settings, tickers)
+    # スキャン結果を履歴に追記し（前回との差分がアラートになる）、次回の起動時に表示する結果として保存する
+    rows = ranking_frame(result)
+    if record:
+        ResultHistory(interval, period, tickers, settings).append(rows)
+    save_warm_start(rows.to_dict("records"), tickers, interval, period, settings,
+                    tails={t: result["data"][t] for t in result["data"]})
+    with cache["lock"]:
+        cache["results"][key] = result
+        while len(cache["results"]) > RESULT_CACHE_ENTRIES:
+            cache["results"].popitem(last=False)
+    return result
+
+
+@st.cache_data(show_spinner=False, max_entries=RESULT_CACHE_ENTRIES)
+def run_timeframes(tickers, intervals, settings_items, time_bucket):
+    """複数の時間足のスコアと総合スコアを計算する（取得は最も細かい足の1回だけ）"""
+    result = analyze_timeframes(list(tickers), list(intervals), dict(settings_items))
+    return result["base"], result["scores"]
+
+
+# 表示するシグナル変化の件数と、スコア履歴を表示する日数
+ALERTS_SHOWN = 20
+HISTORY_DAYS = 30
+
+
+# チャートの1ページあたりの銘柄数と、最初から開いておく（上位の）銘柄数
+CHARTS_PER_PAGE = 10
+CHARTS_OPEN_BY_DEFAULT = 3
+
+
+@st.cache_resource(max_entries=256, show_spinner=False)
+def build_chart(ticker_display_name, interval, settings_items, bars, start, end, _df):
+    """
+    銘柄のチャートを作る。(銘柄, 時間足, 設定, バーの範囲, 表示期間) ごとにキャッシュし、
+    再実行時や他のセッションでは作り直さない。bars は (最初のバー, 最後のバー, 本数, 最終値)。
+    """
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    df = _df
+    settings = dict(settings_items)
+    ma_short = settings['ma_short']
+    ma_long = settings['ma_long']
+    macd_col = f"MACD_{settings['macd_fast']}_{settings['macd_slow']}_{settings['macd_signal']}"
+    signal_col = f"MACDs_{settings['macd_fast']}_{settings['macd_slow']}_{settings['macd_signal']}"
+    rsi_col = f"RSI_{settings['rsi_window']}"
+    candles, lines = chart_data(
+        df, [f'SMA_{ma_short}', f'SMA_{ma_long}', macd_col, signal_col, rsi_col], start, end)
+
+    # --- Plotly Multi-chart ---
+    # 3つのセクション (価格, MACD, RSI)
+    fig = make_subplots(rows=3, cols=1, shared_xaxes=True, 
+                       vertical_spacing=0.05, 
+                       row_heights=[0.5, 0.25, 0.25],
+                       subplot_titles=(f"{ticker_display_name} 価格 & 移動平均線", "MACD", "RSI"))
+
+    # 1. 価格チャート (Candlestick)
+    # 日本式の色設定 (陽線: 赤, 陰線: 青/緑系)
+    fig.add_trace(go.Candlestick(x=candles.index, open=candles['Open'], high=candles['High'], low=candles['Low'], close=candles['Close'],
+                               increasing_line_color='#e63946', decreasing_line_color='#457b9d',
+                               name="株価"), row=1, col=1)
+    
+    # 移動平均線
+    sma_short, sma_long = lines[f'SMA_{ma_short}'], lines[f'SMA_{ma_long}']
+    fig.add_trace(go.Scatter(x=sma_short.index, y=sma_short, line=dict(color='#ffb703', width=1.5), name=f'SMA {ma_short}'), row=1, col=1)
+    fig.add_trace(go.Scatter(x=sma_long.index, y=sma_long, line=dict(color='#219ebc', width=1.5), name=f'SMA {ma_long}'), row=1, col=1)
+
+    # 2. MACD
+    fig.add_trace(go.Scatter(x=lines[macd_col].index, y=lines[macd_col], line=dict(color='#fb8500', width=1), name="MACD"), row=2, col=1)
+    fig.add_trace(go.Scatter(x=lines[signal_col].index, y=lines[signal_col], line=dict(color='#8ecae6', width=1), name="Signal"), row=2, col=1)
+    # ゼロライン
+    fig.add_hline(y=0, line_dash="dash", line_color="gray", opacity=0.5, row=2, col=1)
+
+    # 3. RSI
+    fig.add_trace(go.Scatter(x=lines[rsi_col].index, y=lines[rsi_col], line=dict(color='#a2d2ff', width=1.5), name="RSI"), row=3, col=1)
+    # 境界線 (70/30)
+    fig.add_hline(y=70, line_dash="dash", line_color="#ff4d6d", row=3, col=1)
+    fig.add_hline(y=30, line_dash="dash", line_color="#00f5d4", row=3, col=1)
+
+    # レイアウト調整
+    fig.update_layout(height=800, 
+                    template="plotly_dark",
+                    xaxis_rangeslider_visible=True, # ズーム・移動がしやすくなるようスライダーを表示
+                    xaxis_rangeslider_thickness=0.05, # スライダーを細めにしてメインチャートを広く
+                    margin=dict(l=50, r=50, t=50, b=50),
+                    hovermode="x unified") # マウス位置の値をまとめて表示
+    
+    # スクロール（マウスホイール）でのズームを有効化
+    fig.update_xaxes(fixedrange=False)
+    fig.update_yaxes(fixedrange=False)
+    return fig
+
+
 if st.sidebar.button("分析開始"):
+    # 一度分析したら、他の操作で再実行されても結果を表示し続ける
+    st.session_state["analysis_requested"] = True
+
+if st.session_state.get("analysis_requested"):
     with st.spinner("データ取得・会社名を確認中..."):
-        # データ取得
-        res_tuple = fetch_stock_data(selected_tickers, period=period, interval=interval)
-        
-        # デバッグ用（エラー回避）
-        if isinstance(res_tuple, tuple):
-            if len(res_tuple) == 2:
-                data_map, name_map = res_tuple
-            else:
-                st.error(f"システムエラー: データの形式が正しくありません (想定2, 実際{len(res_tuple)})")
-                st.stop()
-        else:
-            data_map = res_tuple
-            name_map = {}
-        
-        results = []
-        
-        # 分析ループ
-        for ticker, df in data_map.items():
-            if df.empty:
-                continue
-            
-            # 指標計算
-            df = calculate_indicators(df, settings)
-            score, signal, reason = evaluate_stock(df, settings)
-            
-            results.append({
-                "Ticker": ticker,
-                "Name": name_map.get(ticker, ticker),
-                "Close": df['Close'].iloc[-1],
-                "Score": score,
-                "Signal": signal,
-                "Trend": reason
-            })
-            
-            # 詳細表示用のデータ保持
-            data_map[ticker] = df
+        result = None
+        if auto_refresh:
+            # 自動更新中はバックグラウンドの更新処理に任せ、最新のスナップショットを表示する
+            get_scheduler().subscribe(selected_tickers, interval, period, settings)
+            result = load_snapshot(selected_tickers, interval, period, settings,
+                                   max_age=2 * CACHE_SECONDS.get(interval, 60))
+        if result is None:
+            time_bucket = int(time.time() // CACHE_SECONDS.get(interval, 60))
+            # 自動更新中の記録はバックグラウンドの更新処理に任せる（同じスキャンを二重に記録しない）
+            result = run_analysis(selected_tickers, period, interval, settings, time_bucket, st.empty(),
+                                  record=not auto_refresh)
+        data_map, scores = result["data"], result["scores"]
+        warm_placeholder.empty()
 
         # ランキング表示
         st.subheader("📊 分析結果ランキング")
-        if results:
-            results_df = pd.DataFrame(results)
-            results_df = results_df.sort_values(by="Score", ascending=False)
+        if not scores.empty:
+            results_df = ranking_frame(result)
+            # 判定理由の文字列は表示する行の分だけ作る
+            results_df["Trend"] = render_reasons(results_df["ReasonCode"])
             
             # スタイリング
             def color_signal(val):
@@ -220,7 +393,7 @@ if st.sidebar.button("分析開始"):
             
             # 表示列の整理
             display_df = results_df[['Ticker', 'Name', 'Close', 'Score', 'Signal', 'Trend']]
-            st.dataframe(display_df.style.applymap(color_signal, subset=['Signal']), use_container_width=True)
+            st.dataframe(display_df.style.map(color_signal, subset=['Signal']), use_container_width=True)
             
             # --- ここから「買い・売りシグナル」のまとめ表示 ---
             st.markdown("### 🔔 アラート・注目銘柄")
@@ -244,70 +417,127 @@ if st.sidebar.button("分析開始"):
                         st.error(f"**{row['Ticker']}** ({row['Name']}) - スコア: {row['Score']}")
                 else:
                     st.info("現在、売りシグナルの銘柄はありません")
+
+            # 前回までのスキャンとの差分（保存済みの履歴を読むだけで、再計算はしない）
+            history = ResultHistory(interval, period, selected_tickers, settings)
+            st.markdown("#### 🕒 シグナルの変化")
+            # 銘柄で絞ってから件数を制限する（他の銘柄のアラートで表示が埋まらないように）
+            changes = history.alerts(limit=ALERTS_SHOWN, tickers=selected_tickers)
+            if not changes.empty:
+                kind_labels = {"new_buy": "新規 BUY", "flip": "シグナル変化", "score_jump": "スコア急変"}
+                changes["Kind"] = changes["Kind"].map(kind_labels)
+                changes["Time"] = changes["Time"].dt.tz_convert("Asia/Tokyo").dt.strftime("%m/%d %H:%M")
+                st.dataframe(changes.rename(columns={"Time": "日時", "Kind": "種類", "From": "前回", "To": "今回",
+                                                     "PrevScore": "前回スコア"}),
+                             use_container_width=True, hide_index=True)
+            else:
+                st.info("記録されたシグナルの変化はありません")
+
+            with st.expander("📜 スコア履歴"):
+                past = history.query(tickers=selected_tickers,
+                                     start=pd.Timestamp.now(tz="UTC") - pd.Timedelta(days=HISTORY_DAYS))
+                if len(past):
+                    st.line_chart(past.pivot_table(index="Time", columns="Ticker", values="Score", aggfunc="last"))
+                else:
+                    st.info("まだ履歴がありません")
             st.markdown("---")
             # --- ここまで ---
 
-            # 個別チャート表示
+            if multi_timeframe and mtf_labels:
+                st.subheader("🧭 マルチタイムフレーム分析")
+                mtf_intervals = [interval_options[label] for label in mtf_labels]
+                with st.spinner("時間足を集計中..."):
+                    finest = min(mtf_intervals, key=lambda iv: CACHE_SECONDS.get(iv, 60))
+                    base, mtf = run_timeframes(tuple(selected_tickers), tuple(mtf_intervals),
+                                               tuple(sorted(settings.items())),
+                                               int(time.time() // CACHE_SECONDS.get(finest, 60)))
+                mtf = mtf.reset_index()
+                mtf.insert(1, "Name", [result["names"].get(t, t) for t in mtf["Ticker"]])
+                mtf = mtf.sort_values(by="Score", ascending=False, kind="stable")
+                st.caption(f"{base} の足を1回だけ取得し、他の時間足はそこから集計しています")
+                st.dataframe(mtf.style.map(color_signal, subset=['Signal'] + [f"Signal_{iv}" for iv in mtf_intervals]),
+                             use_container_width=True)
+                st.markdown("---")
+
+            # 個別チャート表示（スコア順にページ分けし、開いた銘柄のチャートだけを作る）
             st.subheader("📈 詳細テクニカルチャート")
-            
-            for ticker in results_df['Ticker'].tolist():
-                df = data_map[ticker]
-                res = results_df[results_df['Ticker'] == ticker].iloc[0]
+
+            pages = max(1, -(-len(results_df) // CHARTS_PER_PAGE))
+            page = st.number_input(f"ページ (全 {pages} ページ, {CHARTS_PER_PAGE} 銘柄ずつ)",
+                                   min_value=1, max_value=pages, value=1, step=1) if pages > 1 else 1
+            first_row = (page - 1) * CHARTS_PER_PAGE
+            page_df = results_df.iloc[first_row:first_row + CHARTS_PER_PAGE]
+
+            for rank, res in enumerate(page_df.to_dict("records"), first_row):
+                ticker = res['Ticker']
                 ticker_display_name = f"{ticker} ({res['Name']})"
-                
-                with st.expander(f"【{ticker_display_name}】 スコア: {res['Score']} / 判定: {res['Signal']}", expanded=True):
+                is_open = rank < CHARTS_OPEN_BY_DEFAULT
+
+                with st.expander(f"【{ticker_display_name}】 スコア: {res['Score']} / 判定: {res['Signal']}", expanded=is_open):
                     st.write(f"**トレンド分析:** {res['Trend']}")
-                    
-                    # --- Plotly Multi-chart ---
-                    from plotly.subplots import make_subplots
-                    
-                    # 3つのセクション (価格, MACD, RSI)
-                    fig = make_subplots(rows=3, cols=1, shared_xaxes=True, 
-                                       vertical_spacing=0.05, 
-                                       row_heights=[0.5, 0.25, 0.25],
-                                       subplot_titles=(f"{ticker_display_name} 価格 & 移動平均線", "MACD", "RSI"))
-
-                    # 1. 価格チャート (Candlestick)
-                    # 日本式の色設定 (陽線: 赤, 陰線: 青/緑系)
-                    fig.add_trace(go.Candlestick(x=df.index, open=df['Open'], high=df['High'], low=df['Low'], close=df['Close'],
-                                               increasing_line_color='#e63946', decreasing_line_color='#457b9d',
-                                               name="株価"), row=1, col=1)
-                    
-                    # 移動平均線
-                    ma_short = settings['ma_short']
-                    ma_long = settings['ma_long']
-                    fig.add_trace(go.Scatter(x=df.index, y=df[f'SMA_{ma_short}'], line=dict(color='#ffb703', width=1.5), name=f'SMA {ma_short}'), row=1, col=1)
-                    fig.add_trace(go.Scatter(x=df.index, y=df[f'SMA_{ma_long}'], line=dict(color='#219ebc', width=1.5), name=f'SMA {ma_long}'), row=1, col=1)
-
-                    # 2. MACD
-                    macd_col = f"MACD_{settings['macd_fast']}_{settings['macd_slow']}_{settings['macd_signal']}"
-                    signal_col = f"MACDs_{settings['macd_fast']}_{settings['macd_slow']}_{settings['macd_signal']}"
-                    fig.add_trace(go.Scatter(x=df.index, y=df[macd_col], line=dict(color='#fb8500', width=1), name="MACD"), row=2, col=1)
-                    fig.add_trace(go.Scatter(x=df.index, y=df[signal_col], line=dict(color='#8ecae6', width=1), name="Signal"), row=2, col=1)
-                    # ゼロライン
-                    fig.add_hline(y=0, line_dash="dash", line_color="gray", opacity=0.5, row=2, col=1)
-
-                    # 3. RSI
-                    rsi_col = f"RSI_{settings['rsi_window']}"
-                    fig.add_trace(go.Scatter(x=df.index, y=df[rsi_col], line=dict(color='#a2d2ff', width=1.5), name="RSI"), row=3, col=1)
-                    # 境界線 (70/30)
-                    fig.add_hline(y=70, line_dash="dash", line_color="#ff4d6d", row=3, col=1)
-                    fig.add_hline(y=30, line_dash="dash", line_color="#00f5d4", row=3, col=1)
-
-                    # レイアウト調整
-                    fig.update_layout(height=800, 
-                                    template="plotly_dark",
-                                    xaxis_rangeslider_visible=True, # ズーム・移動がしやすくなるようスライダーを表示
-                                    xaxis_rangeslider_thickness=0.05, # スライダーを細めにしてメインチャートを広く
-                                    margin=dict(l=50, r=50, t=50, b=50),
-                                    hovermode="x unified") # マウス位置の値をまとめて表示
-                    
-                    # スクロール（マウスホイール）でのズームを有効化
-                    fig.update_xaxes(fixedrange=False)
-                    fig.update_yaxes(fixedrange=False)
+                    if not st.toggle("チャートを表示", value=is_open, key=f"show_{ticker}_{interval}"):
+                        continue
+                    df = data_map[ticker]
+
+                    # 表示期間。バーが多い場合は間引いて送り、期間を狭めるとその範囲を元の解像度で表示する
+                    start = end = None
+                    if len(df) > MAX_CHART_POINTS:
+                        first = df.index[0].to_pydatetime().replace(tzinfo=None)
+                        last = df.index[-1].to_pydatetime().replace(tzinfo=None)
+                        start, end = st.slider("表示期間", min_value=first, max_value=last, value=(first, last),
+                                               key=f"range_{ticker}_{interval}")
+                        if df.index.tz is not None:
+                            start, end = (pd.Timestamp(t).tz_localize(df.index.tz, ambiguous=True, nonexistent="shift_forward")
+                                          for t in (start, end))
 
-                    # Streamlitのプロット時に設定を注入
-                    st.plotly_chart(fig, use_container_width=True, config={'scrollZoom': True})
+                    with profiler.stage("render"):
+                        fig = build_chart(ticker_display_name, interval, tuple(sorted(settings.items())),
+                                          (df.index[0], df.index[-1], len(df), float(df['Close'].iloc[-1])),
+                                          start, end, df)
+
+                        # Streamlitのプロット時に設定を注入
+                        st.plotly_chart(fig, use_container_width=True, config={'scrollZoom': True})
                 
         else:
             st.warning("データが見つかりませんでした。")
+
+# --- スクリーナーの結果 ---
+if screen_expr:
+    st.subheader("🔎 スクリーナー結果")
+    index = ScreenerIndex.load(interval, settings)
+    if not len(index):
+        st.info("スクリーナーの索引がありません。`python src/main_cli.py --universe <銘柄リスト>` で作成してください。")
+    else:
+        try:
+            screened = index.ranking(screen_expr)
+        except Exception as e:
+            st.error(f"条件式エラー: {e}")
+        else:
+            screened["Trend"] = render_reasons(screened["ReasonCode"])
+            st.caption(f"{len(screened)} / {len(index)} 銘柄が条件に一致")
+            st.dataframe(screened[['Ticker', 'Name', 'Close', 'Score', 'Signal', 'Trend']], use_container_width=True)
+
+# --- 診断パネル（このサーバープロセスでの累計） ---
+if show_diagnostics:
+    with st.expander("🩺 診断情報", expanded=True):
+        summary = profiler.summary()
+        stages = pd.DataFrame([
+            {"ステージ": name, "回数": s["count"], "合計 (秒)": round(s["total"], 3),
+             "平均 (ms)": round(s["total"] / s["count"] * 1000, 1), "最大 (ms)": round(s["max"] * 1000, 1)}
+            for name, s in summary["stages"].items()
+        ])
+        latencies = pd.DataFrame([
+            {"ヒストグラム": name, "件数": h["count"],
+             "平均 (ms)": round(h["sum"] / h["count"] * 1000, 1) if h["count"] else 0.0,
+             "p50 (ms 以下)": h["p50"] * 1000, "p95 (ms 以下)": h["p95"] * 1000}
+            for name, h in summary["histograms"].items()
+        ])
+        st.dataframe(stages, use_container_width=True)
+        st.dataframe(latencies, use_container_width=True)
+        st.json(summary["counters"])
+        col1, col2, col3 = st.columns(3)
+        col1.download_button("JSON で保存", profiler.to_json(), file_name="profile.json", mime="application/json")
+        col2.download_button("Prometheus 形式で保存", profiler.to_prometheus(), file_name="profile.prom", mime="text/plain")
+        if col3.button("リセット"):
+            profiler.reset()
+            st.rerun()
@@ -1,6 +1,10 @@
 import subprocess
 import sys
 import os
+import importlib.util
+
+# パッケージ名とモジュール名が違うもの
+MODULE_NAMES = {"pyyaml": "yaml", "streamlit-autorefresh": "streamlit_autorefresh"}
 
 def check_and_install():
     print("--- 準備中 (Checking requirements) ---")
@@ -10,10 +14,9 @@ def check_and_install():
     ]
     
     for pkg in required_packages:
-        module_name = pkg if pkg != "pyyaml" else "yaml"
-        try:
-            __import__(module_name)
-        except ImportError:
+        module_name = MODULE_NAMES.get(pkg, pkg)
+        # インストール済みかどうかだけを調べる（読み込みはしないので起動が速い）
+        if importlib.util.find_spec(module_name) is None:
             print(f">> 準備開始: {pkg}")
             subprocess.check_call([sys.executable, "-m", "pip", "install", pkg])
 
@@ -0,0 +1,182 @@
+import asyncio
+import heapq
+
+import pandas as pd
+
+from .fetcher import afetch_stock_data, fetch_stock_data, iter_stock_data
+from .indicators import indicator_columns, warmup_bars
+from .profiling import profiler
+from .resample import BASE_PERIOD, base_interval, resample_frames
+from .scorer import combine_timeframes, score_batch
+from .store import PriceStore
+
+# 元の足から作った足が指標の計算に足りないとき、その時間足を直接取得する期間
+DIRECT_PERIODS = {"1d": "2y", "1wk": "5y", "1mo": "10y"}
+
+
+def _score(data, names, settings):
+    # 価格は列ごとの連続した配列にまとめ、銘柄ごとの DataFrame は手放す
+    store = PriceStore.from_frames(data)
+    del data
+
+    # 指標計算（全銘柄をまとめて計算）
+    with profiler.stage("indicators"):
+        store.add_indicators(settings)
+
+    # スコア計算（全銘柄を一度に判定）
+    with profiler.stage("scoring"):
+        latest = store.latest(['Close'] + list(indicator_columns(settings).values()))
+        scores = score_batch(latest, settings)
+    return {"data": store, "names": names, "latest": latest, "scores": scores}
+
+
+def analyze(tickers, period, interval, settings, provider=None):
+    """
+    Runs fetch -> indicators -> scoring for a watchlist.
+    Returns: dict with "data" (PriceStore with indicators; store[ticker] is a DataFrame), "names",
+    "latest" (latest indicator values) and "scores" (score_batch output)
+    """
+    data, names = fetch_stock_data(list(tickers), period=period, interval=interval, provider=provider)
+    return _score(data, names, settings)
+
+
+async def aanalyze(tickers, period, interval, settings, provider=None):
+    """Async variant of analyze (the download is awaited, the scoring runs in a worker thread)."""
+    data, names = await afetch_stock_data(list(tickers), period=period, interval=interval, provider=provider)
+    return await asyncio.to_thread(_score, data, names, settings)
+
+
+def analyze_timeframes(tickers, intervals, settings, period=None, weights=None, provider=None):
+    """
+    Multi-timeframe analysis from a single fetch: downloads the finest interval once,
+    builds the others with resample_frames and scores each of them. When the base
+    history is too short for the indicators of a coarser interval (e.g. about 40 daily
+    bars from 60 days of 15m bars against SMA 75), that interval is fetched directly.
+    period: history of the base fetch (default: the longest the provider keeps for it)
+    weights: dict of interval -> weight of the combined score (default: equal)
+    Returns: dict with "base" (fetched interval), "names", "results" (interval -> the
+    analyze() result for that interval) and "scores" (combine_timeframes output)
+    """
+    intervals = list(dict.fromkeys(intervals))
+    base = base_interval(intervals)
+    data, names = fetch_stock_data(list(tickers), period=period or BASE_PERIOD.get(base, "1y"),
+                                   interval=base, provider=provider)
+    results = {}
+    for interval in intervals:
+        with profiler.stage("resample"):
+            frames = resample_frames(data, interval, base)
+        if interval != base:
+            frames = _fill_short(frames, list(data), interval, base, settings, provider)
+        results[interval] = _score(frames, names, settings)
+    scores = combine_timeframes({iv: result["scores"] for iv, result in results.items()}, weights)
+    return {"base": base, "names": names, "results": results, "scores": scores}
+
+
+def _fill_short(frames, tickers, interval, base, settings, provider):
+    """
+    Replaces the resampled frames that have fewer bars than the indicators need with
+    bars of interval fetched directly (from the OHLCV cache when possible).
+    """
+    needed = warmup_bars(settings)
+    short = [t for t in tickers if len(frames.get(t, ())) < needed]
+    if not short:
+        return frames
+    bars = min(len(frames.get(t, ())) for t in short)
+    print(f"Warning: {len(short)} tickers have only {bars} {interval} bars built from {base} "
+          f"(indicators need {needed}); fetching {interval} directly.")
+    period = DIRECT_PERIODS.get(interval) or BASE_PERIOD.get(interval, "1y")
+    direct, _ = fetch_stock_data(short, period=period, interval=interval, provider=provider)
+    frames = dict(frames)
+    for ticker, df in direct.items():
+        if len(df) > len(frames.get(ticker, ())):
+            frames[ticker] = df
+    return frames
+
+
+def ranking_frame(result):
+    """
+    Builds the ranking table (Ticker, Name, Close, Score, Signal, ReasonCode) sorted by score.
+    Reason text is left to render_reasons for the rows that are displayed.
+    """
+    scores, latest, names = result["scores"], result["latest"], result["names"]
+    ranking = pd.DataFrame({
+        "Ticker": scores.index,
+        "Name": [names.get(t, t) for t in scores.index],
+        "Close": latest["Close"].to_numpy(),
+        "Score": scores["Score"].to_numpy(),
+        "Signal": scores["Signal"].to_numpy(),
+        "ReasonCode": scores["ReasonCode"].to_numpy(),
+    })
+    return ranking.sort_values(by="Score", ascending=False, kind="stable").reset_index(drop=True)
+
+
+def iter_analyze(tickers, period, interval, settings, provider=None, keep_data=False, tail=None):
+    """
+    Streaming variant of analyze: runs indicators and scoring on each chunk as soon as
+    it has been downloaded and yields one row per ticker (Ticker, Name, Close, Score,
+    Signal, ReasonCode). Price history is dropped after scoring unless keep_data,
+    in which case each row also carries the DataFrame with indicators under "data".
+    tail: also keep a copy of the last tail bars (with indicators) under "tail".
+    """
+    cols = ['Close'] + list(indicator_columns(settings).values())
+    for data, names in iter_stock_data(list(tickers), period=period, interval=interval, provider=provider):
+        store = PriceStore.from_frames(data)
+        del data
+        with profiler.stage("indicators"):
+            store.add_indicators(settings)
+        with profiler.stage("scoring"):
+            latest = store.latest(cols)
+            scores = score_batch(latest, settings)
+        for ticker, close, score, signal, code in zip(
+                scores.index, latest["Close"], scores["Score"], scores["Signal"], scores["ReasonCode"]):
+            row = {"Ticker": ticker, "Name": names.get(ticker, ticker), "Close": close,
+                   "Score": int(score), "Signal": signal, "ReasonCode": int(code)}
+            if keep_data:
+                row["data"] = store[ticker]
+            if tail:
+                row["tail"] = store[ticker].iloc[-tail:].copy()
+            yield row
+
+
+def result_from_rows(rows, settings, tickers=None):
+    """
+    Builds the analyze() result from iter_analyze(keep_data=True) rows,
+    ordered like tickers so the ranking matches a non-streaming run.
+    """
+    rows = {row["Ticker"]: row for row in rows}
+    order = [t for t in tickers if t in rows] if tickers is not None else list(rows)
+    store = PriceStore.from_frames((t, rows[t]["data"]) for t in order)
+    scores = pd.DataFrame(
+        {"Score": [rows[t]["Score"] for t in order],
+         "Signal": [rows[t]["Signal"] for t in order],
+         "ReasonCode": [rows[t]["ReasonCode"] for t in order]},
+        index=pd.Index(order, name="Ticker"))
+    return {"data": store, "names": {t: rows[t]["Name"] for t in order},
+            "latest": store.latest(['Close'] + list(indicator_columns(settings).values())), "scores": scores}
+
+
+class TopRanking:
+    """
+    Keeps the n best rows by score in a heap while results stream in.
+    Ties keep arrival order, like the stable sort of ranking_frame.
+    """
+
+    def __init__(self, n=None):
+        self.n = n
+        self._heap = []
+        self._count = 0
+
+    def push(self, row):
+        item = (row["Score"], -self._count, row)
+        self._count += 1
+        if self.n is None or len(self._heap) < self.n:
+            heapq.heappush(self._heap, item)
+        else:
+            heapq.heappushpop(self._heap, item)
+
+    def __len__(self):
+        return len(self._heap)
+
+    def rows(self):
+        """Rows best first."""
+        return [row for _, _, row in sorted(self._heap, key=lambda item: item[:2], reverse=True)]
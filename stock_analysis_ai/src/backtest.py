@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+
+from .indicators import calculate_indicators_panel
+from .scorer import score_arrays, SIGNAL_BUY, SIGNAL_SELL
+
+
+def signal_panel(close, settings):
+    """
+    Evaluates the scorer rules at every bar of every ticker.
+    close: wide Close DataFrame (time x tickers), NaN where a ticker has no bar.
+    Returns: (score, signal code) as 2-D arrays shaped like close
+    """
+    indicators = calculate_indicators_panel(close.to_numpy(dtype=np.float64), settings)
+    score, signal, _ = score_arrays(indicators, settings)
+    # バーがない行はシグナルなし（ポジションはそのまま持ち越す）
+    signal[np.isnan(close.to_numpy(dtype=np.float64))] = 0
+    return score, signal
+
+
+def positions_from_signals(signal, allow_short=False):
+    """
+    Turns signal codes into the position held after each bar's close.
+    BUY enters long, SELL exits (or goes short with allow_short); WAIT keeps the position.
+    """
+    target = np.full(signal.shape, np.nan)
+    target[signal == SIGNAL_BUY] = 1.0
+    target[signal == SIGNAL_SELL] = -1.0 if allow_short else 0.0
+    # 直前のシグナルを前方に引き継ぐ（時間方向の ffill）
+    return pd.DataFrame(target).ffill().fillna(0.0).to_numpy()
+
+
+def _max_drawdown(equity):
+    """equity: 2-D (time x tickers) or 1-D。各列の最大ドローダウン（負の値）を返す"""
+    # 最初のバーで損をした場合も数えるよう、開始時点の資産 1.0 を先頭に置く
+    start = np.ones((1,) + np.shape(equity)[1:])
+    equity = np.concatenate([start, equity], axis=0)
+    peak = np.fmax.accumulate(equity, axis=0)
+    return np.nanmin(equity / peak - 1.0, axis=0)
+
+
+def _trade_stats(position, net_log_ret):
+    """
+    Per-ticker trade count and hit rate from positions and net log returns.
+    Each bar's return is assigned to the trade open during that bar.
+    """
+    n_bars, n_tickers = position.shape
+    prev = np.vstack([np.zeros((1, n_tickers)), position[:-1]])
+    entries = (position != 0) & (position != prev)
+    trade_id = np.cumsum(entries, axis=0)
+
+    # ポジションを持っていたバー（コストを含む）を、そのトレードに割り当てる
+    in_trade = (prev != 0) | entries
+    prev_trade = np.vstack([np.zeros((1, n_tickers), dtype=trade_id.dtype), trade_id[:-1]])
+    bar_trade = np.where(prev != 0, prev_trade, trade_id)
+
+    n_trades = trade_id[-1] if n_bars else np.zeros(n_tickers, dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(n_trades + 1)[:-1]])
+    keys = (bar_trade + offsets)[in_trade]
+    trade_ret = np.bincount(keys, weights=net_log_ret[in_trade], minlength=int((n_trades + 1).sum()))
+    trade_seen = np.bincount(keys, minlength=int((n_trades + 1).sum())) > 0
+
+    ticker_of_key = np.repeat(np.arange(n_tickers), n_trades + 1)
+    wins = np.bincount(ticker_of_key, weights=(trade_seen & (trade_ret > 0)), minlength=n_tickers)
+    counts = np.bincount(ticker_of_key, weights=trade_seen, minlength=n_tickers)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        hit_rate = wins / counts
+    return counts.astype(np.int64), hit_rate, wins
+
+
+def simulate(prices, has_data, signal, cost=0.001, allow_short=False):
+    """
+    Array-level backtest core shared by run_backtest and the parameter sweep.
+    prices: forward-filled Close array (time x tickers)
+    has_data: bool array, True where the ticker has a bar
+    signal: signal codes from score_arrays
+    Returns: (dict of per-ticker metric arrays, portfolio dict, portfolio equity array)
+    """
+    position = positions_from_signals(signal, allow_short)
+    n_tickers = position.shape[1]
+
+    ret = np.zeros_like(prices)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ret[1:] = prices[1:] / prices[:-1] - 1.0
+    ret[~np.isfinite(ret)] = 0.0
+
+    prev = np.vstack([np.zeros((1, n_tickers)), position[:-1]])
+    turnover = np.abs(position - prev)
+    net_ret = prev * ret - cost * turnover
+
+    equity = np.cumprod(1.0 + net_ret, axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        net_log_ret = np.log1p(net_ret)
+    trades, hit_rate, wins = _trade_stats(position, net_log_ret)
+
+    active = np.cumsum(has_data, axis=0) > 0
+    per_ticker = {
+        "Total Return": equity[-1] - 1.0 if len(equity) else np.zeros(n_tickers),
+        "Max Drawdown": _max_drawdown(equity) if len(equity) else np.zeros(n_tickers),
+        "Trades": trades,
+        "Hit Rate": hit_rate,
+        "Exposure": (prev != 0).sum(axis=0) / np.maximum(active.sum(axis=0), 1),
+    }
+
+    # ポートフォリオ: データのある銘柄に等金額で配分し、毎バー リバランスする
+    port_ret = np.where(active, net_ret, 0.0).sum(axis=1) / np.maximum(active.sum(axis=1), 1)
+    port_equity = np.cumprod(1.0 + port_ret)
+    total_trades = int(trades.sum())
+    portfolio = {
+        "Total Return": float(port_equity[-1] - 1.0) if len(port_equity) else 0.0,
+        "Max Drawdown": float(_max_drawdown(port_equity)) if len(port_equity) else 0.0,
+        "Trades": total_trades,
+        "Hit Rate": float(wins.sum() / total_trades) if total_trades else float("nan"),
+    }
+    return per_ticker, portfolio, port_equity
+
+
+def run_backtest(close, settings, cost=0.001, allow_short=False):
+    """
+    Backtests the scorer's BUY/SELL signals on every ticker at once, without a per-bar loop.
+    Signals are evaluated at each bar's close and the position is held from that close.
+    close: wide Close DataFrame (time x tickers)
+    cost: trading cost per unit of turnover (0.001 = 10 bps per side)
+    Returns: (per-ticker DataFrame, portfolio dict, portfolio equity Series)
+    """
+    close = close.sort_index()
+    _, signal = signal_panel(close, settings)
+    has_data = ~np.isnan(close.to_numpy(dtype=np.float64))
+    prices = close.ffill().to_numpy(dtype=np.float64)
+
+    per_ticker, portfolio, port_equity = simulate(prices, has_data, signal, cost, allow_short)
+    return (pd.DataFrame(per_ticker, index=close.columns), portfolio,
+            pd.Series(port_equity, index=close.index, name="Equity"))
@@ -0,0 +1,91 @@
+import sys
+import os
+import argparse
+
+# Ensure the project root is in path if running directly (src is imported as a package)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from src.utils import load_config
+from src.providers import LocalProvider, set_default_provider
+from src.fetcher import fetch_stock_data
+from src.backtest import run_backtest
+from rich.console import Console
+from rich.table import Table
+from rich import box
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest the scorer's BUY/SELL signals")
+    parser.add_argument("--tickers", nargs="+", help="Tickers to test (default: config.yaml)")
+    parser.add_argument("--period", default="10y", help="History period (default: 10y)")
+    parser.add_argument("--interval", help="Bar interval (default: config.yaml)")
+    parser.add_argument("--cost-bps", type=float, default=10.0, help="Trading cost per side in bps (default: 10)")
+    parser.add_argument("--allow-short", action="store_true", help="Go short on SELL instead of going flat")
+    parser.add_argument("--data-dir",
+                        help="Read prices from local files in this directory instead of downloading")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.data_dir:
+        set_default_provider(LocalProvider(args.data_dir))
+    console = Console()
+    console.print("[bold green]Stock Analysis AI - Backtest[/bold green]")
+
+    # 1. Load Config
+    try:
+        config = load_config()
+        tickers = args.tickers or config['tickers']
+        settings = config['settings']
+    except Exception as e:
+        console.print(f"[red]Failed to load config: {e}[/red]")
+        return
+
+    interval = args.interval or settings['interval']
+
+    # 2. Fetch Data
+    console.print(f"Fetching data (Period: {args.period}, Interval: {interval})...")
+    data, _ = fetch_stock_data(tickers, period=args.period, interval=interval)
+    if not data:
+        console.print("[red]No data to backtest.[/red]")
+        return
+    close = pd.concat({ticker: df['Close'] for ticker, df in data.items()}, axis=1, sort=True)
+
+    # 3. Backtest and Show Result
+    per_ticker, portfolio, _ = run_backtest(close, settings, cost=args.cost_bps / 10000,
+                                            allow_short=args.allow_short)
+
+    table = Table(title="Backtest Results", box=box.ROUNDED)
+    table.add_column("Ticker", style="cyan", justify="left")
+    table.add_column("Total Return", justify="right")
+    table.add_column("Max Drawdown", justify="right")
+    table.add_column("Trades", justify="right")
+    table.add_column("Hit Rate", justify="right")
+    table.add_column("Exposure", justify="right")
+
+    per_ticker = per_ticker.sort_values("Total Return", ascending=False)
+    for ticker, row in per_ticker.iterrows():
+        table.add_row(
+            ticker,
+            f"{row['Total Return']:.1%}",
+            f"{row['Max Drawdown']:.1%}",
+            str(int(row['Trades'])),
+            "-" if pd.isna(row['Hit Rate']) else f"{row['Hit Rate']:.0%}",
+            f"{row['Exposure']:.0%}",
+        )
+    table.add_section()
+    table.add_row(
+        "[bold]Portfolio[/bold]",
+        f"{portfolio['Total Return']:.1%}",
+        f"{portfolio['Max Drawdown']:.1%}",
+        str(portfolio['Trades']),
+        "-" if pd.isna(portfolio['Hit Rate']) else f"{portfolio['Hit Rate']:.0%}",
+        "",
+    )
+
+    console.print(table)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import json
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from .fetcher import iter_stock_data
+from .indicators import indicator_columns
+from .scorer import render_reasons, score_batch
+from .store import PriceStore
+
+# 出力形式と拡張子の対応
+OUTPUT_FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".json": "jsonl", ".parquet": "parquet"}
+
+
+def score_frames(data, names, settings):
+    """
+    Runs indicators and scoring on one chunk of per-ticker DataFrames
+    (the unit of work of a batch worker process).
+    Returns: DataFrame with one row per ticker: Ticker, Name, Time (last bar),
+    Close, Score, Signal, ReasonCode, Reasons and the latest indicator values
+    """
+    store = PriceStore.from_frames(data)
+    del data
+    store.add_indicators(settings)
+    columns = ['Close'] + list(indicator_columns(settings).values())
+    latest = store.latest(columns)
+    scores = score_batch(latest, settings)
+
+    last = store.offsets[1:] - 1
+    # tz 付きの時刻は UTC で保存されているので、銘柄のタイムゾーンに戻す
+    times = [pd.Timestamp(ns, tz="UTC").tz_convert(tz) if tz else pd.Timestamp(ns)
+             for ns, tz in zip(store.times[store.time_pos[last]], store.tz)]
+    rows = pd.DataFrame({
+        "Ticker": store.tickers,
+        "Name": [names.get(t, t) for t in store.tickers],
+        "Time": times,
+        "Close": latest["Close"].to_numpy(),
+        "Score": scores["Score"].to_numpy(),
+        "Signal": scores["Signal"].to_numpy(),
+        "ReasonCode": scores["ReasonCode"].to_numpy(),
+        "Reasons": render_reasons(scores["ReasonCode"]),
+    })
+    for col in columns[1:]:
+        rows[col] = latest[col].to_numpy()
+    return rows
+
+
+def iter_batch(tickers, interval, period, settings, workers=None, provider=None):
+    """
+    Downloads tickers chunk by chunk and scores each chunk in a process pool while
+    the next ones download. At most twice the worker count of chunks are in flight,
+    so memory stays bounded for any number of tickers.
+    workers: worker processes (default: CPU count; 1 runs in this process)
+    Yields: score_frames DataFrames, in completion order
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = iter_stock_data(list(tickers), period=period, interval=interval, provider=provider)
+    if workers == 1:
+        for data, names in chunks:
+            yield score_frames(data, names, settings)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+        for data, names in chunks:
+            pending.add(pool.submit(score_frames, data, names, settings))
+            del data
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        for future in pending:
+            yield future.result()
+
+
+def run_batch(tickers, interval, period, settings, workers=None, provider=None):
+    """
+    Scores every ticker with iter_batch.
+    Returns: DataFrame ranked by score (ties keep the order of tickers)
+    """
+    frames = [rows for rows in iter_batch(tickers, interval, period, settings, workers, provider) if len(rows)]
+    if not frames:
+        return score_frames({}, {}, settings)
+    results = pd.concat(frames, ignore_index=True)
+    order = {ticker: i for i, ticker in enumerate(dict.fromkeys(tickers))}
+    results["_order"] = results["Ticker"].map(order)
+    results = results.sort_values(["Score", "_order"], ascending=[False, True], kind="stable")
+    return results.drop(columns="_order").reset_index(drop=True)
+
+
+def output_format(path, fmt=None):
+    """出力形式を決める（指定がなければ拡張子から。標準出力は CSV）"""
+    if fmt:
+        return fmt
+    if path in (None, "-"):
+        return "csv"
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in OUTPUT_FORMATS:
+        raise ValueError(f"Cannot tell the output format from {path}; use --format")
+    return OUTPUT_FORMATS[ext]
+
+
+def write_results(results, path=None, fmt=None):
+    """
+    Writes batch results as CSV, JSON Lines or Parquet (Parquet needs pyarrow or fastparquet).
+    path: output file, or None / "-" for standard output (CSV or JSON Lines only)
+    """
+    fmt = output_format(path, fmt)
+    to_stdout = path in (None, "-")
+    results = results.copy()
+    results["Time"] = results["Time"].map(lambda t: t.isoformat() if pd.notna(t) else None)
+
+    if fmt == "csv":
+        results.to_csv(sys.stdout if to_stdout else path, index=False, lineterminator="\n")
+    elif fmt == "jsonl":
+        records = results.replace({np.nan: None}).to_dict("records")
+        out = sys.stdout if to_stdout else open(path, "w", encoding="utf-8")
+        try:
+            for record in records:
+                out.write(json.dumps(record, ensure_ascii=False, default=_json_default) + "\n")
+        finally:
+            if not to_stdout:
+                out.close()
+    elif fmt == "parquet":
+        if to_stdout:
+            raise ValueError("Parquet cannot be written to standard output")
+        results.to_parquet(path, index=False)
+    else:
+        raise ValueError(f"Unknown output format: {fmt}")
+
+
+def _json_default(value):
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value)
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
@@ -0,0 +1,98 @@
+import sys
+import os
+import argparse
+import contextlib
+import time
+
+# Ensure the project root is in path if running directly (src is imported as a package)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils import load_config
+from src.providers import LocalProvider, set_default_provider
+from src.screener import load_universe
+from src.batch import OUTPUT_FORMATS, output_format, run_batch, write_results
+
+
+def parse_setting(text):
+    """KEY=VALUE を (KEY, 値) にする。数値は int に変換する"""
+    key, sep, value = text.partition("=")
+    if not sep or not key:
+        raise argparse.ArgumentTypeError(f"Expected KEY=VALUE, got {text!r}")
+    try:
+        value = int(value)
+    except ValueError:
+        pass
+    return key.strip(), value
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Score a list of tickers without a UI and write machine-readable results")
+    parser.add_argument("--tickers-file",
+                        help="File with one ticker per line, or 'cache' for every cached ticker (default: config.yaml)")
+    parser.add_argument("--tickers", nargs="+", help="Tickers to score (instead of a file)")
+    parser.add_argument("--interval", help="Bar interval (default: config.yaml)")
+    parser.add_argument("--period", help="History period (default: config.yaml)")
+    parser.add_argument("--set", dest="overrides", type=parse_setting, action="append", default=[],
+                        metavar="KEY=VALUE", help="Override a setting, e.g. --set ma_short=20 (repeatable)")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument("-o", "--output", help="Output file (default: standard output)")
+    parser.add_argument("--format", choices=sorted(set(OUTPUT_FORMATS.values())),
+                        help="Output format (default: from the output file extension, CSV for standard output)")
+    parser.add_argument("--data-dir",
+                        help="Read prices from local files in this directory instead of downloading")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.data_dir:
+        set_default_provider(LocalProvider(args.data_dir))
+
+    # 1. Load Config and apply overrides
+    config = load_config()
+    settings = dict(config['settings'])
+    for key, value in args.overrides:
+        if key not in settings:
+            print(f"Unknown setting: {key} (known: {', '.join(settings)})", file=sys.stderr)
+            return 2
+        settings[key] = value
+    interval = args.interval or settings['interval']
+    period = args.period or settings['period']
+    settings['interval'], settings['period'] = interval, period
+
+    try:
+        fmt = output_format(args.output, args.format)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    if args.tickers:
+        tickers = args.tickers
+    elif args.tickers_file:
+        tickers = load_universe(args.tickers_file, interval)
+    else:
+        tickers = config['tickers']
+    if not tickers:
+        print("No tickers to score.", file=sys.stderr)
+        return 1
+
+    # 2. Fetch and score (進行状況などのログは標準エラーに出し、標準出力は結果だけにする)
+    started = time.perf_counter()
+    print(f"Scoring {len(tickers)} tickers (Period: {period}, Interval: {interval})...", file=sys.stderr)
+    with contextlib.redirect_stdout(sys.stderr):
+        results = run_batch(tickers, interval, period, settings, workers=args.workers)
+    print(f"Scored {len(results)} of {len(tickers)} tickers in {time.perf_counter() - started:.1f}s",
+          file=sys.stderr)
+
+    # 3. Write results
+    try:
+        write_results(results, args.output, fmt)
+    except (ImportError, ValueError) as e:
+        print(f"Failed to write results: {e}", file=sys.stderr)
+        return 1
+    return 0 if len(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
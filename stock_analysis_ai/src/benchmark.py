@@ -0,0 +1,219 @@
+import sys
+import os
+import io
+import argparse
+import json
+import platform
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+# Ensure the project root is in path if running directly (src is imported as a package)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from src.utils import get_cache_dir, load_config
+from src import kernels
+from src.indicators import calculate_indicators
+from src.scorer import evaluate_stock, score_batch
+from src.providers import LocalProvider, split_download
+from src.store import PriceStore
+from src.analysis import iter_analyze, TopRanking
+from src.cache import OHLCV_COLUMNS
+from rich.console import Console
+from rich.table import Table
+from rich import box
+
+# 時間足ごとの合成データのバーの間隔
+BAR_FREQ = {"1d": "B", "1h": "h", "15m": "15min", "5m": "5min", "1m": "min"}
+
+# 既定で許容する悪化の割合（0.25 = 基準より 25% 遅い・大きいまで）
+DEFAULT_TOLERANCE = 0.25
+
+
+def synthetic_panel(tickers=100, bars=1250, interval="1d", seed=0, missing=0.02):
+    """
+    Generates a random-walk OHLCV panel shaped like yf.download(group_by='ticker'):
+    columns are (ticker, field), and about `missing` of each ticker's bars are NaN.
+    """
+    rng = np.random.default_rng(seed)
+    index = pd.date_range("2015-01-01", periods=bars, freq=BAR_FREQ.get(interval, "B"), name="Date")
+    names = [f"SYN{i:05d}" for i in range(tickers)]
+
+    close = 100.0 * np.exp(np.cumsum(rng.normal(0.0002, 0.02, (bars, tickers)), axis=0))
+    spread = np.abs(rng.normal(0, 0.01, (bars, tickers)))
+    fields = {
+        "Open": close * (1 + rng.normal(0, 0.005, (bars, tickers))),
+        "High": close * (1 + spread),
+        "Low": close * (1 - spread),
+        "Close": close,
+        "Volume": rng.integers(1_000, 1_000_000, (bars, tickers)).astype(np.float64),
+    }
+    gaps = rng.random((bars, tickers)) < missing
+    for values in fields.values():
+        values[gaps] = np.nan
+
+    data = np.stack([fields[f] for f in OHLCV_COLUMNS], axis=2).reshape(bars, tickers * len(OHLCV_COLUMNS))
+    columns = pd.MultiIndex.from_product([names, OHLCV_COLUMNS])
+    return pd.DataFrame(data, index=index, columns=columns)
+
+
+def _measure(func, repeat):
+    """最速の実行時間と、別の1回で測ったピークメモリ（tracemalloc）を返す"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def run_benchmarks(tickers=200, bars=1250, interval="1d", repeat=3, seed=0):
+    """
+    Times the hot paths on a synthetic panel.
+    Returns: dict of benchmark name -> {"seconds", "peak_mb", "items", "per_second"}
+    """
+    settings = load_config()['settings']
+    panel = synthetic_panel(tickers, bars, interval, seed)
+    names = list(panel.columns.levels[0])
+    frames = split_download(panel, names)
+    with_indicators = {t: calculate_indicators(df.copy(), settings) for t, df in frames.items()}
+
+    tmp_dir = tempfile.mkdtemp(prefix="stock-bench-")
+    try:
+        provider = LocalProvider(tmp_dir)
+        for ticker, df in frames.items():
+            provider.write(ticker, interval, df)
+
+        def end_to_end():
+            # CLI と同じ流れ（取得 → 指標 → スコア → 表の描画）をローカルのファイルで実行する
+            from src.main_cli import build_table
+            ranking = TopRanking()
+            for row in iter_analyze(names, "max", interval, settings, provider=provider):
+                ranking.push(row)
+            Console(file=io.StringIO(), width=120).print(build_table(ranking.rows()))
+
+        cases = {
+            "fetcher_cleanup": (lambda: split_download(panel, names), tickers),
+            "calculate_indicators": (lambda: [calculate_indicators(df.copy(), settings) for df in frames.values()], tickers),
+            "store_indicators": (lambda: PriceStore.from_frames(frames).add_indicators(settings), tickers),
+            "evaluate_stock": (lambda: [evaluate_stock(df, settings) for df in with_indicators.values()], tickers),
+            "score_batch": (lambda: score_batch(PriceStore.from_frames(with_indicators).latest(
+                ['Close'] + [c for c in next(iter(with_indicators.values())).columns if c not in OHLCV_COLUMNS]),
+                settings), tickers),
+            "end_to_end_cli": (end_to_end, tickers),
+        }
+
+        results = {}
+        for name, (func, items) in cases.items():
+            seconds, peak = _measure(func, repeat)
+            results[name] = {
+                "seconds": seconds,
+                "peak_mb": peak / 1e6,
+                "items": items,
+                "per_second": items / seconds if seconds > 0 else float("inf"),
+            }
+        return results
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compares results with a baseline of the same size.
+    Returns: list of (benchmark, metric, baseline value, current value) that regressed
+    """
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for metric in ("seconds", "peak_mb"):
+            if current[metric] > base[metric] * (1 + tolerance):
+                regressions.append((name, metric, base[metric], current[metric]))
+    return regressions
+
+
+def _bench_dir():
+    path = os.path.join(get_cache_dir(), "benchmarks")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _size_key(tickers, bars, interval):
+    return f"{tickers}x{bars}x{interval}"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the fetcher cleanup, indicators, scorer and CLI pipeline")
+    parser.add_argument("--tickers", type=int, default=200, help="Synthetic tickers (default: 200)")
+    parser.add_argument("--bars", type=int, default=1250, help="Bars per ticker (default: 1250)")
+    parser.add_argument("--interval", default="1d", choices=sorted(BAR_FREQ), help="Bar interval (default: 1d)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per benchmark; the fastest counts (default: 3)")
+    parser.add_argument("--baseline", help="Baseline file (default: cache/benchmarks/baseline.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed slowdown / memory growth before failing (default: 0.25)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    console = Console()
+    console.print("[bold green]Stock Analysis AI - Benchmark[/bold green]")
+    console.print(f"Synthetic panel: {args.tickers} tickers x {args.bars} bars ({args.interval})")
+    console.print(f"Indicator kernels: {'numba' if kernels.USE_NUMBA else 'numpy'}")
+
+    results = run_benchmarks(args.tickers, args.bars, args.interval, args.repeat)
+    key = _size_key(args.tickers, args.bars, args.interval)
+
+    # 結果の履歴を残す
+    record = {"time": time.time(), "size": key, "python": platform.python_version(),
+              "pandas": pd.__version__, "numpy": np.__version__,
+              "kernels": "numba" if kernels.USE_NUMBA else "numpy", "results": results}
+    with open(os.path.join(_bench_dir(), "history.jsonl"), "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+
+    baseline_path = args.baseline or os.path.join(_bench_dir(), "baseline.json")
+    baselines = {}
+    if os.path.exists(baseline_path):
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            baselines = json.load(f)
+    baseline = baselines.get(key, {})
+
+    table = Table(title="Benchmark", box=box.ROUNDED)
+    table.add_column("Benchmark", style="cyan", justify="left")
+    table.add_column("Time (ms)", justify="right")
+    table.add_column("Tickers/s", justify="right")
+    table.add_column("Peak (MB)", justify="right")
+    table.add_column("vs Baseline", justify="right")
+    for name, r in results.items():
+        base = baseline.get(name)
+        change = f"{r['seconds'] / base['seconds'] - 1:+.0%}" if base else "-"
+        table.add_row(name, f"{r['seconds'] * 1000:.1f}", f"{r['per_second']:,.0f}", f"{r['peak_mb']:.1f}", change)
+    console.print(table)
+
+    if args.save_baseline:
+        baselines[key] = results
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(baselines, f, indent=2)
+        console.print(f"Baseline saved to {baseline_path}")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    for name, metric, before, after in regressions:
+        console.print(f"[red]Regression: {name} {metric} {before:.4g} -> {after:.4g}[/red]")
+    if not baseline:
+        console.print("[yellow]No baseline for this size yet (use --save-baseline).[/yellow]")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
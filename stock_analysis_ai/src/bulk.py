@@ -0,0 +1,118 @@
+import random
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+# 流量制限のメッセージ（429 は HTTP のステータスとして書かれている場合だけ。銘柄コード 4290.T などには反応しない）
+_RATE_LIMIT_PATTERN = re.compile(r"rate[ _-]?limit|too many requests|\b(?:http|status(?: code)?|error)\W{0,3}429\b")
+
+
+def _status_code(error):
+    """HTTP エラーのステータスコード（requests / curl_cffi の例外は response に持つ）"""
+    response = getattr(error, "response", None)
+    for source in (response, error):
+        code = getattr(source, "status_code", None)
+        if isinstance(code, int):
+            return code
+    return None
+
+
+def is_rate_limited(error):
+    """プロバイダーの流量制限によるエラーかどうか（長めに待ってから再試行する）"""
+    if _status_code(error) == 429:
+        return True
+    if any("ratelimit" in cls.__name__.lower() for cls in type(error).__mro__):
+        return True
+    return bool(_RATE_LIMIT_PATTERN.search(str(error).lower()))
+
+
+# 通信エラーの例外の型名（requests / curl_cffi の例外は組み込みの ConnectionError を継承しない）。
+# メッセージは銘柄名などを含むので見ない
+_TRANSPORT_TYPE_PATTERN = re.compile(r"connection|timeout|ssl|proxy|nameresolution|network")
+# curl の通信エラーのコード（名前解決・接続・タイムアウト・TLS・切断など）。curl_cffi は型ではなくコードで区別する
+_CURL_TRANSPORT_CODES = {5, 6, 7, 28, 35, 52, 55, 56}
+_CURL_CODE_PATTERN = re.compile(r"\bcurl: \((\d+)\)")
+
+
+def is_transport_error(error):
+    """接続・タイムアウトなど、銘柄によらない通信エラーかどうか（チャンクを分割しても解決しない）"""
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    if any(_TRANSPORT_TYPE_PATTERN.search(cls.__name__.lower()) for cls in type(error).__mro__):
+        return True
+    match = _CURL_CODE_PATTERN.search(str(error))
+    return match is not None and int(match.group(1)) in _CURL_TRANSPORT_CODES
+
+
+def _run_chunk(chunk, download, retries, backoff, max_backoff, sleep):
+    """
+    1チャンクを再試行・バックオフ付きで取得する。銘柄やデータが原因のエラーで失敗し続けた場合は
+    半分に分けて取り直し、問題のある銘柄だけを失敗として切り分ける。流量制限と通信エラーは
+    チャンクごと再試行し、それでも失敗すればチャンクごと失敗とする。
+    Returns: (dict of DataFrames, dict of failed ticker -> reason)
+    """
+    error = None
+    for attempt in range(retries + 1):
+        try:
+            data = download(chunk)
+            break
+        except Exception as e:
+            error = e
+            if attempt < retries:
+                wait = backoff * (2 ** attempt) * (4 if is_rate_limited(e) else 1)
+                sleep(min(max_backoff, wait) * random.uniform(0.5, 1.5))
+    else:
+        # 流量制限と通信エラーは分割しても解決しない（リクエストが増えるだけ）ので、チャンクごと失敗とする
+        if len(chunk) == 1 or is_rate_limited(error) or is_transport_error(error):
+            return {}, {ticker: f"{type(error).__name__}: {error}" for ticker in chunk}
+        mid = len(chunk) // 2
+        data, failed = _run_chunk(chunk[:mid], download, 1, backoff, max_backoff, sleep)
+        right_data, right_failed = _run_chunk(chunk[mid:], download, 1, backoff, max_backoff, sleep)
+        data.update(right_data)
+        failed.update(right_failed)
+        return data, failed
+
+    failed = {ticker: "no data" for ticker in chunk if ticker not in data}
+    return {t: df for t, df in data.items() if t in chunk}, failed
+
+
+def iter_bulk_download(tickers, download, chunk_size=50, max_workers=4, retries=3,
+                       backoff=1.0, max_backoff=60.0, sleep=time.sleep):
+    """
+    Downloads a large ticker universe in chunks with bounded concurrency and per-chunk
+    retry/backoff, yielding (data, failed) for each chunk as soon as it completes.
+    At most max_workers chunks are in flight, so memory stays bounded when the
+    consumer is slower than the downloads.
+    download: callable taking a list of tickers and returning a dict of DataFrames
+    (any data source, e.g. a local stand-in for tests).
+    """
+    tickers = list(dict.fromkeys(tickers))
+    chunks = iter([tickers[i:i + chunk_size] for i in range(0, len(tickers), chunk_size)])
+    max_workers = max(1, max_workers)
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bulk-download") as pool:
+        pending = set()
+        while True:
+            # 取得済みのチャンクが消費されてから次のチャンクを投入する
+            for chunk in chunks:
+                pending.add(pool.submit(_run_chunk, chunk, download, retries, backoff, max_backoff, sleep))
+                if len(pending) >= max_workers:
+                    break
+            if not pending:
+                return
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def bulk_download(tickers, download, **options):
+    """
+    Runs iter_bulk_download to completion.
+    Returns: (dict of DataFrames, dict of failed ticker -> reason)
+    """
+    data, failed = {}, {}
+    for chunk_data, chunk_failed in iter_bulk_download(tickers, download, **options):
+        data.update(chunk_data)
+        failed.update(chunk_failed)
+    return data, failed
@@ -0,0 +1,292 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+import pandas as pd
+
+from .utils import file_lock, get_cache_dir
+
+OHLCV_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+# yfinance が遡って返せる分足・時間足の期間（日数）。
+# これより古いバーは再取得できないので、キャッシュからも削除する。
+PROVIDER_WINDOW_DAYS = {
+    "1m": 30,
+    "2m": 60,
+    "5m": 60,
+    "15m": 60,
+    "30m": 60,
+    "90m": 60,
+    "60m": 730,
+    "1h": 730,
+}
+
+# period 文字列 → 日数（カレンダー日）
+_PERIOD_UNITS = {"d": 1, "wk": 7, "mo": 31, "y": 366}
+
+# "max" で取得済みであることを表す番兵値
+_COVERED_ALL = -(2 ** 62)
+
+
+def period_start(period, interval=None, now=None):
+    """
+    yfinance の period 文字列が指す期間の開始時刻 (UTC) を返す関数。
+    分足はプロバイダーの取得可能期間で切り詰める。"max" の日足は None を返す。
+    """
+    if now is None:
+        now = pd.Timestamp.now(tz="UTC")
+
+    if period == "max":
+        start = None
+    elif period == "ytd":
+        start = pd.Timestamp(year=now.year, month=1, day=1, tz="UTC")
+    else:
+        m = re.fullmatch(r"(\d+)(d|wk|mo|y)", period)
+        if not m:
+            raise ValueError(f"Unknown period: {period}")
+        days = int(m.group(1)) * _PERIOD_UNITS[m.group(2)]
+        start = (now - pd.Timedelta(days=days)).normalize()
+
+    window = PROVIDER_WINDOW_DAYS.get(interval)
+    if window is not None:
+        earliest = now - pd.Timedelta(days=window)
+        if start is None or start < earliest:
+            start = earliest
+    return start
+
+
+def _to_ns(ts):
+    """Timestamp を UTC のエポックナノ秒に変換する（tz なしは UTC とみなす）"""
+    ts = pd.Timestamp(ts)
+    if ts.tzinfo is None:
+        ts = ts.tz_localize("UTC")
+    return int(ts.tz_convert("UTC").value)
+
+
+class OHLCVCache:
+    """
+    銘柄・時間足ごとの OHLCV を SQLite に保存するローカルキャッシュ。
+    取得済みの履歴を保持し、次回以降は最終バー以降の差分だけを取得できるようにする。
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            path = os.path.join(get_cache_dir(), "ohlcv.sqlite")
+        self.path = path
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS ohlcv ("
+                " ticker TEXT NOT NULL, interval TEXT NOT NULL, ts INTEGER NOT NULL,"
+                " open REAL, high REAL, low REAL, close REAL, volume REAL,"
+                " PRIMARY KEY (ticker, interval, ts))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta ("
+                " ticker TEXT NOT NULL, interval TEXT NOT NULL,"
+                " covered_from INTEGER NOT NULL, tz TEXT,"
+                " PRIMARY KEY (ticker, interval))"
+            )
+
+    def _connect(self):
+        # Streamlit はスレッドをまたいで呼ぶので、呼び出しごとに接続を作る
+        return sqlite3.connect(self.path, timeout=30)
+
+    def last_timestamp(self, ticker, interval):
+        """キャッシュ内の最終バーの時刻 (UTC) を返す。なければ None"""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT MAX(ts) FROM ohlcv WHERE ticker = ? AND interval = ?",
+                (ticker, interval),
+            ).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return pd.Timestamp(row[0], tz="UTC")
+
+    def last_closes(self, ticker, interval, n=2):
+        """最後の n 本のバーの終値を返す（インデックスは UTC の時刻、古い順）"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT ts, close FROM ohlcv WHERE ticker = ? AND interval = ? ORDER BY ts DESC LIMIT ?",
+                (ticker, interval, n),
+            ).fetchall()
+        rows.reverse()
+        return pd.Series([row[1] for row in rows], index=pd.to_datetime([row[0] for row in rows], unit="ns", utc=True),
+                         dtype="float64")
+
+    def covers(self, ticker, interval, start):
+        """start 以降の履歴を取得済みかどうか（start=None は全期間）"""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT covered_from FROM meta WHERE ticker = ? AND interval = ?",
+                (ticker, interval),
+            ).fetchone()
+        if row is None:
+            return False
+        if start is None:
+            return row[0] == _COVERED_ALL
+        return row[0] <= _to_ns(start)
+
+    def store(self, ticker, interval, df, covered_from=False):
+        """
+        バーを保存する。同じ時刻のバーは上書き（未確定の最終バーの更新を想定）。
+        covered_from を渡すとその時刻以降を取得済みとして記録する（None は全期間）。
+        """
+        if df is None or df.empty:
+            return
+
+        df = df.reindex(columns=OHLCV_COLUMNS)
+        index = pd.DatetimeIndex(df.index)
+        tz = str(index.tz) if index.tz is not None else ""
+        if index.tz is None:
+            index = index.tz_localize("UTC")
+        ts = index.tz_convert("UTC").as_unit("ns").asi8
+
+        rows = [
+            (ticker, interval, int(t), *(None if pd.isna(v) else float(v) for v in vals))
+            for t, vals in zip(ts, df.to_numpy())
+        ]
+
+        with closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO ohlcv VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            if covered_from is not False:
+                cf = _COVERED_ALL if covered_from is None else _to_ns(covered_from)
+                conn.execute(
+                    "INSERT INTO meta VALUES (?, ?, ?, ?)"
+                    " ON CONFLICT(ticker, interval) DO UPDATE SET"
+                    " covered_from = MIN(covered_from, excluded.covered_from), tz = excluded.tz",
+                    (ticker, interval, cf, tz),
+                )
+            else:
+                conn.execute(
+                    "UPDATE meta SET tz = ? WHERE ticker = ? AND interval = ?",
+                    (tz, ticker, interval),
+                )
+
+    def clear(self, ticker, interval):
+        """銘柄・時間足のバーと取得済みの記録を削除する（遡って調整された価格を取り直す前に使う）"""
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM ohlcv WHERE ticker = ? AND interval = ?", (ticker, interval))
+            conn.execute("DELETE FROM meta WHERE ticker = ? AND interval = ?", (ticker, interval))
+
+    def tickers(self, interval):
+        """interval のバーを保存している銘柄の一覧"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT ticker FROM meta WHERE interval = ? ORDER BY ticker", (interval,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def load(self, ticker, interval, start=None):
+        """start 以降のバーを DataFrame で返す。なければ None"""
+        query = "SELECT ts, open, high, low, close, volume FROM ohlcv WHERE ticker = ? AND interval = ?"
+        params = [ticker, interval]
+        if start is not None:
+            query += " AND ts >= ?"
+            params.append(_to_ns(start))
+        query += " ORDER BY ts"
+
+        with closing(self._connect()) as conn:
+            rows = conn.execute(query, params).fetchall()
+            meta = conn.execute(
+                "SELECT tz FROM meta WHERE ticker = ? AND interval = ?",
+                (ticker, interval),
+            ).fetchone()
+        if not rows:
+            return None
+
+        df = pd.DataFrame(rows, columns=["ts"] + OHLCV_COLUMNS)
+        index = pd.to_datetime(df.pop("ts"), unit="ns", utc=True)
+        tz = meta[0] if meta else ""
+        index = index.dt.tz_convert(tz) if tz else index.dt.tz_localize(None)
+        df.index = pd.DatetimeIndex(index, name="Date")
+        return df
+
+    def evict(self, interval, now=None):
+        """
+        プロバイダーの取得可能期間より古い分足を削除して、キャッシュを圧縮する。
+        日足以上は削除しない。
+        """
+        days = PROVIDER_WINDOW_DAYS.get(interval)
+        if days is None:
+            return 0
+        if now is None:
+            now = pd.Timestamp.now(tz="UTC")
+        cutoff = _to_ns(now - pd.Timedelta(days=days))
+
+        with closing(self._connect()) as conn, conn:
+            cur = conn.execute(
+                "DELETE FROM ohlcv WHERE interval = ? AND ts < ?", (interval, cutoff)
+            )
+            # 削除した範囲はもう取得済みとは言えないので、記録も切り詰める
+            conn.execute(
+                "UPDATE meta SET covered_from = ? WHERE interval = ? AND covered_from < ?",
+                (cutoff, interval, cutoff),
+            )
+            return cur.rowcount
+
+
+class NameCache:
+    """
+    会社名などの銘柄メタデータを JSON に保存するキャッシュ。
+    会社名はほとんど変わらないので、TTL 内は再取得しない。
+    名前はプロバイダーごとに分けて持つ（"プロバイダー名:銘柄" をキーにする）。
+    """
+
+    def __init__(self, path=None, ttl=30 * 24 * 3600):
+        if path is None:
+            path = os.path.join(get_cache_dir(), "names.json")
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = self._read()
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            # 壊れたキャッシュは捨てて取り直す
+            return {}
+        # プロバイダー名のない古い形式のエントリは使わない
+        return {key: entry for key, entry in entries.items() if ":" in key}
+
+    @staticmethod
+    def _key(provider, ticker):
+        return f"{provider}:{ticker}"
+
+    def get(self, provider, ticker, now=None):
+        """provider（プロバイダー名）で取得した TTL 内の会社名を返す。なければ None"""
+        if now is None:
+            now = time.time()
+        with self._lock:
+            entry = self._entries.get(self._key(provider, ticker))
+        if entry is None or now - entry["fetched"] > self.ttl:
+            return None
+        return entry["name"]
+
+    def set_many(self, provider, names, now=None):
+        """
+        provider（プロバイダー名）で取得した会社名をまとめて保存する。
+        他のプロセスが保存した名前を消さないよう、ファイルをロックして読み直してから書く。
+        """
+        if not names:
+            return
+        if now is None:
+            now = time.time()
+        entries = {self._key(provider, ticker): {"name": name, "fetched": now} for ticker, name in names.items()}
+        with self._lock, file_lock(f"{self.path}.lock"):
+            merged = self._read()
+            merged.update(entries)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(merged, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self._entries = merged
@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+
+# 1つのチャートに送るローソク足・線の点数の上限
+MAX_CHART_POINTS = 1500
+
+
+def _bucket_starts(n, max_points):
+    """n 本のバーを max_points 個以下のほぼ同じ大きさの区間に分けた各区間の先頭位置"""
+    buckets = min(n, max_points)
+    return np.unique(np.linspace(0, n, buckets, endpoint=False).astype(np.int64))
+
+
+def downsample_ohlc(df, max_points=MAX_CHART_POINTS):
+    """
+    Aggregates consecutive bars into at most max_points OHLC buckets:
+    first Open, highest High, lowest Low, last Close and summed Volume,
+    stamped with the time of the bucket's first bar.
+    Returns df itself when it already fits.
+    """
+    if len(df) <= max_points:
+        return df
+    starts = _bucket_starts(len(df), max_points)
+    ends = np.append(starts[1:], len(df)) - 1
+
+    out = {}
+    if "Open" in df:
+        out["Open"] = df["Open"].to_numpy()[starts]
+    if "High" in df:
+        out["High"] = np.fmax.reduceat(df["High"].to_numpy(dtype=np.float64), starts)
+    if "Low" in df:
+        out["Low"] = np.fmin.reduceat(df["Low"].to_numpy(dtype=np.float64), starts)
+    if "Close" in df:
+        out["Close"] = df["Close"].to_numpy()[ends]
+    if "Volume" in df:
+        out["Volume"] = np.add.reduceat(np.nan_to_num(df["Volume"].to_numpy(dtype=np.float64)), starts)
+    return pd.DataFrame(out, index=df.index[starts])
+
+
+def lttb_indices(y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: picks n_out points (always the first and last)
+    that keep the visual shape of the line. Bars are treated as equally spaced.
+    Returns: sorted positions into y
+    """
+    n = len(y)
+    if n_out >= n:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1])[:n_out]
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    x = np.arange(n, dtype=np.float64)
+    a = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        # 次の区間の平均点（最後の区間では最終点）
+        nxt_start, nxt_stop = stop, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[nxt_start:nxt_stop].mean()
+        avg_y = y[nxt_start:nxt_stop].mean()
+        # 前に選んだ点・次の区間の平均点と作る三角形の面積が最大の点を選ぶ
+        area = np.abs((x[a] - avg_x) * (y[start:stop] - y[a]) - (x[a] - x[start:stop]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def minmax_indices(y, n_out):
+    """各区間の最小値と最大値の位置を残す（スパイクを落とさない）。Returns: sorted positions"""
+    n = len(y)
+    if n <= n_out:
+        return np.arange(n)
+    bounds = np.append(_bucket_starts(n, max(1, n_out // 2)), n)
+    keep = []
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        segment = y[lo:hi]
+        keep += [lo + int(np.argmin(segment)), lo + int(np.argmax(segment))]
+    return np.unique(keep)
+
+
+def downsample_series(series, max_points=MAX_CHART_POINTS, method="lttb"):
+    """
+    Reduces a line (price or indicator) to at most max_points points.
+    Missing values (e.g. indicator warm-up) are dropped first.
+    method: "lttb" (shape-preserving) or "minmax" (keeps every bucket's extremes)
+    """
+    series = series.dropna()
+    if len(series) <= max_points:
+        return series
+    values = series.to_numpy(dtype=np.float64)
+    if method == "minmax":
+        positions = minmax_indices(values, max_points)
+    else:
+        positions = lttb_indices(values, max_points)
+    return series.iloc[positions]
+
+
+def visible_slice(df, start=None, end=None):
+    """表示範囲 [start, end] のバーだけを返す（None は端まで）"""
+    if start is None and end is None:
+        return df
+    index = df.index
+    lo = 0 if start is None else index.searchsorted(start, side="left")
+    hi = len(index) if end is None else index.searchsorted(end, side="right")
+    return df.iloc[lo:hi]
+
+
+def chart_data(df, columns, start=None, end=None, max_points=MAX_CHART_POINTS):
+    """
+    Prepares one chart: the visible range of df as at most max_points OHLC buckets
+    plus each indicator column downsampled with LTTB. A range with fewer bars than
+    max_points is returned at full resolution.
+    Returns: (OHLC DataFrame, dict of column -> Series)
+    """
+    view = visible_slice(df, start, end)
+    lines = {col: downsample_series(view[col], max_points) for col in columns if col in view}
+    return downsample_ohlc(view, max_points), lines
@@ -1,81 +1,440 @@
-import yfinance as yf
+import asyncio
+import threading
+import time
+import numpy as np
 import pandas as pd
 import os
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import partial
 
-def fetch_stock_data(tickers, period="1y", interval="1d"):
+from .bulk import bulk_download, iter_bulk_download
+from .cache import OHLCVCache, NameCache, period_start, PROVIDER_WINDOW_DAYS
+from .profiling import profiler
+from .providers import get_provider
+
+# 一度のダウンロードに渡す銘柄数と、再試行の回数
+DOWNLOAD_CHUNK_SIZE = 50
+DOWNLOAD_RETRIES = 3
+
+# 再取得したバーがキャッシュの値とこれ以上違えば、価格が調整し直されたとみなす（相対誤差）
+ADJUSTMENT_TOLERANCE = 1e-4
+
+# 同時に呼べるプロバイダーでチャンクを並行して取得するスレッド数
+DOWNLOAD_WORKERS = 4
+
+# 非同期の取得で1チャンクを待つ上限は、プロバイダーの1リクエストのタイムアウトの何倍か
+# （再試行と、差分取得の後の取り直しの分を見込む）
+FETCH_TIMEOUT_FACTOR = 2 * (DOWNLOAD_RETRIES + 1)
+
+# 会社名の問い合わせを並行して行うスレッド数。各スレッドは共有セッションの接続を1本ずつ使い回すので、
+# これが接続プールの大きさになる（銘柄が何百あっても接続は増えない）
+NAME_LOOKUP_WORKERS = 8
+
+_name_executor = ThreadPoolExecutor(max_workers=NAME_LOOKUP_WORKERS, thread_name_prefix="name-lookup")
+# 非同期の取得でチャンクを実行するスレッド。asyncio.run は既定のスレッドプールの終了を待つので、
+# 打ち切ったチャンクがイベントループの終了まで止めないよう別のプールで実行する
+_fetch_executor = ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS * 2, thread_name_prefix="fetch")
+_name_cache = None
+# 問い合わせ中の会社名 (プロバイダー名, 銘柄) -> future。同じ銘柄を同時に何度も問い合わせない
+_pending_names = {}
+_pending_lock = threading.Lock()
+# 分析の後で取れた会社名 プロバイダー名 -> {銘柄: 会社名}。まとめて1回でキャッシュに書く
+_late_names = {}
+_late_lock = threading.Lock()
+
+
+def _get_name_cache():
+    global _name_cache
+    if _name_cache is None:
+        _name_cache = NameCache()
+    return _name_cache
+
+
+def _download_chunk(tickers, provider, **kwargs):
+    start = time.perf_counter()
+    data = provider.download(tickers, **kwargs)
+    elapsed = time.perf_counter() - start
+    profiler.record("download", elapsed)
+    # チャンクの銘柄はまとめて届くので、各銘柄の待ち時間はチャンクの所要時間とする
+    profiler.observe("ticker_fetch_seconds", elapsed, n=len(data))
+    return data
+
+
+def fetch_bulk(tickers, provider=None, chunk_size=DOWNLOAD_CHUNK_SIZE, retries=DOWNLOAD_RETRIES, **kwargs):
+    """
+    Downloads prices in chunks with retry/backoff, isolating tickers that fail.
+    kwargs are passed to provider.download (period, start, interval).
+    Returns: (dict of DataFrames, dict of failed ticker -> reason)
     """
-    Fetches historical stock data and company names.
+    provider = get_provider(provider)
+    # 同時に呼べないプロバイダー（yfinance）はチャンクを順番に取得する
+    max_workers = DOWNLOAD_WORKERS if provider.concurrent else 1
+    return bulk_download(tickers, partial(_download_chunk, provider=provider, **kwargs),
+                         chunk_size=chunk_size, max_workers=max_workers, retries=retries)
+
+
+def _download(tickers, provider, **kwargs):
+    data, failed = fetch_bulk(tickers, provider, **kwargs)
+    if failed:
+        print(f"Failed to fetch {len(failed)} tickers: {', '.join(sorted(failed))}")
+    # チャンクは終わった順に届くので、銘柄の並びを入力どおりに戻す
+    return {ticker: data[ticker] for ticker in tickers if ticker in data}
+
+
+def _readjusted(df, anchor):
+    """
+    再取得したデータで、確定済みのバー anchor (時刻, 終値) の値がキャッシュと違うかどうか。
+    auto_adjust の価格は配当・分割のたびに過去まで遡って書き換わるので、違えばキャッシュは使えない。
+    """
+    if anchor is None:
+        return False
+    ts, close = anchor
+    index = pd.DatetimeIndex(df.index)
+    index = index.tz_localize("UTC") if index.tz is None else index.tz_convert("UTC")
+    match = df["Close"].to_numpy()[index == ts]
+    return len(match) > 0 and not np.isclose(match[0], close, rtol=ADJUSTMENT_TOLERANCE)
+
+
+def _fetch_with_cache(tickers, period, interval, cache, provider):
+    """
+    キャッシュ済みの銘柄は最終バー以降だけを取得し、それ以外は period 全体を取得する。
+    """
+    now = pd.Timestamp.now(tz="UTC")
+    start = period_start(period, interval, now)
+    window = PROVIDER_WINDOW_DAYS.get(interval)
+
+    full, delta, anchors = [], {}, {}
+    for ticker in tickers:
+        last = cache.last_timestamp(ticker, interval)
+        # 最終バーがプロバイダーの取得可能期間より古い場合は差分を取れないので全体を取り直す
+        stale = last is None or (window is not None and last < now - pd.Timedelta(days=window))
+        if stale or not cache.covers(ticker, interval, start):
+            full.append(ticker)
+        else:
+            # 最終バーの1本前（確定済み）から取り直し、その終値で価格の調整し直しを検出する
+            closes = cache.last_closes(ticker, interval, 2)
+            if len(closes) > 1:
+                anchors[ticker] = (closes.index[0], closes.iloc[0])
+            delta[ticker] = closes.index[0] if len(closes) else last
+    profiler.count("ohlcv_cache_misses", len(full))
+    profiler.count("ohlcv_cache_hits", len(delta))
+
+    if full:
+        for ticker, df in _download(full, provider, period=period, interval=interval).items():
+            cache.store(ticker, interval, df, covered_from=start)
+
+    if delta:
+        # 最終バーは未確定の可能性があるので、取り直して上書きする
+        since = min(delta.values())
+        since = since.date() if window is None else since.to_pydatetime()
+        try:
+            new_data = _download(list(delta), provider, start=since, interval=interval)
+        except Exception as e:
+            # 差分が取れなくてもキャッシュ済みのデータで分析は続けられる
+            print(f"Delta fetch failed, using cached data: {e}")
+            new_data = {}
+        adjusted = [ticker for ticker, df in new_data.items() if _readjusted(df, anchors.get(ticker))]
+        for ticker, df in new_data.items():
+            if ticker not in adjusted:
+                cache.store(ticker, interval, df)
+        if adjusted:
+            # 配当・分割で過去の価格が変わった銘柄は、period 全体を取り直して置き換える
+            profiler.count("ohlcv_readjusted", len(adjusted))
+            for ticker, df in _download(adjusted, provider, period=period, interval=interval).items():
+                cache.clear(ticker, interval)
+                cache.store(ticker, interval, df, covered_from=start)
+
+    cache.evict(interval, now)
+
+    data = {}
+    for ticker in tickers:
+        df = cache.load(ticker, interval, start)
+        if df is not None:
+            df = df.dropna(subset=['Close'])
+            if not df.empty:
+                data[ticker] = df
+    return data
+
+
+def _lookup_name(ticker, provider):
+    """プロバイダーに会社名を問い合わせる。失敗した場合は None（キャッシュしない）"""
+    start = time.perf_counter()
+    try:
+        return provider.company_name(ticker)
+    except Exception:
+        return None
+    finally:
+        elapsed = time.perf_counter() - start
+        profiler.record("name_lookup", elapsed)
+        profiler.observe("name_lookup_seconds", elapsed)
+
+
+def _forget_pending(key, future):
+    with _pending_lock:
+        if _pending_names.get(key) is future:
+            del _pending_names[key]
+
+
+def _submit_name_lookup(ticker, provider):
+    """問い合わせ中の同じ銘柄があればその future を使い回し、なければ新しく問い合わせる"""
+    key = (provider.name, ticker)
+    with _pending_lock:
+        future = _pending_names.get(key)
+        if future is not None:
+            return future
+        future = _name_executor.submit(_lookup_name, ticker, provider)
+        _pending_names[key] = future
+    # 終わっていればその場で呼ばれるので、ロックの外で登録する
+    future.add_done_callback(lambda f: _forget_pending(key, f))
+    return future
+
+
+def _start_name_lookup(tickers, provider):
+    """
+    キャッシュにある会社名を返し、ない銘柄の問い合わせをスレッドプールで開始する。
+    キャッシュを使わないプロバイダー（ローカルのファイルなど）はその場で引く。
+    Returns: (dict of cached names, dict of futures)
+    """
+    names, futures = {}, {}
+    if not provider.cacheable:
+        for ticker in tickers:
+            names[ticker] = _lookup_name(ticker, provider) or ticker
+        return names, futures
+
+    cache = _get_name_cache()
+    for ticker in tickers:
+        name = cache.get(provider.name, ticker)
+        if name is not None:
+            names[ticker] = name
+        else:
+            futures[ticker] = _submit_name_lookup(ticker, provider)
+    profiler.count("name_cache_hits", len(names))
+    profiler.count("name_cache_misses", len(futures))
+    return names, futures
+
+
+def _flush_late_names():
+    """たまった会社名をプロバイダーごとに1回の書き込みで保存する"""
+    with _late_lock:
+        batch = dict(_late_names)
+        _late_names.clear()
+    cache = _get_name_cache()
+    for provider_name, names in batch.items():
+        cache.set_many(provider_name, names)
+
+
+def _cache_late_name(provider_name, ticker, future):
+    name = future.result()
+    if name is None:
+        return
+    with _late_lock:
+        first = not _late_names
+        _late_names.setdefault(provider_name, {})[ticker] = name
+    if first:
+        # 問い合わせの後ろに並べるので、書き込むまでに終わった他の銘柄もまとめて保存される
+        try:
+            _name_executor.submit(_flush_late_names)
+        except RuntimeError:
+            # インタープリター終了中（スレッドプールが止まっている）
+            _flush_late_names()
+
+
+def _collect_names(names, futures, provider, timeout=None):
+    """
+    provider に問い合わせた結果を待って names に加える。timeout までに取れなかった銘柄はティッカーで代用し、
+    取得が終わり次第キャッシュに保存する（次回の分析で使われる）。
+    """
+    if not futures:
+        return names
+    cache = _get_name_cache()
+    done, _ = wait(futures.values(), timeout=timeout)
+
+    resolved = {}
+    for ticker, future in futures.items():
+        if future in done:
+            name = future.result()
+            if name is not None:
+                resolved[ticker] = name
+            names[ticker] = name or ticker
+        else:
+            names[ticker] = ticker
+            future.add_done_callback(lambda f, t=ticker: _cache_late_name(provider.name, t, f))
+    cache.set_many(provider.name, resolved)
+    return names
+
+
+def _run_sync(coro):
+    """コルーチンを最後まで実行する。イベントループの中から呼ばれた場合は別スレッドで実行する"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, coro).result()
+
+
+async def _await_names(names, futures, provider, timeout):
+    # スレッドプールの Future はイベントループに結び付けずに待つ（ループが閉じた後に終わっても安全）
+    if futures:
+        await asyncio.to_thread(wait, list(futures.values()), timeout)
+    return _collect_names(names, futures, provider, timeout=0)
+
+
+async def afetch_company_names(tickers, timeout=None, provider=None):
+    """
+    Async variant of fetch_company_names.
+    Returns: dict of company names
+    """
+    if isinstance(tickers, str):
+        tickers = [tickers]
+    provider = get_provider(provider)
+    names, futures = _start_name_lookup(tickers, provider)
+    return await _await_names(names, futures, provider, timeout)
+
+
+def fetch_company_names(tickers, timeout=None, provider=None):
+    """
+    Fetches company names, using the name cache and resolving misses concurrently.
+    Returns: dict of company names
+    """
+    return _run_sync(afetch_company_names(tickers, timeout, provider))
+
+
+def _resolved_names(tickers, names, futures):
+    """その時点で分かっている会社名（問い合わせ中の銘柄はティッカー）"""
+    resolved = {}
+    for ticker in tickers:
+        future = futures.get(ticker)
+        if ticker in names:
+            resolved[ticker] = names[ticker]
+        elif future is not None and future.done():
+            resolved[ticker] = future.result() or ticker
+        else:
+            resolved[ticker] = ticker
+    return resolved
+
+
+def iter_stock_data(tickers, period="1y", interval="1d", use_cache=True, provider=None,
+                    chunk_size=DOWNLOAD_CHUNK_SIZE):
+    """
+    Streaming variant of fetch_stock_data: yields (dict of DataFrames, dict of company
+    names) for each chunk of tickers as soon as it has been downloaded, so callers can
+    start working before the whole watchlist has arrived. Names that are still being
+    looked up fall back to the ticker and are cached once resolved.
+    """
+    if isinstance(tickers, str):
+        tickers = [tickers]
+    tickers = list(dict.fromkeys(tickers))
+    if not tickers:
+        return
+
+    provider = get_provider(provider)
+    cached_names, name_futures = _start_name_lookup(tickers, provider)
+
+    if use_cache and provider.cacheable:
+        # キャッシュの差分取得はチャンクごとに順番に行う（取得中のデータは1チャンク分だけ）
+        cache = OHLCVCache()
+        chunks = ((tickers[i:i + chunk_size], None) for i in range(0, len(tickers), chunk_size))
+        results = ((_fetch_with_cache(chunk, period, interval, cache, provider), failed)
+                   for chunk, failed in chunks)
+    else:
+        max_workers = DOWNLOAD_WORKERS if provider.concurrent else 1
+        results = iter_bulk_download(
+            tickers, partial(_download_chunk, provider=provider, period=period, interval=interval),
+            chunk_size=chunk_size, max_workers=max_workers, retries=DOWNLOAD_RETRIES)
+
+    try:
+        for data, failed in results:
+            if failed:
+                print(f"Failed to fetch {len(failed)} tickers: {', '.join(sorted(failed))}")
+            if data:
+                yield data, _resolved_names(data, cached_names, name_futures)
+    finally:
+        # 問い合わせ中の会社名は、取得が終わり次第キャッシュに保存する
+        _collect_names(cached_names, name_futures, provider, timeout=0)
+
+
+async def _afetch_chunks(tickers, fetch, workers, timeout):
+    """
+    チャンクごとに fetch をスレッドで実行し、timeout 秒で待つのをやめる（イベントループは止めない）。
+    打ち切ったチャンクの銘柄は結果に含めない（スレッドは止められないので、終わるまで裏で動く）。
+    Returns: dict of DataFrames (銘柄の並びは入力どおり)
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(workers)
+
+    async def run(chunk):
+        async with semaphore:
+            try:
+                return await asyncio.wait_for(loop.run_in_executor(_fetch_executor, fetch, chunk), timeout)
+            except asyncio.TimeoutError:
+                print(f"Timed out after {timeout:g}s fetching {len(chunk)} tickers: {', '.join(chunk)}")
+                profiler.count("fetch_timeouts", len(chunk))
+                return {}
+
+    chunks = [tickers[i:i + DOWNLOAD_CHUNK_SIZE] for i in range(0, len(tickers), DOWNLOAD_CHUNK_SIZE)]
+    data = {}
+    for result in await asyncio.gather(*(run(chunk) for chunk in chunks)):
+        data.update(result)
+    return {ticker: data[ticker] for ticker in tickers if ticker in data}
+
+
+async def afetch_stock_data(tickers, period="1y", interval="1d", use_cache=True, names_timeout=5, provider=None):
+    """
+    Fetches historical stock data and company names without blocking the event loop.
+    provider: data provider, its name or spec (default: see providers.get_provider)
+    With use_cache, history is kept in a local OHLCV cache and only new bars are downloaded
+    (providers that read local files are always read directly).
+    Company names are resolved in the background while prices download; names not
+    resolved within names_timeout seconds after the download fall back to the ticker.
+    Each chunk of tickers is awaited for at most FETCH_TIMEOUT_FACTOR times the
+    provider's request timeout; tickers of a chunk that takes longer are left out.
     Returns: (dict of DataFrames, dict of company names)
     """
     data = {}
     names = {}
-    
+
     if not tickers:
         return data, names
-        
+
     print(f"Fetching data and names for: {tickers}")
-    
+
     try:
         # Ensure tickers is a list
         if isinstance(tickers, str):
             tickers = [tickers]
 
-        # 常に group_by='ticker' を指定して、一貫したデータ構造の取得を試みる
-        df = yf.download(tickers, period=period, interval=interval, group_by='ticker', auto_adjust=True, threads=True, progress=False)
-        
-        if df is None or df.empty:
-            print("No data received from yfinance.")
-            return data, names
+        provider = get_provider(provider)
 
-        for ticker in tickers:
-            ticker_df = None
-            
-            # 1. データの抽出
-            if isinstance(df.columns, pd.MultiIndex):
-                # group_by='ticker' の場合は第1レベルがティッカー名
-                if ticker in df.columns.levels[0]:
-                    try:
-                        ticker_df = df[ticker].copy()
-                    except KeyError:
-                        continue
-            else:
-                # 銘柄が1つで、かつ yfinance が MultiIndex を返さなかった場合
-                if len(tickers) == 1:
-                    ticker_df = df.copy()
-
-            # 2. データのクリーンアップ
-            if ticker_df is not None and not ticker_df.empty:
-                # 列を確実に1階層（Open, High, Low, Close, Volume）にする
-                if isinstance(ticker_df.columns, pd.MultiIndex):
-                    ticker_df.columns = ticker_df.columns.get_level_values(-1)
-                
-                # 重複する列名があれば最初のものだけを残す（これが重要）
-                ticker_df = ticker_df.loc[:, ~ticker_df.columns.duplicated()]
-                
-                # インデックスがDatetimeでない場合は変換を試みる（yfinanceのバージョンによる）
-                if not isinstance(ticker_df.index, pd.DatetimeIndex):
-                    ticker_df.index = pd.to_datetime(ticker_df.index)
-                
-                # 必要な列が揃っているかチェック
-                if 'Close' in ticker_df.columns:
-                    ticker_df.dropna(subset=['Close'], inplace=True)
-                    if not ticker_df.empty:
-                        data[ticker] = ticker_df
+        # 1. 会社名の問い合わせを先に開始し、価格のダウンロードと並行させる
+        cached_names, name_futures = _start_name_lookup(tickers, provider)
+
+        if use_cache and provider.cacheable:
+            # キャッシュの差分取得はチャンクごとに順番に行う
+            fetch = partial(_fetch_with_cache, period=period, interval=interval, cache=OHLCVCache(), provider=provider)
+            workers = 1
+        else:
+            fetch = partial(_download, provider=provider, period=period, interval=interval)
+            workers = DOWNLOAD_WORKERS if provider.concurrent else 1
+        timeout = None if provider.timeout is None else provider.timeout * FETCH_TIMEOUT_FACTOR
+        data = await _afetch_chunks(list(dict.fromkeys(tickers)), fetch, workers, timeout)
 
+        if not data:
+            return data, names
 
         # 2. 会社名の取得
-        for ticker in tickers:
-            try:
-                t = yf.Ticker(ticker)
-                # get_info() は遅いので、見つかればラッキー程度に処理
-                info = t.info
-                name = info.get('longName') or info.get('shortName') or ticker
-                names[ticker] = name
-            except:
-                names[ticker] = ticker
+        names = await _await_names(cached_names, name_futures, provider, names_timeout)
 
     except Exception as e:
         print(f"Error in fetch_stock_data: {e}")
-    
+
     # 明示的に2つの要素を持つタプルを返す
     return (data, names)
+
+
+def fetch_stock_data(tickers, period="1y", interval="1d", use_cache=True, names_timeout=5, provider=None):
+    """
+    Synchronous wrapper of afetch_stock_data.
+    Returns: (dict of DataFrames, dict of company names)
+    """
+    return _run_sync(afetch_stock_data(tickers, period, interval, use_cache, names_timeout, provider))
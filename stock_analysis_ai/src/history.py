@@ -0,0 +1,264 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from .indicators import settings_digest
+from .scorer import SIGNAL_NAMES
+from .utils import file_lock, get_cache_dir
+
+# 履歴の列（1列1ファイルの追記専用バイナリ）と型
+HISTORY_COLUMNS = {
+    "time": np.dtype("<i8"),     # スキャンの時刻（UTC のエポックナノ秒）
+    "ticker": np.dtype("<i4"),   # tickers.json の位置
+    "close": np.dtype("<f8"),
+    "score": np.dtype("<i2"),
+    "signal": np.dtype("<i1"),   # SIGNAL_NAMES の位置
+    "reason": np.dtype("<i2"),   # ReasonCode（render_reasons で文字列にする）
+}
+
+# これ以上スコアが動いたらアラートにする
+SCORE_JUMP = 20
+
+# アラートの種類
+ALERT_NEW_BUY, ALERT_FLIP, ALERT_SCORE_JUMP = "new_buy", "flip", "score_jump"
+
+# 同じディレクトリへの追記はプロセス内で1つずつ行う
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _time_ns(ts):
+    """時刻を UTC のエポックナノ秒にする（tz なしは UTC とみなす）"""
+    ts = pd.Timestamp(ts)
+    if ts.tzinfo is None:
+        ts = ts.tz_localize("UTC")
+    return int(ts.tz_convert("UTC").value)
+
+
+def _lock_for(path):
+    with _locks_guard:
+        return _locks.setdefault(path, threading.Lock())
+
+
+def diff_snapshots(previous, current, score_jump=SCORE_JUMP):
+    """
+    Compares two scans and returns the alerts: a ticker turning BUY (new_buy), any other
+    signal change (flip) and a score move of at least score_jump points (score_jump).
+    previous / current: dict of ticker -> {"Score", "Signal", ...}
+    Returns: list of alert dicts (Ticker, Kind, From, To, Score, PrevScore)
+    """
+    alerts = []
+    for ticker, row in current.items():
+        prev = previous.get(ticker)
+        prev_signal = prev["Signal"] if prev is not None else None
+        prev_score = prev["Score"] if prev is not None else None
+        base = {"Ticker": ticker, "From": prev_signal, "To": row["Signal"],
+                "Score": row["Score"], "PrevScore": prev_score}
+        if row["Signal"] == "BUY" and prev_signal != "BUY":
+            alerts.append({**base, "Kind": ALERT_NEW_BUY})
+        elif prev is not None and row["Signal"] != prev_signal:
+            alerts.append({**base, "Kind": ALERT_FLIP})
+        if prev is not None and abs(row["Score"] - prev_score) >= score_jump:
+            alerts.append({**base, "Kind": ALERT_SCORE_JUMP})
+    return alerts
+
+
+def tickers_digest(tickers):
+    """銘柄の一覧から作る短いキー（並び順には依存しない）"""
+    raw = json.dumps(sorted(tickers))
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
+
+
+class ResultHistory:
+    """
+    Append-only history of scan results (time, ticker, close, score, signal, reason code)
+    for one watchlist, interval, period and indicator settings. Each column is a raw binary file that every
+    scan appends to, so writing costs only the new rows and reading maps the files
+    without parsing. Rows are in scan order, so time ranges are found by binary search.
+    The last state of every ticker is kept in latest.json so alerts are a diff against it.
+    """
+
+    def __init__(self, interval, period, tickers, settings, root=None):
+        if root is None:
+            root = os.path.join(get_cache_dir(), "history")
+        # 銘柄や期間が違うスキャン同士を比べるとアラートが誤って出るので、別々に記録する
+        name = f"{interval}-{period}-{tickers_digest(tickers)}-{settings_digest(settings)}"
+        self.path = os.path.join(root, name)
+        os.makedirs(self.path, exist_ok=True)
+        self._lock = _lock_for(self.path)
+
+    # --- ファイル ---
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _read_json(self, name, default):
+        try:
+            with open(self._file(name), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return default
+
+    def _write_json(self, name, value):
+        tmp_path = f"{self._file(name)}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(value, f)
+        os.replace(tmp_path, self._file(name))
+
+    def __len__(self):
+        """全列が揃っている行数（追記途中で止まった列の余りは数えない）"""
+        rows = []
+        for name, dtype in HISTORY_COLUMNS.items():
+            try:
+                rows.append(os.path.getsize(self._file(f"{name}.bin")) // dtype.itemsize)
+            except OSError:
+                return 0
+        return min(rows)
+
+    def column(self, name, rows=None):
+        """列をメモリマップで開く（読み取り専用）"""
+        rows = len(self) if rows is None else rows
+        if rows == 0:
+            return np.empty(0, dtype=HISTORY_COLUMNS[name])
+        return np.memmap(self._file(f"{name}.bin"), dtype=HISTORY_COLUMNS[name], mode="r", shape=(rows,))
+
+    # --- 書き込み ---
+
+    def append(self, ranking, scanned_at=None, score_jump=SCORE_JUMP):
+        """
+        Appends one scan and records the alerts it raises against the previous scan.
+        ranking: DataFrame or list of rows with Ticker, Close, Score, Signal, ReasonCode
+        Returns: list of alert dicts (see diff_snapshots), each with the scan "Time"
+        """
+        rows = pd.DataFrame(ranking)
+        if rows.empty:
+            return []
+
+        # 行数の確認から latest.json の更新までを、プロセス内外のどちらとも排他して行う
+        with self._lock, file_lock(self._file("append.lock")):
+            existing = len(self)
+            scanned_at = time.time_ns() if scanned_at is None else _time_ns(scanned_at)
+            if existing:
+                # 時刻の列は昇順に保つ（二分探索で期間を切り出すため）
+                scanned_at = max(scanned_at, int(self.column("time", existing)[-1]))
+
+            tickers = self._read_json("tickers.json", [])
+            ids = {ticker: i for i, ticker in enumerate(tickers)}
+            new = [t for t in dict.fromkeys(rows["Ticker"]) if t not in ids]
+            if new:
+                for ticker in new:
+                    ids[ticker] = len(tickers)
+                    tickers.append(ticker)
+                # 銘柄の一覧は行より先に書く（行が参照する銘柄は必ず一覧にある）
+                self._write_json("tickers.json", tickers)
+
+            signal_codes = {name: i for i, name in enumerate(SIGNAL_NAMES)}
+            values = {
+                "time": np.full(len(rows), scanned_at),
+                "ticker": rows["Ticker"].map(ids).to_numpy(),
+                "close": rows["Close"].to_numpy(dtype=np.float64),
+                "score": rows["Score"].to_numpy(),
+                "signal": rows["Signal"].map(signal_codes).fillna(-1).to_numpy(),
+                "reason": rows["ReasonCode"].to_numpy(),
+            }
+            # 前回の追記が途中で止まっていたら、揃っている行数まで切り詰めてから追記する
+            for name, dtype in HISTORY_COLUMNS.items():
+                with open(self._file(f"{name}.bin"), "ab") as f:
+                    f.truncate(existing * dtype.itemsize)
+                    f.write(np.ascontiguousarray(values[name], dtype=dtype).tobytes())
+
+            previous = self._read_json("latest.json", {})
+            current = {row["Ticker"]: {"Score": int(row["Score"]), "Signal": row["Signal"],
+                                       "Close": float(row["Close"]), "Time": scanned_at}
+                       for row in rows.to_dict("records")}
+            alerts = [{**alert, "Time": scanned_at}
+                      for alert in diff_snapshots(previous, current, score_jump)]
+            self._write_json("latest.json", {**previous, **current})
+            if alerts:
+                with open(self._file("alerts.jsonl"), "a", encoding="utf-8") as f:
+                    for alert in alerts:
+                        f.write(json.dumps(alert, default=int) + "\n")
+        return alerts
+
+    # --- 読み出し ---
+
+    def latest(self):
+        """銘柄ごとの直近のスキャン結果。Returns: dict of ticker -> {Score, Signal, Close, Time}"""
+        return self._read_json("latest.json", {})
+
+    def query(self, tickers=None, start=None, end=None):
+        """
+        Rows of the scans in [start, end] (None: open-ended) for tickers (None: all).
+        Returns: DataFrame with Time, Ticker, Close, Score, Signal and ReasonCode
+        """
+        rows = len(self)
+        times = self.column("time", rows)
+        lo = 0 if start is None else int(np.searchsorted(times, _time_ns(start), side="left"))
+        hi = rows if end is None else int(np.searchsorted(times, _time_ns(end), side="right"))
+
+        names = np.array(self._read_json("tickers.json", []), dtype=object)
+        ticker_ids = np.asarray(self.column("ticker", rows)[lo:hi])
+        keep = slice(None)
+        if tickers is not None:
+            wanted = [i for i, t in enumerate(names) if t in set(tickers)]
+            keep = np.isin(ticker_ids, wanted)
+
+        signals = np.array(SIGNAL_NAMES + ["NO DATA"], dtype=object)
+        return pd.DataFrame({
+            "Time": pd.to_datetime(np.asarray(times[lo:hi])[keep], unit="ns", utc=True),
+            "Ticker": names[ticker_ids[keep]] if len(names) else np.empty(0, dtype=object),
+            "Close": np.asarray(self.column("close", rows)[lo:hi])[keep],
+            "Score": np.asarray(self.column("score", rows)[lo:hi])[keep].astype(np.int64),
+            "Signal": signals[np.asarray(self.column("signal", rows)[lo:hi])[keep]],
+            "ReasonCode": np.asarray(self.column("reason", rows)[lo:hi])[keep].astype(np.int64),
+        })
+
+    def _tail_lines(self, name, block_size=64 * 1024):
+        """ファイルの行を末尾から順に返す（必要な分だけ後ろから読む）"""
+        try:
+            f = open(self._file(name), "rb")
+        except OSError:
+            return
+        with f:
+            position = f.seek(0, os.SEEK_END)
+            rest = b""
+            while position > 0:
+                size = min(block_size, position)
+                position -= size
+                f.seek(position)
+                lines = (f.read(size) + rest).split(b"\n")
+                rest = lines.pop(0)
+                for line in reversed(lines):
+                    if line:
+                        yield line.decode("utf-8")
+            if rest:
+                yield rest.decode("utf-8")
+
+    def alerts(self, limit=None, since=None, tickers=None):
+        """
+        Recorded alerts for tickers (None: all), newest first. limit applies after the filter.
+        Returns: DataFrame with Time, Ticker, Kind, From, To, Score and PrevScore
+        """
+        alerts = []
+        since_ns = None if since is None else _time_ns(since)
+        wanted = None if tickers is None else set(tickers)
+        for line in self._tail_lines("alerts.jsonl"):
+            try:
+                alert = json.loads(line)
+            except ValueError:
+                continue
+            if since_ns is not None and alert["Time"] < since_ns:
+                break
+            if wanted is not None and alert["Ticker"] not in wanted:
+                continue
+            alerts.append(alert)
+            if limit is not None and len(alerts) >= limit:
+                break
+        frame = pd.DataFrame(alerts, columns=["Time", "Ticker", "Kind", "From", "To", "Score", "PrevScore"])
+        frame["Time"] = pd.to_datetime(frame["Time"], unit="ns", utc=True)
+        return frame
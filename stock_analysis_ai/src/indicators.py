@@ -1,31 +1,463 @@
+import hashlib
+import json
+import math
+from collections import deque
+
 import pandas as pd
 import numpy as np
 
+from . import kernels
+
 def calculate_indicators(df, settings):
     """
     Calculates technical indicators for a given DataFrame without external TA libraries.
     Supports Python 3.14+.
+    SMA, RSI and MACD come from one pass of kernels.indicators over Close; the values
+    are the same as the pandas rolling / ewm formulas they replace:
+    SMA = Close.rolling(window).mean(), RSI = 100 - 100 / (100 + gain / loss) with
+    gain / loss the rolling means of the positive / negative Close.diff(), and
+    MACD = EMA(fast) - EMA(slow) with the signal line EMA(signal) of MACD (ewm(adjust=False)).
     """
     df = df.sort_index()
 
-    # --- SMA ---
-    df[f"SMA_{settings['ma_short']}"] = df['Close'].rolling(window=settings['ma_short']).mean()
-    df[f"SMA_{settings['ma_long']}"] = df['Close'].rolling(window=settings['ma_long']).mean()
-
-    # --- RSI ---
-    delta = df['Close'].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=settings['rsi_window']).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=settings['rsi_window']).mean()
-    rs = gain / loss
-    df[f"RSI_{settings['rsi_window']}"] = 100 - (100 / (100 + rs))
-
-    # --- MACD ---
-    ema_fast = df['Close'].ewm(span=settings['macd_fast'], adjust=False).mean()
-    ema_slow = df['Close'].ewm(span=settings['macd_slow'], adjust=False).mean()
-    macd_val = ema_fast - ema_slow
-    signal_line = macd_val.ewm(span=settings['macd_signal'], adjust=False).mean()
-    
-    df[f"MACD_{settings['macd_fast']}_{settings['macd_slow']}_{settings['macd_signal']}"] = macd_val
-    df[f"MACDs_{settings['macd_fast']}_{settings['macd_slow']}_{settings['macd_signal']}"] = signal_line
+    # SMA short/long, RSI, MACD, MACD signal の順
+    for name, values in zip(indicator_columns(settings).values(), kernels.indicators(df['Close'].to_numpy(), settings)):
+        df[name] = values
 
     return df
+
+
+def indicator_columns(settings):
+    """
+    Returns the indicator column names used by calculate_indicators for the given settings.
+    """
+    macd_suffix = f"{settings['macd_fast']}_{settings['macd_slow']}_{settings['macd_signal']}"
+    return {
+        "sma_short": f"SMA_{settings['ma_short']}",
+        "sma_long": f"SMA_{settings['ma_long']}",
+        "rsi": f"RSI_{settings['rsi_window']}",
+        "macd": f"MACD_{macd_suffix}",
+        "macd_signal": f"MACDs_{macd_suffix}",
+    }
+
+
+def warmup_bars(settings):
+    """すべての指標に値が出るまでに必要なバーの本数（SMA は窓の本数、RSI は差分の分だけ1本多く要る）"""
+    return max(settings['ma_short'], settings['ma_long'], settings['rsi_window'] + 1)
+
+
+# 指標の値を決める設定の項目
+INDICATOR_SETTINGS = ('ma_short', 'ma_long', 'rsi_window', 'macd_fast', 'macd_slow', 'macd_signal')
+
+
+def settings_digest(settings):
+    """指標の設定だけから作る短いキー（保存先のファイル名用）"""
+    raw = json.dumps([settings[k] for k in INDICATOR_SETTINGS])
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
+
+
+def _pack_valid(values):
+    """
+    各列の有効値（NaN 以外）を上に詰める。
+    銘柄ごとに dropna した系列と同じ並びにするための処理。
+    Returns: (詰めた配列, 元の行位置, 有効値マスク)
+    """
+    valid = ~np.isnan(values)
+    order = np.argsort(~valid, axis=0, kind="stable")
+    return np.take_along_axis(values, order, axis=0), order, valid
+
+
+def _unpack_valid(packed, order, valid, fill=np.nan):
+    out = np.empty_like(packed)
+    np.put_along_axis(out, order, packed, axis=0)
+    out[~valid] = fill
+    return out
+
+
+class PackedClose:
+    """
+    Close パネル (time × tickers) を銘柄ごとに有効値を詰めた形で持ち、指標の部品を計算する。
+    パラメータスイープなどで同じ部品（同じ窓の SMA など）を使い回すためのもの。
+    """
+
+    def __init__(self, close):
+        packed, order, valid = _pack_valid(np.asarray(close, dtype=np.float64))
+        self._set(packed, order, valid)
+
+    @classmethod
+    def from_packed(cls, packed, order, valid):
+        """詰めた後の配列（共有メモリ上のものなど）からコピーせずに作る"""
+        panel = cls.__new__(cls)
+        panel._set(packed, order, valid)
+        return panel
+
+    def _set(self, packed, order, valid):
+        self.packed, self.order, self.valid = packed, order, valid
+
+    # 部品はどれも詰めた並びの2次元配列を返す
+
+    def sma(self, window):
+        return kernels.rolling_mean(self.packed, window)
+
+    def rsi(self, window):
+        return kernels.rsi(self.packed, window)
+
+    def ema(self, span):
+        return kernels.ewm_mean(self.packed, span)
+
+    @staticmethod
+    def macd(ema_fast, ema_slow, signal_span):
+        return kernels.macd(ema_fast, ema_slow, signal_span)
+
+    def unpack(self, packed, fill=np.nan):
+        """詰めた配列を元の時刻の並びに戻す（バーのない位置は fill）"""
+        if isinstance(packed, pd.DataFrame):
+            packed = packed.to_numpy()
+        return _unpack_valid(packed, self.order, self.valid, fill)
+
+
+def packed_indicators(panel, settings):
+    """
+    PackedClose から全銘柄の指標を詰めた並びのまま（kernels.indicators の1回のループで）計算する。
+    Returns: dict of indicator column -> 詰めた並びの2次元配列
+    """
+    return dict(zip(indicator_columns(settings).values(), kernels.indicators(panel.packed, settings)))
+
+
+def _panel_indicators(close, settings):
+    """
+    Close の 2-D 配列 (time × tickers) から全銘柄の指標を一度に計算する。
+    列ごとの計算は calculate_indicators と同じカーネルなので、結果は完全に一致する。
+    """
+    panel = PackedClose(close)
+    return {name: panel.unpack(values) for name, values in packed_indicators(panel, settings).items()}
+
+
+def _close_panel(panel):
+    """yf.download の MultiIndex DataFrame から Close の wide DataFrame を取り出す"""
+    if not isinstance(panel.columns, pd.MultiIndex):
+        return panel
+    if 'Close' in panel.columns.get_level_values(-1):
+        # group_by='ticker' の場合 (ticker, field)
+        return panel.xs('Close', axis=1, level=-1)
+    # group_by='column' の場合 (field, ticker)
+    return panel['Close']
+
+
+def calculate_indicators_panel(panel, settings):
+    """
+    Calculates indicators for every ticker of a panel in one vectorized pass.
+    panel: the MultiIndex DataFrame returned by yf.download, a wide Close DataFrame
+    (time x tickers), or a 2-D NumPy array (time x tickers).
+    Returns: dict of indicator column -> wide DataFrame (or 2-D array for array input).
+    Values match calculate_indicators run on each ticker after dropping missing Close rows.
+    """
+    if isinstance(panel, np.ndarray):
+        if panel.ndim != 2:
+            raise ValueError("panel array must be 2-D (time x tickers)")
+        return _panel_indicators(panel, settings)
+
+    close = _close_panel(panel).sort_index()
+    result = _panel_indicators(close.to_numpy(dtype=np.float64), settings)
+    return {
+        name: pd.DataFrame(values, index=close.index, columns=close.columns)
+        for name, values in result.items()
+    }
+
+
+def calculate_indicators_batch(data, settings):
+    """
+    Calculates indicators for a dict of per-ticker DataFrames (as returned by fetch_stock_data)
+    with one panel computation instead of a per-ticker loop.
+    Returns: dict of DataFrames, identical to calling calculate_indicators on each one.
+    """
+    data = {ticker: df.sort_index() for ticker, df in data.items() if not df.empty}
+    if not data:
+        return {}
+
+    # 銘柄ごとに時刻が違うので、和集合を時刻順に並べる
+    close = pd.concat({ticker: df['Close'] for ticker, df in data.items()}, axis=1, sort=True)
+    indicators = calculate_indicators_panel(close, settings)
+
+    result = {}
+    for ticker, df in data.items():
+        values = {name: frame[ticker].reindex(df.index) for name, frame in indicators.items()}
+        result[ticker] = df.assign(**values)
+    return result
+
+
+def _ieee_div(a, b):
+    """NumPy/pandas と同じ IEEE 754 の割り算（0 除算で inf / nan を返す）"""
+    try:
+        return a / b
+    except ZeroDivisionError:
+        if a != a or a == 0:
+            return math.nan
+        return math.copysign(math.inf, a) * math.copysign(1.0, b)
+
+
+class _RollingMean:
+    """
+    pandas の rolling(window).mean() と同じ手順（Kahan 補正付きの加算・減算）で
+    1本ずつ更新する移動平均。バッチ計算と同じ値になる。
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self.values = deque()
+        self.nobs = 0
+        self.sum_x = 0.0
+        self.neg_ct = 0
+        self.comp_add = 0.0
+        self.comp_remove = 0.0
+        self.same_ct = 0
+        self.prev_value = math.nan
+
+    def _state(self):
+        return (self.nobs, self.sum_x, self.neg_ct, self.comp_add,
+                self.comp_remove, self.same_ct, self.prev_value)
+
+    def _restore(self, state):
+        (self.nobs, self.sum_x, self.neg_ct, self.comp_add,
+         self.comp_remove, self.same_ct, self.prev_value) = state
+
+    def _add(self, val):
+        self.nobs += 1
+        y = val - self.comp_add
+        t = self.sum_x + y
+        self.comp_add = t - self.sum_x - y
+        self.sum_x = t
+        if math.copysign(1.0, val) < 0:
+            self.neg_ct += 1
+        if val == self.prev_value:
+            self.same_ct += 1
+        else:
+            self.same_ct = 1
+        self.prev_value = val
+
+    def _remove(self, val):
+        self.nobs -= 1
+        y = -val - self.comp_remove
+        t = self.sum_x + y
+        self.comp_remove = t - self.sum_x - y
+        self.sum_x = t
+        if math.copysign(1.0, val) < 0:
+            self.neg_ct -= 1
+
+    def push(self, val):
+        """
+        値を1つ追加して平均を返す。
+        Returns: (平均, 取り消し用の情報)
+        """
+        undo = (self._state(), None)
+        if self.window == 1:
+            # pandas は窓が重ならない場合に集計を最初からやり直す
+            removed = self.values.popleft() if self.values else None
+            self._restore((0, 0.0, 0, 0.0, 0.0, 0, val))
+            undo = (undo[0], removed)
+        elif len(self.values) == self.window:
+            removed = self.values.popleft()
+            self._remove(removed)
+            undo = (undo[0], removed)
+        self.values.append(val)
+        self._add(val)
+        return self.mean(), undo
+
+    def pop(self, undo):
+        """直前の push を取り消す"""
+        state, removed = undo
+        self.values.pop()
+        if removed is not None:
+            self.values.appendleft(removed)
+        self._restore(state)
+
+    def mean(self):
+        if self.nobs < self.window:
+            return math.nan
+        result = self.sum_x / self.nobs
+        if self.same_ct >= self.nobs:
+            result = self.prev_value
+        elif self.neg_ct == 0 and result < 0:
+            result = 0.0
+        elif self.neg_ct == self.nobs and result > 0:
+            result = 0.0
+        return result
+
+
+class _EWMean:
+    """pandas の ewm(span, adjust=False).mean() と同じ手順で1本ずつ更新する指数移動平均"""
+
+    def __init__(self, span):
+        com = (span - 1) / 2.0
+        self.alpha = 1.0 / (1.0 + com)
+        self.old_wt = 1.0 - self.alpha
+        self.weighted = math.nan
+
+    def push(self, val):
+        prev = self.weighted
+        if prev != prev:
+            self.weighted = val
+        elif prev != val:
+            self.weighted = (self.old_wt * prev + self.alpha * val) / (self.old_wt + self.alpha)
+        return self.weighted, prev
+
+    def pop(self, prev):
+        self.weighted = prev
+
+
+class IndicatorState:
+    """
+    Streaming indicator state for one ticker and one settings tuple.
+    Each bar updates SMA, RSI and MACD in constant time, with the same values
+    calculate_indicators would produce over the full history. The last bar can
+    be revised (e.g. an unfinished intraday bar) by calling update with the same timestamp.
+    """
+
+    def __init__(self, settings):
+        self.settings = dict(settings)
+        self.columns = indicator_columns(settings)
+        self._sma_short = _RollingMean(settings['ma_short'])
+        self._sma_long = _RollingMean(settings['ma_long'])
+        self._gain = _RollingMean(settings['rsi_window'])
+        self._loss = _RollingMean(settings['rsi_window'])
+        self._ema_fast = _EWMean(settings['macd_fast'])
+        self._ema_slow = _EWMean(settings['macd_slow'])
+        self._macd_signal = _EWMean(settings['macd_signal'])
+        self.last_timestamp = None
+        self.last_close = math.nan
+        # 最終バーの1本前（確定済み）の時刻と終値。履歴が書き換わっていないかの確認に使う
+        self.prev_timestamp = None
+        self.prev_close = math.nan
+        self.values = {name: math.nan for name in self.columns.values()}
+        self.count = 0
+        self._undo = None
+
+    @classmethod
+    def from_history(cls, df, settings):
+        """Builds a state by replaying the Close column of a per-ticker DataFrame."""
+        state = cls(settings)
+        state.update_frame(df)
+        return state
+
+    def _push(self, close):
+        prev_close = self.last_close
+        delta = close - prev_close
+
+        sma_short, undo_short = self._sma_short.push(close)
+        sma_long, undo_long = self._sma_long.push(close)
+        gain, undo_gain = self._gain.push(delta if delta > 0 else 0.0)
+        loss, undo_loss = self._loss.push(-(delta if delta < 0 else 0.0))
+        ema_fast, undo_fast = self._ema_fast.push(close)
+        ema_slow, undo_slow = self._ema_slow.push(close)
+        macd = ema_fast - ema_slow
+        macd_signal, undo_signal = self._macd_signal.push(macd)
+
+        self._undo = (prev_close, self.values, undo_short, undo_long, undo_gain,
+                      undo_loss, undo_fast, undo_slow, undo_signal)
+
+        rs = _ieee_div(gain, loss)
+        self.last_close = close
+        self.values = {
+            self.columns["sma_short"]: sma_short,
+            self.columns["sma_long"]: sma_long,
+            self.columns["rsi"]: 100 - _ieee_div(100, 100 + rs),
+            self.columns["macd"]: macd,
+            self.columns["macd_signal"]: macd_signal,
+        }
+
+    def _pop(self):
+        (prev_close, values, undo_short, undo_long, undo_gain,
+         undo_loss, undo_fast, undo_slow, undo_signal) = self._undo
+        self._sma_short.pop(undo_short)
+        self._sma_long.pop(undo_long)
+        self._gain.pop(undo_gain)
+        self._loss.pop(undo_loss)
+        self._ema_fast.pop(undo_fast)
+        self._ema_slow.pop(undo_slow)
+        self._macd_signal.pop(undo_signal)
+        self.last_close = prev_close
+        self.values = values
+        self._undo = None
+
+    def _update(self, timestamp, close):
+        if self.last_timestamp is not None and timestamp == self.last_timestamp:
+            if self._undo is None:
+                raise ValueError("Only the most recent bar can be revised")
+            self._pop()
+            self.count -= 1
+        elif self.last_timestamp is not None and timestamp < self.last_timestamp:
+            raise ValueError(f"Bar at {timestamp} is older than the last bar {self.last_timestamp}")
+        else:
+            self.prev_timestamp = self.last_timestamp
+            self.prev_close = self.last_close
+
+        self._push(close)
+        self.last_timestamp = timestamp
+        self.count += 1
+
+    def update(self, timestamp, close):
+        """
+        Appends a bar, or revises the last bar when timestamp equals the last timestamp.
+        Returns: dict of indicator column -> latest value
+        """
+        self._update(timestamp, float(close))
+        return dict(self.values)
+
+    def update_frame(self, df):
+        """
+        Feeds the bars of df from the last seen timestamp onward (the last bar is revised).
+        Returns: dict of indicator column -> latest value
+        """
+        close = df['Close']
+        if not close.index.is_monotonic_increasing:
+            close = close.sort_index()
+        start = 0 if self.last_timestamp is None else close.index.searchsorted(self.last_timestamp)
+        for timestamp, value in zip(close.index[start:], close.to_numpy(dtype=np.float64)[start:].tolist()):
+            self._update(timestamp, value)
+        return dict(self.values)
+
+
+class IndicatorStateStore:
+    """
+    Keeps one IndicatorState per (ticker, settings) so refreshed data only
+    costs the new bars instead of the full history. The store can be pickled
+    to carry the states over to the next run.
+    """
+
+    def __init__(self):
+        self._states = {}
+
+    @staticmethod
+    def _key(ticker, settings):
+        return (ticker,) + tuple(settings[k] for k in INDICATOR_SETTINGS)
+
+    def update(self, ticker, df, settings):
+        """
+        Updates the ticker's state from a per-ticker DataFrame and returns the latest values.
+        The state is rebuilt when the history no longer lines up (e.g. bars were inserted
+        or prices were re-adjusted before the last seen bar). df may start later than the
+        bars seen so far (a sliding period window).
+        """
+        key = self._key(ticker, settings)
+        state = self._states.get(key)
+        if state is not None and not self._lines_up(state, df):
+            state = None
+        if state is None:
+            state = IndicatorState(settings)
+            self._states[key] = state
+        return state.update_frame(df)
+
+    @staticmethod
+    def _lines_up(state, df):
+        index = df.index
+        last = state.last_timestamp
+        pos = index.searchsorted(last)
+        if pos == len(index) or index[pos] != last:
+            return False
+        # 以前より多くのバーがある（途中にバーが増えた）なら作り直す。少ないのは期間の窓がずれた場合
+        if pos + 1 > state.count:
+            return False
+        # 確定済みの1本前が変わっていれば、配当・分割で価格が調整し直されている
+        if pos > 0 and (index[pos - 1] != state.prev_timestamp or df['Close'].to_numpy()[pos - 1] != state.prev_close):
+            return False
+        return True
@@ -0,0 +1,346 @@
+import math
+import sys
+
+import numpy as np
+import pandas as pd
+
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+# 指標の計算カーネル（float64 の (time x columns) 配列）。
+# どれも calculate_indicators の pandas の計算（補正付きの rolling().mean()、ewm(adjust=False)、
+# Close.diff() からの RSI）と同じ手順なので、値は NaN の位置も含めて完全に一致する。
+# Numba があれば1列につき1回のループで全指標を計算し、なければ移動平均・指数移動平均に
+# pandas のコンパイル済みの処理を使い、その前後を NumPy で計算する。
+
+# 無効にすると Numba があっても NumPy 版を使う（比較・切り分け用）
+USE_NUMBA = HAVE_NUMBA
+
+# コンパイル結果を __pycache__ に保存して次回の起動で使う（exe 化したアプリにはソースがないので保存しない）
+_JIT_CACHE = not getattr(sys, "frozen", False)
+
+
+def _as_2d(values):
+    """1次元は (time, 1) にする。Returns: (float64 の2次元配列, 元が1次元か)"""
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 1:
+        return values[:, None], True
+    if values.ndim != 2:
+        raise ValueError("values must be 1-D or 2-D (time x columns)")
+    return values, False
+
+
+def _result(out, flat):
+    return out[:, 0] if flat else out
+
+
+def _com(span):
+    """ewm(span) の重心 (center of mass)。pandas と同じ計算"""
+    return (span - 1) / 2.0
+
+
+# --- NumPy 版（移動平均・指数移動平均は pandas のコンパイル済みの処理を使う） ---
+
+def _np_rolling_mean(values, window):
+    return pd.DataFrame(values, copy=False).rolling(window=window).mean().to_numpy()
+
+
+def _np_ewm_mean(values, span):
+    return pd.DataFrame(values, copy=False).ewm(span=span, adjust=False).mean().to_numpy()
+
+
+def _np_gain_loss(values):
+    """Close.diff() の上昇分と下落分（calculate_indicators の where と同じ値。先頭は 0 と -0）"""
+    delta = np.full_like(values, np.nan)
+    np.subtract(values[1:], values[:-1], out=delta[1:])
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = np.where(delta < 0, delta, 0.0)
+    np.negative(loss, out=loss)
+    return gain, loss
+
+
+def _np_rsi_from(gain_mean, loss_mean):
+    """100 - 100 / (100 + gain / loss)（元の式のまま）"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = gain_mean / loss_mean
+        rsi += 100
+        np.divide(100, rsi, out=rsi)
+        np.subtract(100, rsi, out=rsi)
+    return rsi
+
+
+def _np_rsi(values, window):
+    gain, loss = _np_gain_loss(values)
+    return _np_rsi_from(_np_rolling_mean(gain, window), _np_rolling_mean(loss, window))
+
+
+def _np_macd(ema_fast, ema_slow, signal_span):
+    macd_val = ema_fast - ema_slow
+    return macd_val, _np_ewm_mean(macd_val, signal_span)
+
+
+def _np_indicators(values, ma_short, ma_long, rsi_window, fast, slow, signal):
+    macd_val, signal_line = _np_macd(_np_ewm_mean(values, fast), _np_ewm_mean(values, slow), signal)
+    return (_np_rolling_mean(values, ma_short), _np_rolling_mean(values, ma_long),
+            _np_rsi(values, rsi_window), macd_val, signal_line)
+
+
+# --- Numba 版（pandas の aggregations.pyx の roll_mean / ewm と同じ手順のループ） ---
+
+if HAVE_NUMBA:
+    # 移動平均の状態の添字: 件数, 合計, 負の値の数, 加算の補正, 減算の補正, 同じ値の連続数, 直前の値
+    _NOBS, _SUM, _NEG, _COMP_ADD, _COMP_REMOVE, _SAME, _PREV = range(7)
+
+    @njit(cache=_JIT_CACHE, error_model="numpy")
+    def _reset(state, c, first):
+        state[c, _NOBS] = 0.0
+        state[c, _SUM] = 0.0
+        state[c, _NEG] = 0.0
+        state[c, _COMP_ADD] = 0.0
+        state[c, _COMP_REMOVE] = 0.0
+        state[c, _SAME] = 0.0
+        state[c, _PREV] = first
+
+    @njit(cache=_JIT_CACHE, error_model="numpy")
+    def _add(state, c, val):
+        if val == val:
+            state[c, _NOBS] += 1.0
+            y = val - state[c, _COMP_ADD]
+            t = state[c, _SUM] + y
+            state[c, _COMP_ADD] = t - state[c, _SUM] - y
+            state[c, _SUM] = t
+            if math.copysign(1.0, val) < 0:
+                state[c, _NEG] += 1.0
+            if val == state[c, _PREV]:
+                state[c, _SAME] += 1.0
+            else:
+                state[c, _SAME] = 1.0
+            state[c, _PREV] = val
+
+    @njit(cache=_JIT_CACHE, error_model="numpy")
+    def _remove(state, c, val):
+        if val == val:
+            state[c, _NOBS] -= 1.0
+            y = -val - state[c, _COMP_REMOVE]
+            t = state[c, _SUM] + y
+            state[c, _COMP_REMOVE] = t - state[c, _SUM] - y
+            state[c, _SUM] = t
+            if math.copysign(1.0, val) < 0:
+                state[c, _NEG] -= 1.0
+
+    @njit(cache=_JIT_CACHE, error_model="numpy")
+    def _mean(state, c, window):
+        nobs = state[c, _NOBS]
+        if nobs < window or nobs <= 0:
+            return np.nan
+        result = state[c, _SUM] / nobs
+        if state[c, _SAME] >= nobs:
+            result = state[c, _PREV]
+        elif state[c, _NEG] == 0 and result < 0:
+            result = 0.0
+        elif state[c, _NEG] == nobs and result > 0:
+            result = 0.0
+        return result
+
+    @njit(cache=_JIT_CACHE, inline="always", error_model="numpy")
+    def _roll(state, values, i, c, window):
+        """c 列目の i 本目の値を窓に入れて平均を返す"""
+        if i == 0 or window == 1:
+            # pandas は窓が前の窓と重ならないとき集計をやり直す
+            _reset(state, c, values[i, c])
+        elif i >= window:
+            _remove(state, c, values[i - window, c])
+        _add(state, c, values[i, c])
+        return _mean(state, c, window)
+
+    @njit(cache=_JIT_CACHE, inline="always", error_model="numpy")
+    def _ewm_step(state, c, cur, i, com):
+        """ewm(adjust=False) の i 本目。state は (加重平均, 古い値の重み, 件数)"""
+        alpha = 1.0 / (1.0 + com)
+        if i == 0:
+            state[c, 0] = cur
+            state[c, 1] = 1.0
+            state[c, 2] = 1.0 if cur == cur else 0.0
+        else:
+            is_observation = cur == cur
+            if is_observation:
+                state[c, 2] += 1.0
+            weighted = state[c, 0]
+            if weighted == weighted:
+                state[c, 1] *= 1.0 - alpha
+                new_wt = alpha
+                if com == 1:
+                    # pandas は com == 1 のとき新しい値の重みを 1 - 古い値の重み にする（欠損の後で差が出る）
+                    new_wt = 1.0 - state[c, 1]
+                if is_observation:
+                    if weighted != cur:
+                        weighted = state[c, 1] * weighted + new_wt * cur
+                        weighted /= state[c, 1] + new_wt
+                    state[c, 1] = 1.0
+            elif is_observation:
+                weighted = cur
+            state[c, 0] = weighted
+        return state[c, 0] if state[c, 2] >= 1.0 else np.nan
+
+    @njit(cache=_JIT_CACHE, error_model="numpy")
+    def _gain_loss(values, j, c):
+        """c 列目の j 本目の Close.diff() の上昇分と下落分"""
+        delta = values[j, c] - values[j - 1, c] if j > 0 else np.nan
+        gain = delta if delta > 0 else 0.0
+        loss = -(delta if delta < 0 else 0.0)
+        return gain, loss
+
+    # ループは時刻を外側・列を内側にする（行優先の配列を連続した順に読み書きする）。
+    # 状態は列ごとに1行ずつ持つ
+
+    @njit(cache=_JIT_CACHE, error_model="numpy")
+    def _nb_rolling_mean(values, window):
+        n, m = values.shape
+        out = np.empty((n, m))
+        state = np.empty((m, 7))
+        for i in range(n):
+            for c in range(m):
+                out[i, c] = _roll(state, values, i, c, window)
+        return out
+
+    @njit(cache=_JIT_CACHE, error_model="numpy")
+    def _nb_ewm_mean(values, com):
+        n, m = values.shape
+        out = np.empty((n, m))
+        state = np.empty((m, 3))
+        for i in range(n):
+            for c in range(m):
+                out[i, c] = _ewm_step(state, c, values[i, c], i, com)
+        return out
+
+    @njit(cache=_JIT_CACHE, error_model="numpy")
+    def _nb_rsi(values, window):
+        n, m = values.shape
+        out = np.empty((n, m))
+        gain_state = np.empty((m, 7))
+        loss_state = np.empty((m, 7))
+        for i in range(n):
+            for c in range(m):
+                gain, loss = _gain_loss(values, i, c)
+                if i == 0 or window == 1:
+                    _reset(gain_state, c, gain)
+                    _reset(loss_state, c, loss)
+                elif i >= window:
+                    # 窓から外れる上昇分・下落分は Close から計算し直す（中間の配列を作らない）
+                    old_gain, old_loss = _gain_loss(values, i - window, c)
+                    _remove(gain_state, c, old_gain)
+                    _remove(loss_state, c, old_loss)
+                _add(gain_state, c, gain)
+                _add(loss_state, c, loss)
+                # error_model="numpy" なので 0 除算は NumPy と同じく inf / nan になる
+                rs = _mean(gain_state, c, window) / _mean(loss_state, c, window)
+                out[i, c] = 100.0 - 100.0 / (100.0 + rs)
+        return out
+
+    @njit(cache=_JIT_CACHE, error_model="numpy")
+    def _nb_macd(ema_fast, ema_slow, com):
+        n, m = ema_fast.shape
+        macd_val = np.empty((n, m))
+        signal_line = np.empty((n, m))
+        state = np.empty((m, 3))
+        for i in range(n):
+            for c in range(m):
+                macd = ema_fast[i, c] - ema_slow[i, c]
+                macd_val[i, c] = macd
+                signal_line[i, c] = _ewm_step(state, c, macd, i, com)
+        return macd_val, signal_line
+
+    @njit(cache=_JIT_CACHE, error_model="numpy")
+    def _nb_indicators(values, ma_short, ma_long, rsi_window, fast_com, slow_com, signal_com):
+        """全指標を1回のループで計算する"""
+        n, m = values.shape
+        sma_short = np.empty((n, m))
+        sma_long = np.empty((n, m))
+        rsi = np.empty((n, m))
+        macd_val = np.empty((n, m))
+        signal_line = np.empty((n, m))
+        short_state = np.empty((m, 7))
+        long_state = np.empty((m, 7))
+        gain_state = np.empty((m, 7))
+        loss_state = np.empty((m, 7))
+        fast_state = np.empty((m, 3))
+        slow_state = np.empty((m, 3))
+        signal_state = np.empty((m, 3))
+        for i in range(n):
+            for c in range(m):
+                close = values[i, c]
+                sma_short[i, c] = _roll(short_state, values, i, c, ma_short)
+                sma_long[i, c] = _roll(long_state, values, i, c, ma_long)
+                gain, loss = _gain_loss(values, i, c)
+                if i == 0 or rsi_window == 1:
+                    _reset(gain_state, c, gain)
+                    _reset(loss_state, c, loss)
+                elif i >= rsi_window:
+                    # 窓から外れる上昇分・下落分は Close から計算し直す（中間の配列を作らない）
+                    old_gain, old_loss = _gain_loss(values, i - rsi_window, c)
+                    _remove(gain_state, c, old_gain)
+                    _remove(loss_state, c, old_loss)
+                _add(gain_state, c, gain)
+                _add(loss_state, c, loss)
+                rs = _mean(gain_state, c, rsi_window) / _mean(loss_state, c, rsi_window)
+                rsi[i, c] = 100.0 - 100.0 / (100.0 + rs)
+                macd = _ewm_step(fast_state, c, close, i, fast_com) - _ewm_step(slow_state, c, close, i, slow_com)
+                macd_val[i, c] = macd
+                signal_line[i, c] = _ewm_step(signal_state, c, macd, i, signal_com)
+        return sma_short, sma_long, rsi, macd_val, signal_line
+
+
+# --- 公開する関数（1次元なら1次元、2次元 (time x columns) なら2次元で返す） ---
+
+def rolling_mean(values, window):
+    """rolling(window).mean() と同じ値"""
+    values, flat = _as_2d(values)
+    if USE_NUMBA:
+        return _result(_nb_rolling_mean(values, window), flat)
+    return _result(_np_rolling_mean(values, window), flat)
+
+
+def ewm_mean(values, span):
+    """ewm(span, adjust=False).mean() と同じ値"""
+    values, flat = _as_2d(values)
+    if USE_NUMBA:
+        return _result(_nb_ewm_mean(values, _com(span)), flat)
+    return _result(_np_ewm_mean(values, span), flat)
+
+
+def rsi(values, window):
+    """calculate_indicators の RSI（元の式のまま）と同じ値"""
+    values, flat = _as_2d(values)
+    if USE_NUMBA:
+        return _result(_nb_rsi(values, window), flat)
+    return _result(_np_rsi(values, window), flat)
+
+
+def macd(ema_fast, ema_slow, signal_span):
+    """Returns: (MACD, シグナル線)。シグナル線は MACD の ewm(signal_span, adjust=False)"""
+    ema_fast, flat = _as_2d(ema_fast)
+    ema_slow, _ = _as_2d(ema_slow)
+    if USE_NUMBA:
+        out = _nb_macd(ema_fast, ema_slow, _com(signal_span))
+    else:
+        out = _np_macd(ema_fast, ema_slow, signal_span)
+    return tuple(_result(values, flat) for values in out)
+
+
+def indicators(values, settings):
+    """
+    Computes SMA short/long, RSI, MACD and the MACD signal line of every column.
+    values: Close as a 1-D array or a 2-D array (time x columns); NaN is treated like pandas does
+    Returns: (sma_short, sma_long, rsi, macd, macd_signal) arrays of the same shape as values
+    """
+    values, flat = _as_2d(values)
+    args = (settings['ma_short'], settings['ma_long'], settings['rsi_window'])
+    if USE_NUMBA:
+        out = _nb_indicators(values, *args, _com(settings['macd_fast']),
+                             _com(settings['macd_slow']), _com(settings['macd_signal']))
+    else:
+        out = _np_indicators(values, *args, settings['macd_fast'], settings['macd_slow'], settings['macd_signal'])
+    return tuple(_result(arr, flat) for arr in out)
@@ -1,19 +1,59 @@
 import sys
 import os
+import time
+import argparse
 
-# Ensure src is in path if running directly
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+# Ensure the project root is in path if running directly (src is imported as a package)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from utils import load_config
-from fetcher import fetch_stock_data
-from indicators import calculate_indicators
-from scorer import evaluate_stock
+# 起動時に読み込むのは軽いモジュールだけにする。
+# 分析に使うモジュール（pandas など）は、前回の結果を表示してから使う場所で読み込む
+from src.utils import load_config
+from src.profiling import profiler
+from src.warmstart import TAIL_BARS, load_warm_start, save_warm_start
 from rich.console import Console
 from rich.table import Table
+from rich.live import Live
 from rich import box
 
-def main():
+# 結果が届く途中で表を描き直す最短の間隔（秒）
+REDRAW_SECONDS = 0.25
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Stock Analysis AI Tool")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="Show the latest snapshot from the background refresher instead of fetching")
+    parser.add_argument("--top", type=int, help="Show only the N best-scoring tickers")
+    parser.add_argument("--profile", action="store_true",
+                        help="Print per-stage timings, latency histograms and cache counters")
+    parser.add_argument("--profile-out",
+                        help="Write the profile to this file (.json for JSON, otherwise Prometheus text)")
+    parser.add_argument("--data-dir",
+                        help="Read prices from local files in this directory instead of downloading")
+    parser.add_argument("--universe",
+                        help="Screen these tickers (a file with one ticker per line, or 'cache' for every cached ticker) "
+                             "and update the screener index")
+    parser.add_argument("--screen", metavar="EXPR",
+                        help="Rank the screener index rows matching EXPR, e.g. \"RSI < 30 and GoldenCross and Volume > 1e6\" "
+                             "(without --universe the saved index is queried as is)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.data_dir:
+        from src.providers import LocalProvider, set_default_provider
+        set_default_provider(LocalProvider(args.data_dir))
     console = Console()
+    run(args, console)
+
+    if args.profile:
+        console.print()
+        console.print(build_profile_table(profiler.summary()))
+    if args.profile_out:
+        profiler.export(args.profile_out)
+        console.print(f"Profile written to {args.profile_out}")
+
+def run(args, console):
     console.print("[bold green]Stock Analysis AI Tool[/bold green]")
 
     # 1. Load Config
@@ -26,57 +66,155 @@ def main():
         console.print(f"[red]Failed to load config: {e}[/red]")
         return
 
-    # 2. Fetch Data
-    console.print(f"Fetching data (Period: {settings['period']}, Interval: {settings['interval']})...")
-    data, names = fetch_stock_data(tickers, period=settings['period'], interval=settings['interval'])
+    if args.universe or args.screen:
+        run_screener(args, console, settings)
+        return
+
+    interval, period = settings['interval'], settings['period']
+
+    # 2. Show the latest snapshot from the background refresher
+    if args.snapshot:
+        from src.analysis import ranking_frame, TopRanking
+        from src.scheduler import load_snapshot
+        result = load_snapshot(tickers, interval, period, settings)
+        if result is not None:
+            ranking = TopRanking(args.top)
+            for row in ranking_frame(result).to_dict("records"):
+                ranking.push(row)
+            with profiler.stage("render"):
+                console.print(build_table(ranking.rows()))
+            return
+        console.print("[yellow]No snapshot found, fetching instead.[/yellow]")
+
+    # 3. Fetch Data and Analyze (the last run's ranking is shown until the first chunk is scored)
+    console.print(f"Fetching data (Period: {period}, Interval: {interval})...")
+    warm = load_warm_start(tickers, interval, period, settings)
+    first_table = build_table([])
+    if warm is not None:
+        saved_at = time.strftime("%m/%d %H:%M", time.localtime(warm["saved_at"]))
+        first_table = build_table(warm["ranking"][:args.top], note=f"last run {saved_at}, refreshing...")
+    scanned, tails = [], {}
+    with Live(first_table, console=console, auto_refresh=False) as live:
+        live.refresh()
+        from src.analysis import iter_analyze, TopRanking
+        ranking = TopRanking(args.top)
+        drawn_at = 0.0
+        rows = iter_analyze(tickers, period, interval, settings, tail=TAIL_BARS)
+        for received, row in enumerate(rows, 1):
+            tails[row["Ticker"]] = row.pop("tail")
+            ranking.push(row)
+            scanned.append(row)
+            if time.monotonic() - drawn_at >= REDRAW_SECONDS:
+                with profiler.stage("render"):
+                    live.update(build_table(ranking.rows(), done=received), refresh=True)
+                drawn_at = time.monotonic()
+        with profiler.stage("render"):
+            live.update(build_table(ranking.rows()), refresh=True)
+
+    # 4. Record the scan and show what changed since the previous one
+    from src.history import ResultHistory
+    alerts = ResultHistory(interval, period, tickers, settings).append(scanned)
+    for alert in alerts:
+        console.print(format_alert(alert))
+    save_warm_start(scanned, tickers, interval, period, settings, tails)
+
+def run_screener(args, console, settings):
+    """スクリーナー: 銘柄一覧の最終バーの要約（索引）を更新し、条件に合う銘柄をランキング表示する"""
+    from src.analysis import TopRanking
+    from src.screener import ScreenerIndex, iter_screen, load_universe
+    interval, period = settings['interval'], settings['period']
+    index = ScreenerIndex.load(interval, settings)
+    universe = None
+    if args.universe:
+        universe = load_universe(args.universe, interval)
+        console.print(f"Screening {len(universe)} tickers (Period: {period}, Interval: {interval})...")
+        with Live(console=console, auto_refresh=False) as live:
+            drawn_at = 0.0
+            for index, received in iter_screen(universe, interval, period, settings, index=index):
+                if time.monotonic() - drawn_at >= REDRAW_SECONDS:
+                    live.update(f"Indexed {received} / {len(universe)} tickers", refresh=True)
+                    drawn_at = time.monotonic()
+            live.update(f"Indexed {len(index)} tickers", refresh=True)
+        console.print()
+    elif not len(index):
+        console.print("[yellow]The screener index is empty; run with --universe first.[/yellow]")
+        return
+
+    try:
+        rows = index.ranking(args.screen, tickers=universe).to_dict("records")
+    except Exception as e:
+        console.print(f"[red]Invalid screen expression: {e}[/red]")
+        return
+    ranking = TopRanking(args.top)
+    for row in rows:
+        ranking.push(row)
+    with profiler.stage("render"):
+        console.print(build_table(ranking.rows()))
+    console.print(f"{len(rows)} of {len(universe) if universe is not None else len(index)} tickers match.")
+
+def format_alert(alert):
+    if alert["Kind"] == "new_buy":
+        return f"[bold green]New BUY:[/bold green] {alert['Ticker']} (score {alert['Score']})"
+    if alert["Kind"] == "flip":
+        return f"[yellow]Signal change:[/yellow] {alert['Ticker']} {alert['From']} -> {alert['To']}"
+    return f"[cyan]Score jump:[/cyan] {alert['Ticker']} {alert['PrevScore']} -> {alert['Score']}"
 
-    # 3. Analyze and Show Result
-    table = Table(title="Stock Analysis Ranking", box=box.ROUNDED)
+def build_table(rows, done=None, note=None):
+    if done is not None:
+        note = f"{done} received..."
+    title = "Stock Analysis Ranking" if note is None else f"Stock Analysis Ranking ({note})"
+    table = Table(title=title, box=box.ROUNDED)
     table.add_column("Ticker", style="cyan", justify="left")
     table.add_column("Latest Close", justify="right")
     table.add_column("Score", justify="right")
     table.add_column("Signal", justify="center")
     table.add_column("Reasons", style="dim")
 
-    results = []
-
-    for ticker, df in data.items():
-        if df.empty:
-            continue
-            
-        # Calc Indicators
-        try:
-            df = calculate_indicators(df, settings)
-            score, signal, reason = evaluate_stock(df, settings)
-            
-            # Colorize Signal
-            signal_str = f"[bold green]{signal}[/bold green]" if signal == "BUY" else \
-                         f"[bold red]{signal}[/bold red]" if signal == "SELL" else \
-                         f"[yellow]{signal}[/yellow]"
-                         
-            results.append({
-                "Ticker": ticker,
-                "Close": df['Close'].iloc[-1],
-                "Score": score,
-                "Signal": signal_str,
-                "Reason": reason
-            })
-        except Exception as e:
-            console.print(f"[red]Error analyzing {ticker}: {e}[/red]")
-
-    # Sort by Score (Desc)
-    results.sort(key=lambda x: x["Score"], reverse=True)
-
-    for res in results:
+    # 前回の結果（warm start）は判定理由の文字列を持っている
+    if all("Reasons" in row for row in rows):
+        reasons = [row["Reasons"] for row in rows]
+    else:
+        from src.scorer import render_reasons
+        reasons = render_reasons([row["ReasonCode"] for row in rows])
+
+    for row, reason in zip(rows, reasons):
+        signal = row["Signal"]
+        # Colorize Signal
+        signal_str = f"[bold green]{signal}[/bold green]" if signal == "BUY" else \
+                     f"[bold red]{signal}[/bold red]" if signal == "SELL" else \
+                     f"[yellow]{signal}[/yellow]"
+
         table.add_row(
-            res["Ticker"], 
-            f"{res['Close']:.2f}", 
-            str(res["Score"]), 
-            res["Signal"],
-            res["Reason"]
+            row["Ticker"],
+            f"{row['Close']:.2f}",
+            str(row["Score"]),
+            signal_str,
+            reason
         )
 
-    console.print(table)
+    return table
+
+def build_profile_table(summary):
+    table = Table(title="Profile", box=box.ROUNDED)
+    table.add_column("Metric", style="cyan", justify="left")
+    table.add_column("Count", justify="right")
+    table.add_column("Total (s)", justify="right")
+    table.add_column("Mean (ms)", justify="right")
+    table.add_column("Max / p95 (ms)", justify="right")
+
+    for name, stat in summary["stages"].items():
+        table.add_row(name, str(stat["count"]), f"{stat['total']:.3f}",
+                      f"{stat['total'] / stat['count'] * 1000:.1f}", f"{stat['max'] * 1000:.1f}")
+    if summary["histograms"]:
+        table.add_section()
+    for name, hist in summary["histograms"].items():
+        mean = hist["sum"] / hist["count"] * 1000 if hist["count"] else 0.0
+        table.add_row(name, str(hist["count"]), f"{hist['sum']:.3f}", f"{mean:.1f}", f"<= {hist['p95'] * 1000:g}")
+    if summary["counters"]:
+        table.add_section()
+    for name, value in summary["counters"].items():
+        table.add_row(name, str(value), "", "", "")
+    return table
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,135 @@
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# ヒストグラムの区切り（秒）。Prometheus の既定値と同じ
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, math.inf)
+
+# 表示・出力するときのステージの並び
+STAGES = ("download", "cleanup", "name_lookup", "resample", "indicators", "scoring", "render")
+
+
+class Profiler:
+    """
+    Process-wide pipeline instrumentation: per-stage timers, latency histograms and
+    counters (cache hits/misses). Recording is a lock and a few additions, so it is
+    always on; summary() / to_json() / to_prometheus() read it out.
+    Stages may nest (download includes cleanup).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._stages = {}
+            self._histograms = {}
+            self._counters = {}
+
+    @contextmanager
+    def stage(self, name):
+        """with profiler.stage("indicators"): ... の処理時間を記録する"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        with self._lock:
+            stat = self._stages.get(name)
+            if stat is None:
+                stat = self._stages[name] = {"count": 0, "total": 0.0, "max": 0.0}
+            stat["count"] += 1
+            stat["total"] += seconds
+            stat["max"] = max(stat["max"], seconds)
+
+    def observe(self, name, seconds, n=1):
+        """ヒストグラム name に値を n 回分記録する（チャンク内の各銘柄の待ち時間など）"""
+        with self._lock:
+            hist = self._histograms.get(name)
+            if hist is None:
+                hist = self._histograms[name] = {"buckets": [0] * len(LATENCY_BUCKETS), "count": 0, "sum": 0.0}
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    hist["buckets"][i] += n
+                    break
+            hist["count"] += n
+            hist["sum"] += seconds * n
+
+    def count(self, name, n=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def summary(self):
+        """Returns: dict with "stages", "histograms" and "counters" (a copy)"""
+        with self._lock:
+            order = {name: i for i, name in enumerate(STAGES)}
+            stages = {name: dict(self._stages[name])
+                      for name in sorted(self._stages, key=lambda n: (order.get(n, len(order)), n))}
+            histograms = {name: {"buckets": list(h["buckets"]), "count": h["count"], "sum": h["sum"]}
+                          for name, h in sorted(self._histograms.items())}
+            counters = dict(sorted(self._counters.items()))
+        for hist in histograms.values():
+            hist["p50"] = _quantile(hist, 0.5)
+            hist["p95"] = _quantile(hist, 0.95)
+        return {"stages": stages, "histograms": histograms, "counters": counters}
+
+    def to_json(self):
+        data = self.summary()
+        for hist in data["histograms"].values():
+            hist["le"] = [("+Inf" if math.isinf(b) else b) for b in LATENCY_BUCKETS]
+            for key in ("p50", "p95"):
+                if math.isinf(hist[key]):
+                    hist[key] = "+Inf"
+        return json.dumps(data, indent=2)
+
+    def to_prometheus(self, prefix="stock_analysis"):
+        """Prometheus のテキスト形式で出力する"""
+        data = self.summary()
+        lines = [
+            f"# TYPE {prefix}_stage_seconds_total counter",
+            *(f'{prefix}_stage_seconds_total{{stage="{name}"}} {s["total"]:.6f}' for name, s in data["stages"].items()),
+            f"# TYPE {prefix}_stage_calls_total counter",
+            *(f'{prefix}_stage_calls_total{{stage="{name}"}} {s["count"]}' for name, s in data["stages"].items()),
+        ]
+        for name, hist in data["histograms"].items():
+            metric = f"{prefix}_{name}"
+            lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, n in zip(LATENCY_BUCKETS, hist["buckets"]):
+                cumulative += n
+                le = "+Inf" if math.isinf(bound) else f"{bound:g}"
+                lines.append(f'{metric}_bucket{{le="{le}"}} {cumulative}')
+            lines.append(f"{metric}_sum {hist['sum']:.6f}")
+            lines.append(f"{metric}_count {hist['count']}")
+        for name, value in data["counters"].items():
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        """拡張子が .json なら JSON、それ以外は Prometheus のテキスト形式で書き出す"""
+        text = self.to_json() if path.endswith(".json") else self.to_prometheus()
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+def _quantile(hist, q):
+    """ヒストグラムの区切りから分位点を見積もる（その値を含む区間の上限）"""
+    if not hist["count"]:
+        return 0.0
+    target = q * hist["count"]
+    cumulative = 0
+    for bound, n in zip(LATENCY_BUCKETS, hist["buckets"]):
+        cumulative += n
+        if cumulative >= target:
+            return bound
+    return math.inf
+
+
+# プロセス全体で共有する計測器
+profiler = Profiler()
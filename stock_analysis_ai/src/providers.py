@@ -0,0 +1,339 @@
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+
+import numpy as np
+import pandas as pd
+
+from .cache import OHLCV_COLUMNS, period_start
+from .profiling import profiler
+from .utils import load_config
+
+
+def split_download(df, tickers):
+    """
+    yf.download の結果を銘柄ごとの DataFrame に分割してクリーンアップする。
+    Returns: dict of DataFrames
+    """
+    data = {}
+
+    if df is None or df.empty:
+        return data
+
+    for ticker in tickers:
+        ticker_df = None
+
+        # 1. データの抽出
+        if isinstance(df.columns, pd.MultiIndex):
+            # group_by='ticker' の場合は第1レベルがティッカー名
+            if ticker in df.columns.levels[0]:
+                try:
+                    ticker_df = df[ticker].copy()
+                except KeyError:
+                    continue
+        else:
+            # 銘柄が1つで、かつ yfinance が MultiIndex を返さなかった場合
+            if len(tickers) == 1:
+                ticker_df = df.copy()
+
+        # 2. データのクリーンアップ
+        if ticker_df is not None and not ticker_df.empty:
+            # 列を確実に1階層（Open, High, Low, Close, Volume）にする
+            if isinstance(ticker_df.columns, pd.MultiIndex):
+                ticker_df.columns = ticker_df.columns.get_level_values(-1)
+
+            # 重複する列名があれば最初のものだけを残す（これが重要）
+            ticker_df = ticker_df.loc[:, ~ticker_df.columns.duplicated()]
+
+            # インデックスがDatetimeでない場合は変換を試みる（yfinanceのバージョンによる）
+            if not isinstance(ticker_df.index, pd.DatetimeIndex):
+                ticker_df.index = pd.to_datetime(ticker_df.index)
+
+            # 必要な列が揃っているかチェック
+            if 'Close' in ticker_df.columns:
+                ticker_df.dropna(subset=['Close'], inplace=True)
+                if not ticker_df.empty:
+                    data[ticker] = ticker_df
+
+    return data
+
+
+class DataProvider(ABC):
+    """
+    Interface of a price data source that fetch_stock_data dispatches through.
+    """
+
+    name = "base"
+    # ローカルの OHLCV キャッシュ（差分取得）と会社名キャッシュを使うか
+    cacheable = False
+    # download を複数スレッドから同時に呼べるか
+    concurrent = True
+    # 1リクエストのタイムアウト（秒）。None は打ち切らない（ローカルのファイルなど）
+    timeout = None
+
+    @abstractmethod
+    def download(self, tickers, period=None, start=None, interval="1d"):
+        """
+        Returns: dict of ticker -> OHLCV DataFrame (DatetimeIndex, no missing Close).
+        Tickers without data are left out.
+        """
+
+    def company_name(self, ticker):
+        """Returns the company name, or None when it cannot be resolved."""
+        return None
+
+
+class YFinanceProvider(DataProvider):
+    """
+    Yahoo Finance through yfinance (network). All requests share one keep-alive
+    session, and each request gives up after timeout seconds.
+    """
+
+    name = "yfinance"
+    cacheable = True
+    concurrent = False
+
+    # yf.download は結果をモジュール内の共有 dict に書き込むので、同時に呼ぶと結果が混ざる。
+    # 呼び出しは順番に行い、銘柄ごとの並列化は yfinance の threads に任せる。
+    _lock = threading.Lock()
+
+    def __init__(self, timeout=10):
+        self.timeout = timeout
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        """
+        共有の HTTP セッション（接続を使い回す）。curl_cffi がない場合は None で、
+        yfinance が自分のセッションを使う。
+        """
+        with self._session_lock:
+            if self._session is None:
+                try:
+                    from curl_cffi import requests as curl_requests
+                except ImportError:
+                    return None
+                self._session = curl_requests.Session(impersonate="chrome", timeout=self.timeout)
+            return self._session
+
+    def download(self, tickers, period=None, start=None, interval="1d"):
+        import yfinance as yf
+
+        kwargs = {"start": start} if start is not None else {"period": period}
+        # 常に group_by='ticker' を指定して、一貫したデータ構造の取得を試みる
+        with self._lock:
+            df = yf.download(tickers, interval=interval, group_by='ticker', auto_adjust=True,
+                             threads=True, progress=False, timeout=self.timeout,
+                             session=self.session, **kwargs)
+        with profiler.stage("cleanup"):
+            return split_download(df, tickers)
+
+    def company_name(self, ticker):
+        import yfinance as yf
+
+        try:
+            # get_info() は遅いので、スレッドプールから呼ぶ
+            info = yf.Ticker(ticker, session=self.session).info
+            # 名前がない場合はティッカーで代用せず None を返す（代用の名前をキャッシュしない）
+            return info.get('longName') or info.get('shortName') or None
+        except Exception:
+            return None
+
+
+# LocalProvider の .npy ファイルの形式（時刻は UTC のエポックナノ秒）
+NPY_DTYPE = np.dtype([("ts", "<i8")] + [(col, "<f8") for col in OHLCV_COLUMNS])
+
+
+def _meta_path(path):
+    """.npy / .csv と並べて置くメタデータ（タイムゾーン）のファイル"""
+    return f"{os.path.splitext(path)[0]}.meta.json"
+
+
+def _read_tz(path):
+    """メタデータに記録したタイムゾーン。なければ None"""
+    meta_path = _meta_path(path)
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, "r", encoding="utf-8") as f:
+        return json.load(f).get("tz") or None
+
+
+class LocalProvider(DataProvider):
+    """
+    Reads OHLCV files from a directory, for offline, deterministic runs.
+    Layout: <root>/<interval>/<ticker>.npy | .parquet | .csv (a .npy or .csv file of
+    tz-aware bars has a <ticker>.meta.json with the time zone next to it), and an optional
+    <root>/names.json mapping tickers to company names. Periods are measured back
+    from each file's last bar, so results do not depend on the current date.
+    """
+
+    name = "local"
+    cacheable = False
+    concurrent = True
+    extensions = (".npy", ".parquet", ".csv")
+
+    def __init__(self, root):
+        self.root = root
+        self._names = None
+
+    def path(self, ticker, interval):
+        """既存のファイルのパスを返す。なければ None"""
+        for ext in self.extensions:
+            path = os.path.join(self.root, interval, f"{ticker}{ext}")
+            if os.path.exists(path):
+                return path
+        return None
+
+    @staticmethod
+    def read(path):
+        if path.endswith(".npy"):
+            # メモリマップで開くので、必要な部分だけがディスクから読まれる
+            arr = np.load(path, mmap_mode="r")
+            index = pd.DatetimeIndex(pd.to_datetime(np.asarray(arr["ts"]), unit="ns"), name="Date")
+            tz = _read_tz(path)
+            if tz:
+                index = index.tz_localize("UTC").tz_convert(tz)
+            return pd.DataFrame({col: np.asarray(arr[col]) for col in OHLCV_COLUMNS}, index=index)
+        if path.endswith(".parquet"):
+            df = pd.read_parquet(path)
+            df.index = pd.DatetimeIndex(pd.to_datetime(df.index), name="Date")
+            return df
+
+        # 書き込んだ価格をそのまま読み戻せるよう、浮動小数点は丸めずに読む
+        df = pd.read_csv(path, index_col=0, float_precision="round_trip")
+        try:
+            index = pd.to_datetime(df.index)
+        except ValueError:
+            # 夏時間のあるタイムゾーンは UTC オフセットが混在するので、UTC で読む
+            index = pd.to_datetime(df.index, utc=True)
+        # CSV にはオフセットしか残らないので、タイムゾーンはメタデータから戻す
+        tz = _read_tz(path)
+        if tz and index.tz is not None:
+            index = index.tz_convert(tz)
+        df.index = pd.DatetimeIndex(index, name="Date")
+        return df
+
+    def download(self, tickers, period=None, start=None, interval="1d"):
+        data = {}
+        for ticker in tickers:
+            path = self.path(ticker, interval)
+            if path is None:
+                continue
+            df = self.read(path).sort_index().dropna(subset=['Close'])
+            if df.empty:
+                continue
+
+            since = start
+            if since is None and period is not None:
+                last = df.index[-1]
+                since = period_start(period, now=last if last.tzinfo else last.tz_localize("UTC"))
+            if since is not None:
+                start_ts = pd.Timestamp(since)
+                if df.index.tz is None and start_ts.tzinfo is not None:
+                    start_ts = start_ts.tz_convert("UTC").tz_localize(None)
+                elif df.index.tz is not None and start_ts.tzinfo is None:
+                    start_ts = start_ts.tz_localize("UTC")
+                df = df[df.index >= start_ts]
+            if not df.empty:
+                data[ticker] = df
+        return data
+
+    def tickers(self, interval):
+        """interval のファイルがある銘柄の一覧"""
+        directory = os.path.join(self.root, interval)
+        if not os.path.isdir(directory):
+            return []
+        found = {os.path.splitext(f)[0] for f in os.listdir(directory)
+                 if os.path.splitext(f)[1] in self.extensions}
+        return sorted(found)
+
+    def company_name(self, ticker):
+        if self._names is None:
+            path = os.path.join(self.root, "names.json")
+            self._names = {}
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    self._names = json.load(f)
+        return self._names.get(ticker)
+
+    def write(self, ticker, interval, df, fmt="npy"):
+        """Writes a per-ticker OHLCV DataFrame in the provider's layout (npy, parquet or csv)."""
+        directory = os.path.join(self.root, interval)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{ticker}.{fmt}")
+        df = df.reindex(columns=OHLCV_COLUMNS)
+
+        if fmt == "npy":
+            index = pd.DatetimeIndex(df.index)
+            arr = np.empty(len(df), dtype=NPY_DTYPE)
+            # tz 付きの時刻も asi8 は UTC のエポックナノ秒。tz はメタデータに残して読み込み時に戻す
+            arr["ts"] = index.as_unit("ns").asi8
+            for col in OHLCV_COLUMNS:
+                arr[col] = df[col].to_numpy(dtype=np.float64)
+            np.save(path, arr)
+        elif fmt == "parquet":
+            df.to_parquet(path)
+        elif fmt == "csv":
+            df.to_csv(path)
+        else:
+            raise ValueError(f"Unknown format: {fmt}")
+
+        if fmt in ("npy", "csv"):
+            meta_path = _meta_path(path)
+            tz = pd.DatetimeIndex(df.index).tz
+            if tz is not None:
+                with open(meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"tz": str(tz)}, f)
+            elif os.path.exists(meta_path):
+                os.remove(meta_path)
+        return path
+
+
+PROVIDERS = {
+    "yfinance": YFinanceProvider,
+    "local": LocalProvider,
+}
+
+_default_provider = None
+# config.yaml から作ったプロバイダー（設定は最初の1回だけ読み、セッションを使い回す）
+_configured = None
+_configured_lock = threading.Lock()
+
+
+def set_default_provider(provider):
+    """Sets the provider fetch_stock_data uses when none is given (None resets it)."""
+    global _default_provider
+    _default_provider = provider
+
+
+def get_provider(spec=None):
+    """
+    Returns a provider from a name, a dict like {"name": "local", "root": "data"},
+    or (when spec is None) the default: set_default_provider, then the "provider"
+    block of config.yaml, then yfinance.
+    """
+    global _configured
+    if isinstance(spec, DataProvider):
+        return spec
+    if spec is None:
+        if _default_provider is not None:
+            return _default_provider
+        if _configured is None:
+            with _configured_lock:
+                if _configured is None:
+                    _configured = get_provider(load_config().get("provider") or "yfinance")
+        return _configured
+    if isinstance(spec, str):
+        spec = {"name": spec}
+
+    options = dict(spec)
+    name = options.pop("name")
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown data provider: {name}")
+    if name == "local":
+        # 相対パスはプログラムの場所を基準にする
+        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        options["root"] = os.path.join(base_dir, options.get("root", "data"))
+    return PROVIDERS[name](**options)
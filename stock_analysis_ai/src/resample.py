@@ -0,0 +1,164 @@
+import numpy as np
+import pandas as pd
+
+from .cache import OHLCV_COLUMNS
+
+# 取引所ごとのタイムゾーンと立会時間（現地時刻）。分足・時間足はセッションの開始時刻を起点に区切る
+MARKETS = {
+    "TSE": {"tz": "Asia/Tokyo", "sessions": [("09:00", "11:30"), ("12:30", "15:30")]},
+    "US": {"tz": "America/New_York", "sessions": [("09:30", "16:00")]},
+}
+
+# 分足・時間足の長さ（分）
+INTRADAY_MINUTES = {"1m": 1, "2m": 2, "5m": 5, "15m": 15, "30m": 30, "60m": 60, "90m": 90, "1h": 60}
+
+# 日足以上の時間足（日足から作れるもの）
+CALENDAR_INTERVALS = ("1d", "1wk", "1mo")
+
+# 元になる時間足を取得するときの期間（プロバイダーが遡れる最大の期間）
+BASE_PERIOD = {"1m": "7d", "2m": "60d", "5m": "60d", "15m": "60d", "30m": "60d",
+               "60m": "730d", "90m": "60d", "1h": "730d", "1d": "max"}
+
+_MINUTE_NS = 60 * 10 ** 9
+_DAY_NS = 24 * 60 * _MINUTE_NS
+
+
+# 取引所が分からない銘柄（指数・為替など）は、UTC の1日を1つのセッションとして区切る
+_UNKNOWN_MARKET = {"tz": "UTC", "sessions": [("00:00", "24:00")]}
+
+
+def market_of(ticker):
+    """ティッカーの市場を返す（.T は東証、サフィックスなしは米国、それ以外は None）"""
+    if ticker.endswith(".T"):
+        return "TSE"
+    if "." not in ticker and "=" not in ticker and not ticker.startswith("^"):
+        return "US"
+    return None
+
+
+def _minutes(hhmm):
+    hours, minutes = hhmm.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def _rank(interval):
+    """時間足の並び順（細かいほど小さい）"""
+    if interval in INTRADAY_MINUTES:
+        return INTRADAY_MINUTES[interval]
+    if interval in CALENDAR_INTERVALS:
+        return 24 * 60 * (1 + CALENDAR_INTERVALS.index(interval))
+    raise ValueError(f"Unknown interval: {interval}")
+
+
+def can_resample(base, interval):
+    """base の足から interval の足を作れるかどうか"""
+    if interval == base:
+        return True
+    if interval in CALENDAR_INTERVALS:
+        return _rank(base) <= _rank("1d")
+    if base in INTRADAY_MINUTES and interval in INTRADAY_MINUTES:
+        return INTRADAY_MINUTES[interval] % INTRADAY_MINUTES[base] == 0
+    return False
+
+
+def base_interval(intervals):
+    """
+    Picks the interval to fetch so every interval in intervals can be built from it:
+    the finest one. Raises ValueError when some interval cannot be derived from it.
+    """
+    intervals = list(intervals)
+    base = min(intervals, key=_rank)
+    missing = [iv for iv in intervals if not can_resample(base, iv)]
+    if missing:
+        raise ValueError(f"Cannot build {', '.join(missing)} from {base} bars")
+    return base
+
+
+def _bucket_labels(wall_ns, interval, sessions):
+    """
+    各バーの属する足の開始時刻（現地時刻のエポックナノ秒）。
+    分足・時間足は、そのバーを含むセッションの開始時刻から interval ごとに区切る
+    （東証の 1h は 9:00, 10:00, 11:00, 12:30, 13:30, 14:30）。
+    """
+    day = wall_ns // _DAY_NS * _DAY_NS
+    if interval == "1d":
+        return day
+    if interval == "1wk":
+        # 1970-01-01 は木曜日。月曜日を週の始まりにする
+        weekday = (day // _DAY_NS + 3) % 7
+        return day - weekday * _DAY_NS
+    if interval == "1mo":
+        return wall_ns.astype("datetime64[ns]").astype("datetime64[M]").astype("datetime64[ns]").astype(np.int64)
+
+    step = INTRADAY_MINUTES[interval] * _MINUTE_NS
+    opens = np.array([_minutes(start) for start, _ in sessions], dtype=np.int64) * _MINUTE_NS
+    offset = wall_ns - day
+    # 最初のセッションより前のバー（時間外）はその日の 0:00 を起点にする
+    segment = np.searchsorted(opens, offset, side="right") - 1
+    anchor = np.where(segment >= 0, opens[np.maximum(segment, 0)], 0)
+    return day + anchor + (offset - anchor) // step * step
+
+
+def resample_ohlcv(df, interval, market="US"):
+    """
+    Builds interval bars from finer OHLCV bars: first Open, highest High, lowest Low,
+    last Close and summed Volume per bucket. Intraday buckets start at each session
+    open of market ("TSE" or "US"), days and weeks follow the exchange's local calendar,
+    and buckets without bars are left out. market None (unknown exchange) buckets by
+    UTC calendar days without sessions. tz-aware input gives bars in the exchange
+    time zone. tz-naive intraday bars are taken as UTC (like LocalProvider's .npy files)
+    and stay naive UTC; tz-naive bars all at midnight are taken as local dates.
+    Returns: DataFrame with the OHLCV columns, indexed by each bucket's start
+    """
+    if interval not in INTRADAY_MINUTES and interval not in CALENDAR_INTERVALS:
+        raise ValueError(f"Cannot resample to {interval}")
+    spec = MARKETS.get(market, _UNKNOWN_MARKET)
+    df = df.sort_index()
+    if 'Close' in df.columns:
+        df = df.dropna(subset=['Close'])
+    if df.empty:
+        return pd.DataFrame(columns=OHLCV_COLUMNS, index=pd.DatetimeIndex([], name=df.index.name))
+
+    index = pd.DatetimeIndex(df.index)
+    tz = index.tz
+    naive_utc = tz is None and bool((index.as_unit("ns").asi8 % _DAY_NS).any())
+    if naive_utc:
+        index = index.tz_localize("UTC")
+    local = index.tz_convert(spec["tz"]).tz_localize(None) if index.tz is not None else index
+    labels = _bucket_labels(local.as_unit("ns").asi8, interval, spec["sessions"])
+    starts = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+    ends = np.append(starts[1:], len(labels)) - 1
+
+    out = {}
+    if "Open" in df:
+        out["Open"] = df["Open"].to_numpy(dtype=np.float64)[starts]
+    if "High" in df:
+        out["High"] = np.fmax.reduceat(df["High"].to_numpy(dtype=np.float64), starts)
+    if "Low" in df:
+        out["Low"] = np.fmin.reduceat(df["Low"].to_numpy(dtype=np.float64), starts)
+    out["Close"] = df["Close"].to_numpy(dtype=np.float64)[ends]
+    if "Volume" in df:
+        out["Volume"] = np.add.reduceat(np.nan_to_num(df["Volume"].to_numpy(dtype=np.float64)), starts)
+
+    new_index = pd.DatetimeIndex(pd.to_datetime(labels[starts], unit="ns"), name=df.index.name)
+    if index.tz is not None:
+        new_index = new_index.tz_localize(spec["tz"], ambiguous=True, nonexistent="shift_forward")
+        if naive_utc:
+            new_index = new_index.tz_convert("UTC").tz_localize(None)
+    return pd.DataFrame(out, index=new_index)
+
+
+def resample_frames(data, interval, base=None):
+    """
+    Resamples every ticker of a fetch_stock_data result to interval, using each
+    ticker's own exchange sessions. Returns data unchanged when interval == base.
+    Returns: dict of ticker -> DataFrame
+    """
+    if interval == base:
+        return data
+    frames = {}
+    for ticker, df in data.items():
+        bars = resample_ohlcv(df, interval, market_of(ticker))
+        if not bars.empty:
+            frames[ticker] = bars
+    return frames
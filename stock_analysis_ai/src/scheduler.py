@@ -0,0 +1,252 @@
+import os
+import asyncio
+import json
+import pickle
+import shutil
+import threading
+import time
+from datetime import datetime, time as dtime
+from zoneinfo import ZoneInfo
+
+from .analysis import aanalyze, ranking_frame
+from .history import ResultHistory
+from .store import PriceStore
+from .profiling import profiler
+from .resample import market_of
+from .warmstart import request_key
+from .utils import get_cache_dir
+
+# 時間足ごとのバーの長さ（秒）
+BAR_SECONDS = {
+    "1m": 60,
+    "2m": 2 * 60,
+    "5m": 5 * 60,
+    "15m": 15 * 60,
+    "30m": 30 * 60,
+    "60m": 60 * 60,
+    "1h": 60 * 60,
+    "1d": 24 * 60 * 60,
+}
+
+# 日足は場中も最終バーが動くので、この間隔で更新する
+DAILY_REFRESH_SECONDS = 60 * 60
+
+# 時間足ごとの既定の分析期間（ダッシュボードの初期値と同じ）
+DEFAULT_PERIODS = {"1d": "1y", "1h": "1mo", "15m": "5d", "5m": "5d", "1m": "5d"}
+
+# 市場ごとの取引時間（現地時間）。祝日は考慮しない
+MARKET_SESSIONS = {
+    "TSE": (ZoneInfo("Asia/Tokyo"), [(dtime(9, 0), dtime(11, 30)), (dtime(12, 30), dtime(15, 30))]),
+    "US": (ZoneInfo("America/New_York"), [(dtime(9, 30), dtime(16, 0))]),
+}
+
+
+def is_market_open(market, now=None, grace=0):
+    """
+    市場が開いているかどうか。grace 秒だけ引けの後も開いているとみなす（最後のバーの確定用）。
+    取引時間が分からない市場は常に開いているとみなす。
+    """
+    if market not in MARKET_SESSIONS:
+        return True
+    tz, sessions = MARKET_SESSIONS[market]
+    now = datetime.fromtimestamp(time.time() if now is None else now, tz)
+    if now.weekday() >= 5:
+        return False
+    for start, end in sessions:
+        opened = now.replace(hour=start.hour, minute=start.minute, second=0, microsecond=0)
+        closed = now.replace(hour=end.hour, minute=end.minute, second=0, microsecond=0)
+        if opened.timestamp() <= now.timestamp() <= closed.timestamp() + grace:
+            return True
+    return False
+
+
+def refresh_seconds(interval):
+    return min(BAR_SECONDS.get(interval, 60), DAILY_REFRESH_SECONDS)
+
+
+def snapshot_key(tickers, interval, period, settings):
+    """(銘柄, 時間足, 期間, 設定) からスナップショットのキーを作る"""
+    return request_key(tickers, interval, period, settings)
+
+
+def _snapshot_paths(key):
+    base = os.path.join(get_cache_dir(), "snapshots")
+    os.makedirs(base, exist_ok=True)
+    return os.path.join(base, f"{key}.pkl"), os.path.join(base, f"{key}.json")
+
+
+def _remove_old_stores(key):
+    # 直前の版は、pickle を読んだ直後のプロセスがこれから開くかもしれないので残す。
+    # 開かれているファイルは Windows では消せないので、その場合は次回に持ち越す
+    base = os.path.dirname(_snapshot_paths(key)[0])
+    prefix = f"{key}.store."
+    stores = sorted((name for name in os.listdir(base) if name.startswith(prefix)),
+                    key=lambda name: int(name[len(prefix):]))
+    for name in stores[:-2]:
+        shutil.rmtree(os.path.join(base, name), ignore_errors=True)
+
+
+def save_snapshot(result, tickers, interval, period, settings):
+    """
+    分析結果をスナップショットとして保存する（書き込み途中のファイルは読まれない）。
+    価格と指標はメモリマップで開ける .npy のディレクトリに書き、残りだけを pickle にする。
+    """
+    key = snapshot_key(tickers, interval, period, settings)
+    data_path, meta_path = _snapshot_paths(key)
+
+    store = result["data"]
+    if not isinstance(store, PriceStore):
+        store = PriceStore.from_frames(store)
+    # 読み込み中のプロセスがあっても壊さないよう、毎回新しいディレクトリに書く
+    store_dir = f"{key}.store.{time.time_ns()}"
+    store.save(os.path.join(os.path.dirname(data_path), store_dir))
+
+    tmp_path = f"{data_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump({**result, "data": None, "store_dir": store_dir}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, data_path)
+    touch_snapshot(key, updated=True)
+    _remove_old_stores(key)
+    return key
+
+
+def touch_snapshot(key, updated=False):
+    """スナップショットが最新であることを記録する（市場が閉まっていて再取得しない場合も含む）"""
+    _, meta_path = _snapshot_paths(key)
+    meta = {}
+    if os.path.exists(meta_path):
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    now = time.time()
+    meta["checked_at"] = now
+    if updated:
+        meta["updated_at"] = now
+    tmp_path = f"{meta_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, meta_path)
+
+
+_loaded = {}
+
+
+def load_snapshot(tickers, interval, period, settings, max_age=None):
+    """
+    Returns the latest published analysis result for the request, or None when there
+    is no snapshot or it was last checked more than max_age seconds ago.
+    """
+    key = snapshot_key(tickers, interval, period, settings)
+    data_path, meta_path = _snapshot_paths(key)
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        mtime = os.path.getmtime(data_path)
+    except (OSError, ValueError):
+        profiler.count("snapshot_misses")
+        return None
+    if max_age is not None and time.time() - meta.get("checked_at", 0) > max_age:
+        profiler.count("snapshot_misses")
+        return None
+    profiler.count("snapshot_hits")
+
+    # 同じファイルを何度も読み込まないよう、更新時刻ごとにプロセス内で保持する
+    cached = _loaded.get(key)
+    if cached is None or cached[0] != mtime:
+        with open(data_path, "rb") as f:
+            result = pickle.load(f)
+        # 価格と指標はメモリマップで開く（プロセス間で同じページを共有し、読み込みはほぼ一瞬）
+        store_dir = result.pop("store_dir", None)
+        if store_dir is not None:
+            try:
+                result["data"] = PriceStore.open(os.path.join(os.path.dirname(data_path), store_dir))
+            except OSError:
+                return None
+        cached = (mtime, result)
+        _loaded[key] = cached
+    return cached[1]
+
+
+class RefreshScheduler(threading.Thread):
+    """
+    Background worker that refreshes subscribed watchlists once per bar of their interval
+    and publishes the results as on-disk snapshots. Watchlists whose markets are all
+    closed are not refetched. Viewers only read snapshots, so provider load does not
+    grow with the number of viewers. The scheduler is also the only recorder of the
+    scan history for its watchlists.
+    """
+
+    def __init__(self, poll_seconds=5, subscription_ttl=10 * 60):
+        super().__init__(name="refresh-scheduler", daemon=True)
+        self.poll_seconds = poll_seconds
+        self.subscription_ttl = subscription_ttl
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._subscriptions = {}
+
+    def subscribe(self, tickers, interval, period, settings, persistent=False):
+        """Registers (or keeps alive) a watchlist to refresh. Returns the snapshot key."""
+        key = snapshot_key(tickers, interval, period, settings)
+        with self._lock:
+            sub = self._subscriptions.get(key)
+            if sub is None:
+                sub = {
+                    "tickers": list(tickers), "interval": interval, "period": period,
+                    "settings": dict(settings), "next_run": 0.0, "persistent": persistent,
+                }
+                self._subscriptions[key] = sub
+            sub["seen_at"] = time.time()
+        return key
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _next_run(self, interval, now):
+        # 次のバーの区切りの少し後（プロバイダー側でバーが確定するのを待つ）
+        step = refresh_seconds(interval)
+        return (now // step + 1) * step + 2
+
+    def run_once(self, now=None):
+        """Refreshes every subscription that is due."""
+        now = time.time() if now is None else now
+        with self._lock:
+            # しばらく閲覧されていない購読は止める
+            expired = [k for k, s in self._subscriptions.items()
+                       if not s["persistent"] and now - s["seen_at"] > self.subscription_ttl]
+            for k in expired:
+                del self._subscriptions[k]
+            due = [(k, dict(s)) for k, s in self._subscriptions.items() if s["next_run"] <= now]
+
+        if due:
+            asyncio.run(self._refresh(due, now))
+
+    async def _refresh(self, due, now):
+        # 期限の来た購読はまとめて並行に更新する（接続プールは fetcher 側で共有される）
+        await asyncio.gather(*(self._refresh_one(key, sub, now) for key, sub in due))
+
+    async def _refresh_one(self, key, sub, now):
+        grace = refresh_seconds(sub["interval"])
+        markets = {market_of(t) for t in sub["tickers"]}
+        has_snapshot = os.path.exists(_snapshot_paths(key)[0])
+        try:
+            if has_snapshot and not any(is_market_open(m, now, grace) for m in markets):
+                touch_snapshot(key)
+            else:
+                result = await aanalyze(sub["tickers"], sub["period"], sub["interval"], sub["settings"])
+                # 書き込みはイベントループの外で行い、他の購読の取得を止めない
+                await asyncio.to_thread(self._publish, result, sub)
+        except Exception as e:
+            print(f"Refresh failed for {sub['tickers']} ({sub['interval']}): {e}")
+        with self._lock:
+            if key in self._subscriptions:
+                self._subscriptions[key]["next_run"] = self._next_run(sub["interval"], time.time())
+
+    @staticmethod
+    def _publish(result, sub):
+        """スナップショットを保存し、スキャン結果を履歴に追記する"""
+        save_snapshot(result, sub["tickers"], sub["interval"], sub["period"], sub["settings"])
+        ResultHistory(sub["interval"], sub["period"], sub["tickers"], sub["settings"]).append(ranking_frame(result))
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.run_once()
+            self._stop_event.wait(self.poll_seconds)
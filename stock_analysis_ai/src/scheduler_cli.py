@@ -0,0 +1,39 @@
+import sys
+import os
+import argparse
+
+# Ensure the project root is in path if running directly (src is imported as a package)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils import load_config
+from src.scheduler import DEFAULT_PERIODS, RefreshScheduler, refresh_seconds
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Refresh the watchlist in the background and publish snapshots")
+    parser.add_argument("--intervals", nargs="+", default=None,
+                        help="Intervals to refresh (default: interval in config.yaml)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    config = load_config()
+    settings = config['settings']
+    intervals = args.intervals or [settings['interval']]
+
+    scheduler = RefreshScheduler()
+    for interval in intervals:
+        period = settings['period'] if interval == settings['interval'] else DEFAULT_PERIODS.get(interval, "5d")
+        scheduler.subscribe(config['tickers'], interval, period, settings, persistent=True)
+        print(f"Refreshing {len(config['tickers'])} tickers every {refresh_seconds(interval)}s ({interval}, {period})")
+
+    try:
+        scheduler.run()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,19 @@
+import numpy as np
 import pandas as pd
 
+from .indicators import indicator_columns
+
+# 判定理由のコード（ReasonCode の各ビット範囲）と表示文字列
+RSI_REASONS = ["", "RSI: No Data", "RSI Oversold (<30)", "RSI Overbought (>70)", "RSI Neutral"]
+MACD_REASONS = ["", "MACD Bullish Cross", "MACD Bearish"]
+MA_REASONS = ["", "Golden Cross / Bullish Trend", "Death Cross / Bearish Trend"]
+
+_RSI_BITS, _MACD_SHIFT, _MA_SHIFT = 0x7, 3, 5
+
+# score_arrays が返すシグナルのコード（SIGNAL_NAMES の添字）
+SIGNAL_WAIT, SIGNAL_BUY, SIGNAL_SELL = 0, 1, 2
+SIGNAL_NAMES = ["WAIT", "BUY", "SELL"]
+
 def evaluate_stock(df, settings):
     """
     Evaluates the latest data point of the stock to generate a score and signal.
@@ -81,3 +95,150 @@ def evaluate_stock(df, settings):
         signal = "WAIT"
 
     return score, signal, ", ".join(reason)
+
+
+def latest_values(data, settings):
+    """
+    Collects the last row (Close and indicator columns) of each per-ticker DataFrame.
+    Returns: DataFrame indexed by ticker, the input of score_batch
+    """
+    # ma_short == ma_long のように同じ列名になる指標は1列にまとめる
+    columns = list(dict.fromkeys(['Close'] + list(indicator_columns(settings).values())))
+    rows, tickers = [], []
+    for ticker, df in data.items():
+        if df.empty:
+            continue
+        df = df.loc[:, ~df.columns.duplicated()]
+        rows.append(df.reindex(columns=columns).to_numpy(dtype=np.float64)[-1])
+        tickers.append(ticker)
+
+    values = np.vstack(rows) if rows else np.empty((0, len(columns)))
+    return pd.DataFrame(values, index=pd.Index(tickers, name="Ticker"), columns=columns)
+
+
+def score_arrays(values, settings, shape=None):
+    """
+    Applies the evaluate_stock rules element-wise to indicator arrays of any shape
+    (one row per ticker, or time x tickers for backtests).
+    values: mapping of indicator column -> array; missing columns are skipped.
+    shape: result shape, needed only when values holds no indicator columns.
+    Returns: (score, signal code, reason code) arrays; signal code is
+    SIGNAL_BUY / SIGNAL_SELL / SIGNAL_WAIT.
+    """
+    cols = indicator_columns(settings)
+    for name in cols.values():
+        if name in values:
+            shape = np.shape(values[name])
+            break
+    if shape is None:
+        raise ValueError("No indicator columns to score and no shape given")
+
+    score = np.full(shape, 50, dtype=np.int16)
+    rsi_code = np.zeros(shape, dtype=np.int16)
+    macd_code = np.zeros(shape, dtype=np.int16)
+    ma_code = np.zeros(shape, dtype=np.int16)
+
+    # Check RSI
+    if cols["rsi"] in values:
+        rsi = np.asarray(values[cols["rsi"]], dtype=np.float64)
+        no_data = np.isnan(rsi)
+        oversold = rsi < 30
+        overbought = rsi > 70
+        score += np.where(oversold, 20, 0).astype(np.int16) - np.where(overbought, 20, 0).astype(np.int16)
+        rsi_code = np.select([no_data, oversold, overbought], [1, 2, 3], default=4).astype(np.int16)
+
+    # Check MACD
+    if cols["macd"] in values and cols["macd_signal"] in values:
+        macd = np.asarray(values[cols["macd"]], dtype=np.float64)
+        signal_line = np.asarray(values[cols["macd_signal"]], dtype=np.float64)
+        valid = ~(np.isnan(macd) | np.isnan(signal_line))
+        bullish = macd > signal_line
+        score += np.where(valid, np.where(bullish, 10, -10), 0).astype(np.int16)
+        macd_code = np.where(valid, np.where(bullish, 1, 2), 0).astype(np.int16)
+
+    # Check Trend (MA)
+    if cols["sma_short"] in values and cols["sma_long"] in values:
+        ma_s = np.asarray(values[cols["sma_short"]], dtype=np.float64)
+        ma_l = np.asarray(values[cols["sma_long"]], dtype=np.float64)
+        valid = ~(np.isnan(ma_s) | np.isnan(ma_l))
+        bullish = ma_s > ma_l
+        score += np.where(valid, np.where(bullish, 10, -10), 0).astype(np.int16)
+        ma_code = np.where(valid, np.where(bullish, 1, 2), 0).astype(np.int16)
+
+    # Final Signal Determination
+    signal = np.select([score >= 70, score <= 30], [SIGNAL_BUY, SIGNAL_SELL], default=SIGNAL_WAIT).astype(np.int8)
+    reason_code = rsi_code | (macd_code << _MACD_SHIFT) | (ma_code << _MA_SHIFT)
+    return score, signal, reason_code
+
+
+def score_batch(latest, settings):
+    """
+    Scores many tickers at once with the same rules as evaluate_stock.
+    latest: DataFrame of the latest indicator values, one row per ticker.
+    Returns: DataFrame with Score, Signal and ReasonCode columns (see render_reasons).
+    """
+    values = {col: latest[col].to_numpy(dtype=np.float64) for col in latest.columns}
+    score, signal, reason_code = score_arrays(values, settings, shape=(len(latest),))
+
+    return pd.DataFrame({
+        "Score": score.astype(np.int64),
+        "Signal": np.array(SIGNAL_NAMES, dtype=object)[signal],
+        "ReasonCode": reason_code.astype(np.int64),
+    }, index=latest.index)
+
+
+def combine_timeframes(scores, weights=None):
+    """
+    Combines score_batch results of several intervals into one multi-timeframe score:
+    the weighted mean of each ticker's per-interval scores (intervals without data for
+    a ticker are left out of its mean), with the same BUY/SELL thresholds as evaluate_stock.
+    scores: dict of interval -> score_batch DataFrame
+    weights: dict of interval -> weight (default: equal weights)
+    Returns: DataFrame indexed by ticker with Score, Signal, Agree (intervals whose
+    signal matches the combined one) and Score_<interval> / Signal_<interval> columns.
+    """
+    intervals = list(scores)
+    tickers = pd.Index(list(dict.fromkeys(t for frame in scores.values() for t in frame.index)), name="Ticker")
+    per_score = np.full((len(tickers), len(intervals)), np.nan)
+    per_signal = np.full((len(tickers), len(intervals)), None, dtype=object)
+    for j, interval in enumerate(intervals):
+        frame = scores[interval].reindex(tickers)
+        per_score[:, j] = frame["Score"].to_numpy(dtype=np.float64)
+        per_signal[:, j] = frame["Signal"].to_numpy(dtype=object)
+
+    w = np.array([1.0 if weights is None else float(weights.get(iv, 0.0)) for iv in intervals])
+    present = ~np.isnan(per_score)
+    total = (present * w).sum(axis=1)
+    mean = np.where(present, per_score, 0.0) @ w / np.where(total > 0, total, 1.0)
+    score = np.where(total > 0, np.rint(mean), np.nan)
+
+    signal = np.select([score >= 70, score <= 30], [SIGNAL_BUY, SIGNAL_SELL], default=SIGNAL_WAIT)
+    signal_names = np.array(SIGNAL_NAMES, dtype=object)[signal]
+    signal_names[np.isnan(score)] = "NO DATA"
+
+    out = pd.DataFrame({
+        "Score": pd.array(score, dtype="Int64"),
+        "Signal": signal_names,
+        "Agree": (per_signal == signal_names[:, None]).sum(axis=1),
+    }, index=tickers)
+    for j, interval in enumerate(intervals):
+        out[f"Score_{interval}"] = pd.array(per_score[:, j], dtype="Int64")
+        out[f"Signal_{interval}"] = per_signal[:, j]
+    return out
+
+
+def render_reasons(codes):
+    """
+    Turns ReasonCode values from score_batch into the reason text of evaluate_stock.
+    Only call it for the rows that are actually displayed.
+    """
+    reasons = []
+    for code in codes:
+        code = int(code)
+        parts = [
+            RSI_REASONS[code & _RSI_BITS],
+            MACD_REASONS[(code >> _MACD_SHIFT) & 0x3],
+            MA_REASONS[(code >> _MA_SHIFT) & 0x3],
+        ]
+        reasons.append(", ".join(p for p in parts if p))
+    return reasons
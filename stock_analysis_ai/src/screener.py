@@ -0,0 +1,251 @@
+import ast
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from .cache import OHLCVCache
+from .fetcher import iter_stock_data
+from .indicators import IndicatorStateStore, indicator_columns, settings_digest
+from .profiling import profiler
+from .providers import get_provider
+from .scorer import score_batch
+from .utils import get_cache_dir
+
+# 索引の列（銘柄ごとの最終バーの要約）。query() の条件式ではこの列名を使う
+INDEX_COLUMNS = [
+    "Name", "Time", "Close", "Change", "Volume", "RSI", "MAShort", "MALong", "MASpread",
+    "MACD", "MACDSignal", "MACDHist", "GoldenCross", "MACDBullish", "Score", "Signal", "ReasonCode",
+]
+
+# 条件式で許す構文（列名・数値/文字列の定数・比較・and/or/not）。
+# @ によるローカル変数の参照、属性、添字、関数呼び出しは DataFrame.query に渡さない
+_ALLOWED_NODES = (
+    ast.Expression, ast.BoolOp, ast.And, ast.Or, ast.UnaryOp, ast.Not, ast.USub, ast.UAdd,
+    ast.BinOp, ast.BitAnd, ast.BitOr, ast.Invert, ast.Compare, ast.Eq, ast.NotEq,
+    ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.Name, ast.Load, ast.Constant,
+)
+
+
+def validate_expr(expr):
+    """
+    Checks a screener condition before it reaches DataFrame.query. Only INDEX_COLUMNS
+    names, numeric/string constants, comparisons and and/or/not (&, |, ~) are allowed.
+    Raises ValueError for anything else (@ locals, attribute access, subscripts, calls).
+    """
+    try:
+        tree = ast.parse(expr, mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"invalid screener expression: {expr!r}") from e
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise ValueError(f"{type(node).__name__} is not allowed in a screener expression: {expr!r}")
+        if isinstance(node, ast.BinOp) and not isinstance(node.op, (ast.BitAnd, ast.BitOr)):
+            raise ValueError(f"arithmetic is not allowed in a screener expression: {expr!r}")
+        if isinstance(node, ast.Name) and node.id not in INDEX_COLUMNS and node.id not in ("True", "False"):
+            raise ValueError(f"unknown column {node.id!r} in a screener expression (use {', '.join(INDEX_COLUMNS)})")
+        if isinstance(node, ast.Constant) and type(node.value) not in (int, float, str, bool):
+            raise ValueError(f"constant {node.value!r} is not allowed in a screener expression")
+
+
+def load_universe(spec, interval="1d", provider=None):
+    """
+    Tickers to screen.
+    spec: a file with one ticker per line (or a CSV whose first column is the ticker;
+    blank lines and # comments are skipped), or "cache" for every ticker that already
+    has interval bars in the OHLCV cache / the local provider's directory.
+    """
+    if spec == "cache":
+        provider = get_provider(provider)
+        if hasattr(provider, "tickers"):
+            return provider.tickers(interval)
+        return OHLCVCache().tickers(interval)
+
+    tickers = []
+    with open(spec, "r", encoding="utf-8") as f:
+        for line in f:
+            ticker = line.split("#", 1)[0].split(",", 1)[0].strip()
+            if ticker and ticker.lower() not in ("ticker", "symbol", "code"):
+                tickers.append(ticker)
+    return list(dict.fromkeys(tickers))
+
+
+def _index_path(interval, settings):
+    """(時間足, 指標の設定) ごとの索引ファイル"""
+    directory = os.path.join(get_cache_dir(), "screener")
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"{interval}-{settings_digest(settings)}.pkl")
+
+
+class ScreenerIndex:
+    """
+    Latest-bar summary of every screened ticker (price, volume, RSI, MA spread, MACD
+    state, score), one row per ticker. update() only recomputes tickers whose last bar
+    changed, feeding just their new bars to the per-ticker indicator states that are
+    saved with the index, and query() filters the summary without touching any price history.
+    """
+
+    def __init__(self, interval, settings, table=None, states=None):
+        self.interval = interval
+        self.settings = dict(settings)
+        if table is None:
+            table = pd.DataFrame(columns=INDEX_COLUMNS, index=pd.Index([], name="Ticker"))
+        self.table = table
+        self.states = IndicatorStateStore() if states is None else states
+
+    @classmethod
+    def load(cls, interval, settings):
+        """保存済みの索引を開く。なければ空の索引を返す"""
+        path = _index_path(interval, settings)
+        if os.path.exists(path):
+            try:
+                with open(path, "rb") as f:
+                    saved = pickle.load(f)
+                # 指標の状態がない古い形式の索引は、状態を作り直す
+                if isinstance(saved, pd.DataFrame):
+                    return cls(interval, settings, saved)
+                return cls(interval, settings, saved["table"], saved["states"])
+            except (OSError, pickle.UnpicklingError, EOFError):
+                pass
+        return cls(interval, settings)
+
+    def save(self):
+        path = _index_path(self.interval, self.settings)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"table": self.table, "states": self.states}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        return path
+
+    def __len__(self):
+        return len(self.table)
+
+    def _changed(self, data):
+        """最終バーの時刻か終値が索引と違う銘柄だけを選ぶ"""
+        known_time = self.table["Time"].to_dict()
+        known_close = self.table["Close"].to_dict()
+        changed = {}
+        for ticker, df in data.items():
+            if df is None or df.empty:
+                continue
+            if ticker in known_time:
+                last_time = pd.DatetimeIndex(df.index[-1:]).as_unit("ns").asi8[0]
+                if known_time[ticker] == last_time and known_close[ticker] == float(df['Close'].iloc[-1]):
+                    continue
+            changed[ticker] = df
+        return changed
+
+    def update(self, data, names=None):
+        """
+        Refreshes the rows of the tickers in data (dict of per-ticker DataFrames).
+        Tickers whose last bar is unchanged are skipped.
+        Returns: number of tickers whose row was recomputed
+        """
+        names = names or {}
+        changed = self._changed(data)
+        for ticker in set(data) - set(changed):
+            if ticker in names and ticker in self.table.index:
+                self.table.at[ticker, "Name"] = names[ticker]
+        if not changed:
+            return 0
+
+        tickers = list(changed)
+        cols = indicator_columns(self.settings)
+        with profiler.stage("indicators"):
+            # 前回までに見たバーの状態に、新しいバーだけを足す
+            values = [self.states.update(ticker, df, self.settings) for ticker, df in changed.items()]
+        closes = [df['Close'].to_numpy(dtype=np.float64) for df in changed.values()]
+        latest = pd.DataFrame(values, index=pd.Index(tickers, name="Ticker"), columns=list(cols.values()))
+        latest.insert(0, "Close", [c[-1] for c in closes])
+        with profiler.stage("scoring"):
+            scores = score_batch(latest, self.settings)
+
+        prev_close = np.array([c[-2] if len(c) > 1 else np.nan for c in closes])
+        close = latest["Close"].to_numpy()
+        ma_short = latest[cols["sma_short"]].to_numpy()
+        ma_long = latest[cols["sma_long"]].to_numpy()
+        macd = latest[cols["macd"]].to_numpy()
+        macd_signal = latest[cols["macd_signal"]].to_numpy()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rows = pd.DataFrame({
+                "Name": [names.get(t, self._name(t)) for t in tickers],
+                "Time": pd.DatetimeIndex([df.index[-1] for df in changed.values()]).as_unit("ns").asi8,
+                "Close": close,
+                "Change": (close / prev_close - 1) * 100,
+                "Volume": np.array([df['Volume'].to_numpy(dtype=np.float64)[-1] for df in changed.values()]),
+                "RSI": latest[cols["rsi"]].to_numpy(),
+                "MAShort": ma_short,
+                "MALong": ma_long,
+                "MASpread": (ma_short / ma_long - 1) * 100,
+                "MACD": macd,
+                "MACDSignal": macd_signal,
+                "MACDHist": macd - macd_signal,
+                "GoldenCross": ma_short > ma_long,
+                "MACDBullish": macd > macd_signal,
+                "Score": scores["Score"].to_numpy(),
+                "Signal": scores["Signal"].to_numpy(),
+                "ReasonCode": scores["ReasonCode"].to_numpy(),
+            }, index=pd.Index(tickers, name="Ticker"))
+
+        kept = self.table.drop(index=rows.index, errors="ignore")
+        self.table = pd.concat([kept, rows]) if len(kept) else rows
+        return len(rows)
+
+    def _name(self, ticker):
+        if ticker in self.table.index:
+            return self.table.at[ticker, "Name"]
+        return ticker
+
+    def query(self, expr=None, tickers=None):
+        """
+        Filters the summary with a pandas query expression over INDEX_COLUMNS,
+        e.g. "RSI < 30 and GoldenCross and Volume > 1e6". Rows are sorted by score.
+        The expression is checked with validate_expr() first (ValueError if rejected).
+        tickers: restrict to these tickers (default: every indexed ticker)
+        """
+        table = self.table
+        if tickers is not None:
+            table = table[table.index.isin(list(tickers))]
+        if expr:
+            validate_expr(expr)
+            table = table.query(expr)
+        return table.sort_values(by="Score", ascending=False, kind="stable")
+
+    def ranking(self, expr=None, tickers=None):
+        """query() の結果を ranking_frame と同じ列 (Ticker, Name, Close, Score, Signal, ReasonCode) で返す"""
+        table = self.query(expr, tickers)
+        ranking = pd.DataFrame({
+            "Ticker": table.index,
+            "Name": table["Name"].to_numpy(),
+            "Close": table["Close"].to_numpy(dtype=np.float64),
+            "Score": table["Score"].to_numpy(dtype=np.int64),
+            "Signal": table["Signal"].to_numpy(),
+            "ReasonCode": table["ReasonCode"].to_numpy(dtype=np.int64),
+        })
+        return ranking
+
+
+def iter_screen(tickers, interval, period, settings, provider=None, index=None):
+    """
+    Updates the screener index for tickers chunk by chunk as the data arrives and
+    saves it at the end. Yields (index, tickers received so far) after each chunk.
+    """
+    if index is None:
+        index = ScreenerIndex.load(interval, settings)
+    received = 0
+    try:
+        for data, names in iter_stock_data(list(tickers), period=period, interval=interval, provider=provider):
+            index.update(data, names)
+            received += len(data)
+            yield index, received
+    finally:
+        index.save()
+
+
+def screen(tickers, interval, period, settings, provider=None):
+    """iter_screen を最後まで実行して索引を返す"""
+    index = ScreenerIndex.load(interval, settings)
+    for _ in iter_screen(tickers, interval, period, settings, provider=provider, index=index):
+        pass
+    return index
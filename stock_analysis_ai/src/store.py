@@ -0,0 +1,206 @@
+import json
+import os
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+
+from .cache import OHLCV_COLUMNS
+from .indicators import PackedClose, packed_indicators
+
+
+def _index_ns(index):
+    """DatetimeIndex をエポックナノ秒に変換する（tz 付きは UTC、tz なしはそのままの時刻）"""
+    return pd.DatetimeIndex(index).as_unit("ns").asi8
+
+
+class PriceStore(Mapping):
+    """
+    Columnar in-memory store of per-ticker price history.
+    Each field is one contiguous array holding every ticker's bars back to back;
+    ticker i owns rows offsets[i]:offsets[i + 1]. Bar times are positions into one
+    shared, sorted time index. Indicators and the scorer read views of these arrays,
+    and store[ticker] builds a DataFrame over them, so it can stand in for the dict
+    of DataFrames returned by fetch_stock_data.
+    """
+
+    def __init__(self, tickers, offsets, times, time_pos, columns, tz=None, index_name="Date"):
+        self.tickers = list(tickers)
+        self.offsets = offsets
+        self.times = times
+        self.time_pos = time_pos
+        self.columns = dict(columns)
+        self.tz = list(tz) if tz is not None else [None] * len(self.tickers)
+        self.index_name = index_name
+        self._position = {ticker: i for i, ticker in enumerate(self.tickers)}
+
+    @classmethod
+    def from_frames(cls, frames, columns=None, dtype=np.float64):
+        """
+        Builds a store from per-ticker DataFrames (a dict or an iterable of (ticker, df)).
+        columns: fields to keep (default: OHLCV plus any other numeric columns of the first frame)
+        dtype: dtype of the fields other than Close; float32 halves their memory.
+        Close and indicators stay float64 so results match calculate_indicators exactly.
+        """
+        items = frames.items() if isinstance(frames, Mapping) else frames
+        tickers, lengths, stamps, tz, parts = [], [], [], [], {}
+        index_name = "Date"
+        for ticker, df in items:
+            if df is None or df.empty:
+                continue
+            df = df.sort_index()
+            df = df.loc[:, ~df.columns.duplicated()]
+            if columns is None:
+                extra = [c for c in df.columns if c not in OHLCV_COLUMNS and pd.api.types.is_numeric_dtype(df[c])]
+                columns = OHLCV_COLUMNS + extra
+                index_name = df.index.name or index_name
+            tickers.append(ticker)
+            lengths.append(len(df))
+            stamps.append(_index_ns(df.index))
+            tz.append(str(df.index.tz) if df.index.tz is not None else None)
+            for col in columns:
+                col_dtype = dtype if col in OHLCV_COLUMNS and col != "Close" else np.float64
+                values = df[col].to_numpy(dtype=col_dtype) if col in df.columns else np.full(len(df), np.nan, col_dtype)
+                parts.setdefault(col, []).append(values)
+            # 銘柄ごとの DataFrame はここで手放す（大きな銘柄数でもピークを抑える）
+            del df
+
+        offsets = np.zeros(len(tickers) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        ts = np.concatenate(stamps) if stamps else np.empty(0, dtype=np.int64)
+        times = np.unique(ts)
+        time_pos = np.searchsorted(times, ts).astype(np.int32 if len(times) < 2 ** 31 else np.int64)
+        data = {col: np.concatenate(values) for col, values in parts.items()}
+        return cls(tickers, offsets, times, time_pos, data, tz, index_name)
+
+    # --- Mapping (ticker -> DataFrame) ---
+
+    def __getitem__(self, ticker):
+        return self.frame(ticker)
+
+    def __iter__(self):
+        return iter(self.tickers)
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def __contains__(self, ticker):
+        return ticker in self._position
+
+    # --- 列・銘柄の参照 ---
+
+    @property
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    @property
+    def nbytes(self):
+        arrays = [self.offsets, self.times, self.time_pos] + list(self.columns.values())
+        return sum(arr.nbytes for arr in arrays)
+
+    def bounds(self, ticker):
+        i = self._position[ticker]
+        return int(self.offsets[i]), int(self.offsets[i + 1])
+
+    def column(self, name, ticker=None):
+        """全銘柄分の連続した配列、または ticker の区間のビュー（コピーしない）"""
+        values = self.columns[name]
+        if ticker is None:
+            return values
+        start, stop = self.bounds(ticker)
+        return values[start:stop]
+
+    def index(self, ticker):
+        start, stop = self.bounds(ticker)
+        index = pd.to_datetime(self.times[self.time_pos[start:stop]], unit="ns")
+        tz = self.tz[self._position[ticker]]
+        if tz is not None:
+            index = index.tz_localize("UTC").tz_convert(tz)
+        return pd.DatetimeIndex(index, name=self.index_name)
+
+    def frame(self, ticker):
+        """ticker の DataFrame（列は配列のビュー）"""
+        start, stop = self.bounds(ticker)
+        return pd.DataFrame({name: values[start:stop] for name, values in self.columns.items()},
+                            index=self.index(ticker), copy=False)
+
+    def set_column(self, name, values):
+        values = np.asarray(values)
+        if values.shape != (self.offsets[-1],):
+            raise ValueError(f"{name}: expected {self.offsets[-1]} values, got {values.shape}")
+        self.columns[name] = values
+
+    # --- 指標・スコア用 ---
+
+    def _row_mask(self):
+        """(銘柄 × 最大バー数) のマスク。True の位置を行優先で並べると連続配列と同じ順になる"""
+        lengths = self.lengths
+        width = int(lengths.max()) if len(lengths) else 0
+        return np.arange(width)[None, :] < lengths[:, None]
+
+    def packed(self, name):
+        """列を (最大バー数 × 銘柄) の2次元配列に上詰めで並べる（バーのない位置は NaN）"""
+        mask = self._row_mask()
+        out = np.full(mask.shape[::-1], np.nan)
+        out.T[mask] = self.columns[name]
+        return out
+
+    def add_indicators(self, settings):
+        """
+        Adds the calculate_indicators columns for every ticker in one panel computation.
+        Values are identical to calculate_indicators run on each ticker.
+        Returns: self
+        """
+        if not self.tickers:
+            return self
+        mask = self._row_mask()
+        panel = PackedClose.from_packed(self.packed("Close"), None, None)
+        for name, values in packed_indicators(panel, settings).items():
+            self.columns[name] = values.T[mask]
+        return self
+
+    def latest(self, columns):
+        """
+        Last value of each column per ticker.
+        Returns: DataFrame indexed by ticker (like scorer.latest_values)
+        """
+        last = self.offsets[1:] - 1
+        columns = list(dict.fromkeys(columns))
+        values = {col: (self.columns[col][last] if col in self.columns else np.full(len(last), np.nan))
+                  for col in columns}
+        return pd.DataFrame(values, index=pd.Index(self.tickers, name="Ticker"), columns=list(columns))
+
+    # --- ファイル（メモリマップ） ---
+
+    def save(self, path):
+        """
+        Writes the store as a directory of .npy files plus meta.json.
+        The layout is fixed, so open() maps the arrays without parsing anything.
+        """
+        os.makedirs(path, exist_ok=True)
+        names = list(self.columns)
+        arrays = {"offsets": self.offsets, "times": self.times, "time_pos": self.time_pos}
+        arrays.update({f"col{i}": self.columns[name] for i, name in enumerate(names)})
+        for name, arr in arrays.items():
+            np.save(os.path.join(path, f"{name}.npy"), np.ascontiguousarray(arr))
+        meta = {"tickers": self.tickers, "tz": self.tz, "index_name": self.index_name, "columns": names}
+        # meta.json は最後に書く（これがあればディレクトリは完成している）
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        return path
+
+    @classmethod
+    def open(cls, path, mmap_mode="r"):
+        """
+        Opens a store written by save(). With mmap_mode="r" the arrays are read-only
+        memory maps, so processes opening the same files share one copy in the OS page cache.
+        """
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+
+        def load(name):
+            return np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode)
+
+        columns = {name: load(f"col{i}") for i, name in enumerate(meta["columns"])}
+        return cls(meta["tickers"], load("offsets"), load("times"), load("time_pos"),
+                   columns, meta["tz"], meta["index_name"])
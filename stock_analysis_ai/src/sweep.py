@@ -0,0 +1,178 @@
+import itertools
+import math
+import os
+import random
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from .indicators import PackedClose, indicator_columns
+from .scorer import score_arrays
+from .backtest import simulate
+
+SETTING_KEYS = ("ma_short", "ma_long", "rsi_window", "macd_fast", "macd_slow", "macd_signal")
+
+# config.yaml に sweep がない場合の探索範囲
+DEFAULT_GRID = {
+    "ma_short": [5, 10, 20, 25, 50],
+    "ma_long": [50, 75, 100, 200],
+    "rsi_window": [7, 14, 21],
+    "macd_fast": [8, 12],
+    "macd_slow": [21, 26],
+    "macd_signal": [9],
+}
+
+
+def build_grid(grid, samples=None, seed=0):
+    """
+    Expands a grid of setting values into a list of settings dicts.
+    Combinations with ma_short >= ma_long or macd_fast >= macd_slow are skipped.
+    With samples, a random subset of that size is returned instead.
+    """
+    combos = [
+        dict(zip(SETTING_KEYS, values))
+        for values in itertools.product(*(grid[k] for k in SETTING_KEYS))
+    ]
+    combos = [c for c in combos if c["ma_short"] < c["ma_long"] and c["macd_fast"] < c["macd_slow"]]
+    if samples is not None and samples < len(combos):
+        combos = random.Random(seed).sample(combos, samples)
+    return combos
+
+
+class _ComponentCache:
+    """
+    同じ部品（同じ窓の SMA、同じ span の EMA など）を複数の組み合わせで使い回すための LRU キャッシュ
+    """
+
+    def __init__(self, max_items):
+        self.max_items = max_items
+        self._items = OrderedDict()
+
+    def get(self, key, compute):
+        if key in self._items:
+            self._items.move_to_end(key)
+            return self._items[key]
+        value = compute()
+        self._items[key] = value
+        if len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+        return value
+
+
+# ワーカープロセスごとの状態（共有メモリ上の配列とキャッシュ）
+_worker = {}
+
+
+def _share(arrays):
+    """配列を共有メモリにコピーする。Returns: (SharedMemory のリスト, ワーカーに渡す情報)"""
+    handles, specs = [], []
+    for arr in arrays:
+        shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+        handles.append(shm)
+        specs.append((shm.name, arr.shape, arr.dtype.str))
+    return handles, specs
+
+
+def _attach(specs):
+    handles, arrays = [], []
+    for name, shape, dtype in specs:
+        shm = shared_memory.SharedMemory(name=name)
+        arr = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        arr.flags.writeable = False
+        handles.append(shm)
+        arrays.append(arr)
+    return handles, arrays
+
+
+def _init_worker(specs, cost, allow_short, max_cached):
+    handles, (packed, order, valid, prices, has_data) = _attach(specs)
+    _worker.update(
+        handles=handles,
+        panel=PackedClose.from_packed(packed, order, valid),
+        prices=prices,
+        has_data=has_data,
+        cost=cost,
+        allow_short=allow_short,
+        cache=_ComponentCache(max_cached),
+    )
+
+
+def _evaluate(settings):
+    panel, cache = _worker["panel"], _worker["cache"]
+    cols = indicator_columns(settings)
+    fast, slow, sig = settings["macd_fast"], settings["macd_slow"], settings["macd_signal"]
+
+    macd_val, signal_line = cache.get(("macd", fast, slow, sig), lambda: PackedClose.macd(
+        cache.get(("ema", fast), lambda: panel.ema(fast)),
+        cache.get(("ema", slow), lambda: panel.ema(slow)),
+        sig,
+    ))
+    values = {
+        cols["sma_short"]: cache.get(("sma", settings["ma_short"]), lambda: panel.sma(settings["ma_short"])),
+        cols["sma_long"]: cache.get(("sma", settings["ma_long"]), lambda: panel.sma(settings["ma_long"])),
+        cols["rsi"]: cache.get(("rsi", settings["rsi_window"]), lambda: panel.rsi(settings["rsi_window"])),
+        cols["macd"]: macd_val,
+        cols["macd_signal"]: signal_line,
+    }
+
+    # スコアは詰めた並びのまま計算し、シグナルだけを元の時刻に戻す
+    _, signal, _ = score_arrays(values, settings)
+    signal = panel.unpack(signal, fill=0)
+    _, portfolio, _ = simulate(_worker["prices"], _worker["has_data"], signal,
+                               _worker["cost"], _worker["allow_short"])
+    return {**settings, **portfolio}
+
+
+def _evaluate_chunk(combos):
+    return [_evaluate(settings) for settings in combos]
+
+
+def run_sweep(close, combos, cost=0.001, allow_short=False, workers=None,
+              metric="Total Return", max_cached=16):
+    """
+    Backtests every settings combination over the watchlist with a process pool.
+    The price panel is placed in shared memory once and attached read-only by each
+    worker; indicator components shared by several combinations are cached per worker.
+    close: wide Close DataFrame (time x tickers)
+    Returns: DataFrame of settings and portfolio metrics, ranked by metric (best first)
+    """
+    close = close.sort_index()
+    values = close.to_numpy(dtype=np.float64)
+    panel = PackedClose(values)
+    arrays = [panel.packed, panel.order, panel.valid,
+              close.ffill().to_numpy(dtype=np.float64), ~np.isnan(values)]
+    del panel
+
+    # 部品を共有する組み合わせが同じチャンクに入るように並べる
+    combos = sorted(combos, key=lambda c: (c["macd_fast"], c["macd_slow"], c["macd_signal"],
+                                           c["rsi_window"], c["ma_long"], c["ma_short"]))
+    workers = workers or os.cpu_count() or 1
+
+    handles, specs = _share(arrays)
+    del arrays
+    try:
+        if workers == 1:
+            _init_worker(specs, cost, allow_short, max_cached)
+            try:
+                results = _evaluate_chunk(combos)
+            finally:
+                for shm in _worker.pop("handles"):
+                    shm.close()
+                _worker.clear()
+        else:
+            chunk_size = max(1, math.ceil(len(combos) / (workers * 4)))
+            chunks = [combos[i:i + chunk_size] for i in range(0, len(combos), chunk_size)]
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(specs, cost, allow_short, max_cached)) as pool:
+                results = [row for rows in pool.map(_evaluate_chunk, chunks) for row in rows]
+    finally:
+        for shm in handles:
+            shm.close()
+            shm.unlink()
+
+    ranking = pd.DataFrame(results, columns=list(SETTING_KEYS) + ["Total Return", "Max Drawdown", "Trades", "Hit Rate"])
+    return ranking.sort_values(metric, ascending=False, kind="stable").reset_index(drop=True)
@@ -0,0 +1,88 @@
+import sys
+import os
+import argparse
+
+# Ensure the project root is in path if running directly (src is imported as a package)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from src.utils import load_config
+from src.providers import LocalProvider, set_default_provider
+from src.fetcher import fetch_stock_data
+from src.sweep import DEFAULT_GRID, SETTING_KEYS, build_grid, run_sweep
+from rich.console import Console
+from rich.table import Table
+from rich import box
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep indicator settings with backtests")
+    parser.add_argument("--tickers", nargs="+", help="Tickers to test (default: config.yaml)")
+    parser.add_argument("--period", default="5y", help="History period (default: 5y)")
+    parser.add_argument("--interval", help="Bar interval (default: config.yaml)")
+    parser.add_argument("--samples", type=int, help="Evaluate a random sample of this many combinations")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument("--metric", default="Total Return",
+                        choices=["Total Return", "Max Drawdown", "Hit Rate"], help="Ranking metric")
+    parser.add_argument("--top", type=int, default=20, help="Rows to show (default: 20)")
+    parser.add_argument("--cost-bps", type=float, default=10.0, help="Trading cost per side in bps (default: 10)")
+    parser.add_argument("--allow-short", action="store_true", help="Go short on SELL instead of going flat")
+    parser.add_argument("--data-dir",
+                        help="Read prices from local files in this directory instead of downloading")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.data_dir:
+        set_default_provider(LocalProvider(args.data_dir))
+    console = Console()
+    console.print("[bold green]Stock Analysis AI - Parameter Sweep[/bold green]")
+
+    # 1. Load Config (config.yaml の sweep で探索範囲を指定できる)
+    try:
+        config = load_config()
+        tickers = args.tickers or config['tickers']
+        settings = config['settings']
+        grid = {**DEFAULT_GRID, **config.get('sweep', {})}
+    except Exception as e:
+        console.print(f"[red]Failed to load config: {e}[/red]")
+        return
+
+    interval = args.interval or settings['interval']
+    combos = build_grid(grid, samples=args.samples)
+    console.print(f"Evaluating {len(combos)} combinations on {len(tickers)} tickers.")
+
+    # 2. Fetch Data
+    console.print(f"Fetching data (Period: {args.period}, Interval: {interval})...")
+    data, _ = fetch_stock_data(tickers, period=args.period, interval=interval)
+    if not data:
+        console.print("[red]No data to backtest.[/red]")
+        return
+    close = pd.concat({ticker: df['Close'] for ticker, df in data.items()}, axis=1, sort=True)
+
+    # 3. Sweep and Show Result
+    ranking = run_sweep(close, combos, cost=args.cost_bps / 10000, allow_short=args.allow_short,
+                        workers=args.workers, metric=args.metric)
+
+    table = Table(title=f"Settings Ranking ({args.metric})", box=box.ROUNDED)
+    for key in SETTING_KEYS:
+        table.add_column(key, justify="right")
+    table.add_column("Total Return", justify="right")
+    table.add_column("Max Drawdown", justify="right")
+    table.add_column("Trades", justify="right")
+    table.add_column("Hit Rate", justify="right")
+
+    for _, row in ranking.head(args.top).iterrows():
+        table.add_row(
+            *(str(int(row[key])) for key in SETTING_KEYS),
+            f"{row['Total Return']:.1%}",
+            f"{row['Max Drawdown']:.1%}",
+            str(int(row['Trades'])),
+            "-" if pd.isna(row['Hit Rate']) else f"{row['Hit Rate']:.0%}",
+        )
+
+    console.print(table)
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,14 @@
 import yaml
 import os
 import sys
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
 
 def load_config(config_path="config.yaml"):
     """
@@ -41,3 +49,40 @@ def save_config(config, config_path="config.yaml"):
     
     with open(target_path, "w", encoding="utf-8") as f:
         yaml.safe_dump(config, f, allow_unicode=True, sort_keys=False)
+
+def get_cache_dir():
+    """
+    キャッシュ保存先のディレクトリを返す関数。
+    プログラムの場所の cache/ を使い、なければ作成する。
+    """
+    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    cache_dir = os.path.join(base_dir, "cache")
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+@contextmanager
+def file_lock(path):
+    """
+    ロックファイルで他のプロセスと排他する
+    （スケジューラー・ダッシュボード・CLI は別のプロセスから同じキャッシュや履歴を書き換える）
+    """
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    # LK_LOCK は10秒待っても取れなければ OSError になるので、取れるまで繰り返す
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
@@ -0,0 +1,82 @@
+import hashlib
+import json
+import os
+import pickle
+import time
+
+from .utils import get_cache_dir
+
+# 前回の結果に残す各銘柄の直近のバー数（起動直後の表示用）
+TAIL_BARS = 120
+
+
+def request_key(tickers, interval, period, settings):
+    """(銘柄, 時間足, 期間, 設定) からキーを作る"""
+    raw = json.dumps([sorted(tickers), interval, period, sorted(settings.items())], default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def _paths(key):
+    base = os.path.join(get_cache_dir(), "warmstart")
+    os.makedirs(base, exist_ok=True)
+    return os.path.join(base, f"{key}.json"), os.path.join(base, f"{key}.tails.pkl")
+
+
+def save_warm_start(rows, tickers, interval, period, settings, tails=None):
+    """
+    Saves the last ranking (and optionally each ticker's last bars with indicators)
+    so the next start can show them before anything is downloaded or imported.
+    rows: ranking rows with Ticker, Name, Close, Score, Signal and ReasonCode
+    tails: dict of ticker -> DataFrame (only the last TAIL_BARS rows are kept)
+    """
+    rows = list(rows)
+    if not rows:
+        return
+    if any("Reasons" not in row for row in rows):
+        from .scorer import render_reasons
+        rows = [{**row, "Reasons": reason}
+                for row, reason in zip(rows, render_reasons([row["ReasonCode"] for row in rows]))]
+    ranking = [{
+        "Ticker": row["Ticker"], "Name": row["Name"], "Close": float(row["Close"]),
+        "Score": int(row["Score"]), "Signal": row["Signal"], "ReasonCode": int(row["ReasonCode"]),
+        "Reasons": row["Reasons"],
+    } for row in rows]
+
+    key = request_key(tickers, interval, period, settings)
+    json_path, tails_path = _paths(key)
+    if tails:
+        tmp_path = f"{tails_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({t: df.iloc[-TAIL_BARS:].copy() for t, df in tails.items()}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, tails_path)
+    # JSON は最後に書く（起動時に読むのはこちらだけ）
+    tmp_path = f"{json_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"saved_at": time.time(), "ranking": ranking, "tails": bool(tails)}, f, ensure_ascii=False)
+    os.replace(tmp_path, json_path)
+
+
+def load_warm_start(tickers, interval, period, settings):
+    """
+    Returns the last saved ranking for the request, or None.
+    Reads one small JSON file and imports nothing heavy, so it can run first thing.
+    Returns: dict with "saved_at" (epoch seconds), "ranking" (list of row dicts, best first)
+    and "tails" (whether load_warm_tails has data)
+    """
+    json_path, _ = _paths(request_key(tickers, interval, period, settings))
+    try:
+        with open(json_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load_warm_tails(tickers, interval, period, settings):
+    """前回の各銘柄の直近のバー（指標付き）。Returns: dict of ticker -> DataFrame"""
+    _, tails_path = _paths(request_key(tickers, interval, period, settings))
+    try:
+        with open(tails_path, "rb") as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return {}
@@ -0,0 +1,86 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# テストはネットワークを使わず、src をパッケージとして読み込む
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import kernels
+
+# 指標の設定（既定値、窓・スパンが 1 の境界、データより長い窓）
+SETTINGS = {
+    "default": dict(ma_short=5, ma_long=25, rsi_window=14, macd_fast=12, macd_slow=26, macd_signal=9),
+    "unit": dict(ma_short=1, ma_long=1, rsi_window=1, macd_fast=1, macd_slow=1, macd_signal=1),
+    "short": dict(ma_short=1, ma_long=2, rsi_window=1, macd_fast=3, macd_slow=3, macd_signal=1),
+    "long": dict(ma_short=3, ma_long=500, rsi_window=2, macd_fast=5, macd_slow=35, macd_signal=5),
+}
+
+
+def baseline_indicators(df, settings):
+    """ベクトル化する前の calculate_indicators（pandas の rolling / ewm）。比較の基準"""
+    df = df.sort_index()
+
+    df[f"SMA_{settings['ma_short']}"] = df['Close'].rolling(window=settings['ma_short']).mean()
+    df[f"SMA_{settings['ma_long']}"] = df['Close'].rolling(window=settings['ma_long']).mean()
+
+    delta = df['Close'].diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=settings['rsi_window']).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=settings['rsi_window']).mean()
+    rs = gain / loss
+    df[f"RSI_{settings['rsi_window']}"] = 100 - (100 / (100 + rs))
+
+    ema_fast = df['Close'].ewm(span=settings['macd_fast'], adjust=False).mean()
+    ema_slow = df['Close'].ewm(span=settings['macd_slow'], adjust=False).mean()
+    macd_val = ema_fast - ema_slow
+    signal_line = macd_val.ewm(span=settings['macd_signal'], adjust=False).mean()
+
+    df[f"MACD_{settings['macd_fast']}_{settings['macd_slow']}_{settings['macd_signal']}"] = macd_val
+    df[f"MACDs_{settings['macd_fast']}_{settings['macd_slow']}_{settings['macd_signal']}"] = signal_line
+    return df
+
+
+def make_frame(rng, n, nan_ratio=0.0, start="2024-01-01", freq="D", tz=None, round_close=False):
+    """乱数の OHLCV。nan_ratio の割合で Close を欠損させる"""
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, n)))
+    if round_close:
+        close = np.round(close)
+    if nan_ratio:
+        close[rng.random(n) < nan_ratio] = np.nan
+    index = pd.date_range(start, periods=n, freq=freq, tz=tz, name="Date")
+    return pd.DataFrame({
+        "Open": close * (1 + rng.normal(0, 0.005, n)),
+        "High": close * 1.01,
+        "Low": close * 0.99,
+        "Close": close,
+        "Volume": rng.integers(1_000, 100_000, n).astype(np.float64),
+    }, index=index)
+
+
+@pytest.fixture(params=list(SETTINGS), ids=list(SETTINGS))
+def settings(request):
+    return dict(SETTINGS[request.param])
+
+
+@pytest.fixture(params=[False, pytest.param(True, marks=pytest.mark.skipif(not kernels.HAVE_NUMBA,
+                                                                           reason="numba is not installed"))],
+                ids=["numpy", "numba"])
+def use_numba(request, monkeypatch):
+    """kernels を NumPy 版と Numba 版の両方で実行する"""
+    monkeypatch.setattr(kernels, "USE_NUMBA", request.param)
+    return request.param
+
+
+@pytest.fixture
+def frames():
+    """長さ・欠損・同値の続き方が違う銘柄のセット"""
+    rng = np.random.default_rng(7)
+    data = {}
+    for k, n in enumerate([1, 2, 3, 15, 40, 120, 300]):
+        data[f"T{k}"] = make_frame(rng, n, nan_ratio=0.1 if k % 2 else 0.0, round_close=k == 5)
+    flat = make_frame(rng, 60)
+    flat["Close"] = 50.0
+    data["FLAT"] = flat
+    return data
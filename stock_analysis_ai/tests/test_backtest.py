@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import make_frame
+from src.backtest import _max_drawdown, run_backtest, simulate
+from src.scorer import SIGNAL_BUY as B, SIGNAL_SELL as S, SIGNAL_WAIT as W
+
+
+def test_simulate_matches_hand_computed_metrics():
+    # A: 最初のバーで買い（コストで初日から損）、下落・反発の後に売り、再び買う
+    # B: 最初のバーはデータなし。買って上げた後に大きく下げ、最後に売る
+    prices = np.array([
+        [100.0, np.nan],
+        [90.0, 50.0],
+        [99.0, 55.0],
+        [99.0, 44.0],
+        [108.9, 44.0],
+    ])
+    has_data = ~np.isnan(prices)
+    signal = np.array([[B, W], [W, B], [S, W], [B, W], [W, S]])
+    per_ticker, portfolio, equity = simulate(prices, has_data, signal, cost=0.01)
+
+    # 各バーの損益（前のバーのポジション × 騰落率 − コスト × 売買量）
+    net_a = np.array([-0.01, -0.1, 0.1 - 0.01, -0.01, 0.1])
+    net_b = np.array([0.0, -0.01, 0.1, -0.2, -0.01])
+    assert per_ticker["Total Return"] == pytest.approx([np.prod(1 + net_a) - 1, np.prod(1 + net_b) - 1])
+    # A は開始時点の 1.0 から 0.99 × 0.9 まで、B は 1.089 から 0.8 × 0.99 倍まで
+    assert per_ticker["Max Drawdown"] == pytest.approx([0.99 * 0.9 - 1, 0.8 * 0.99 - 1])
+    assert list(per_ticker["Trades"]) == [2, 1]
+    # A は1回目（0.99 × 0.9 × 1.09 < 1）が負け、2回目（0.99 × 1.1）が勝ち。B は負け
+    assert per_ticker["Hit Rate"] == pytest.approx([0.5, 0.0])
+    # ポジションを持って迎えたバーの数 / データのあるバーの数
+    assert per_ticker["Exposure"] == pytest.approx([3 / 5, 3 / 4])
+
+    # ポートフォリオはデータのある銘柄に等金額
+    port_ret = np.array([net_a[0]] + [(a + b) / 2 for a, b in zip(net_a[1:], net_b[1:])])
+    assert equity == pytest.approx(np.cumprod(1 + port_ret))
+    assert portfolio["Total Return"] == pytest.approx(np.prod(1 + port_ret) - 1)
+    assert portfolio["Trades"] == 3
+    assert portfolio["Hit Rate"] == pytest.approx(1 / 3)
+    assert portfolio["Max Drawdown"] == pytest.approx(_max_drawdown(np.cumprod(1 + port_ret)))
+
+
+def test_max_drawdown_counts_first_bar_loss():
+    assert _max_drawdown(np.array([0.8, 0.9, 1.2])) == pytest.approx(-0.2)
+    assert _max_drawdown(np.array([[1.1, 0.5], [0.99, 1.0]])) == pytest.approx([-0.1, -0.5])
+
+
+def test_run_backtest_on_unaligned_tickers():
+    rng = np.random.default_rng(6)
+    settings = dict(ma_short=2, ma_long=5, rsi_window=3, macd_fast=3, macd_slow=6, macd_signal=2)
+    a = make_frame(rng, 80)["Close"]
+    b = make_frame(rng, 60, start="2024-01-21")["Close"]
+    close = pd.concat({"A": a, "B": b}, axis=1, sort=True)
+    per_ticker, portfolio, equity = run_backtest(close, settings)
+    assert list(per_ticker.index) == ["A", "B"]
+    assert equity.index.equals(close.index)
+    assert portfolio["Trades"] == per_ticker["Trades"].sum()
+    assert ((per_ticker["Exposure"] >= 0) & (per_ticker["Exposure"] <= 1)).all()
@@ -0,0 +1,96 @@
+import io
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import SETTINGS, make_frame
+from src.batch import output_format, run_batch, write_results
+from src.providers import LocalProvider
+
+
+@pytest.fixture
+def results(tmp_path):
+    provider = LocalProvider(str(tmp_path / "data"))
+    rng = np.random.default_rng(23)
+    provider.write("7203.T", "1d", make_frame(rng, 60, tz="Asia/Tokyo"))
+    provider.write("AAPL", "1d", make_frame(rng, 60, tz="America/New_York"))
+    provider.write("SHORT", "1d", make_frame(rng, 3))
+    with open(tmp_path / "data" / "names.json", "w", encoding="utf-8") as f:
+        json.dump({"7203.T": "トヨタ自動車"}, f, ensure_ascii=False)
+    return run_batch(["7203.T", "AAPL", "SHORT", "MISSING"], "1d", "1y", SETTINGS["default"],
+                     workers=1, provider=provider)
+
+
+@pytest.mark.parametrize("path, fmt, expected", [
+    (None, None, "csv"),
+    ("-", None, "csv"),
+    ("out.csv", None, "csv"),
+    ("out.JSONL", None, "jsonl"),
+    ("out.json", None, "jsonl"),
+    ("dir/out.parquet", None, "parquet"),
+    ("out.txt", "jsonl", "jsonl"),
+])
+def test_output_format(path, fmt, expected):
+    assert output_format(path, fmt) == expected
+
+
+def test_output_format_rejects_unknown_extension():
+    with pytest.raises(ValueError):
+        output_format("out.txt")
+
+
+def test_run_batch_ranks_every_ticker_with_data(results):
+    assert sorted(results["Ticker"]) == ["7203.T", "AAPL", "SHORT"]
+    assert list(results["Score"]) == sorted(results["Score"], reverse=True)
+    assert results.set_index("Ticker").at["7203.T", "Name"] == "トヨタ自動車"
+    assert results.set_index("Ticker").at["AAPL", "Name"] == "AAPL"
+
+
+def test_write_csv(results, tmp_path):
+    path = tmp_path / "out.csv"
+    write_results(results, str(path))
+    back = pd.read_csv(path)
+    assert list(back.columns) == list(results.columns)
+    assert list(back["Ticker"]) == list(results["Ticker"])
+    # 時刻は銘柄のタイムゾーン付きの ISO 形式
+    times = dict(zip(back["Ticker"], back["Time"]))
+    assert times["7203.T"].endswith("+09:00")
+    assert times["SHORT"] == results.set_index("Ticker").at["SHORT", "Time"].isoformat()
+    # 期間が足りない指標は空欄
+    assert back.set_index("Ticker").loc["SHORT"].isna().any()
+
+
+def test_write_jsonl_to_file_and_stdout(results, tmp_path, monkeypatch):
+    path = tmp_path / "out.jsonl"
+    write_results(results, str(path))
+    with open(path, "r", encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    stdout = io.StringIO()
+    monkeypatch.setattr("sys.stdout", stdout)
+    write_results(results, "-", fmt="jsonl")
+    assert stdout.getvalue().splitlines() == lines
+
+    records = [json.loads(line) for line in lines]
+    assert [r["Ticker"] for r in records] == list(results["Ticker"])
+    by_ticker = {r["Ticker"]: r for r in records}
+    assert by_ticker["7203.T"]["Name"] == "トヨタ自動車"
+    assert isinstance(by_ticker["AAPL"]["Score"], int)
+    assert isinstance(by_ticker["AAPL"]["Close"], float)
+    # NaN は null
+    assert None in by_ticker["SHORT"].values()
+
+
+def test_write_parquet(results, tmp_path):
+    with pytest.raises(ValueError):
+        write_results(results, "-", fmt="parquet")
+    pytest.importorskip("pyarrow")
+    path = tmp_path / "out.parquet"
+    write_results(results, str(path))
+    assert list(pd.read_parquet(path)["Ticker"]) == list(results["Ticker"])
+
+
+def test_write_rejects_unknown_format(results, tmp_path):
+    with pytest.raises(ValueError):
+        write_results(results, str(tmp_path / "out.xml"), fmt="xml")
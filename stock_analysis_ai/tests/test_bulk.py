@@ -0,0 +1,135 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from conftest import make_frame
+from src.bulk import bulk_download, is_rate_limited, is_transport_error, iter_bulk_download
+
+
+class _HTTPError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"{status_code} Client Error")
+        self.response = type("Response", (), {"status_code": status_code})()
+
+
+class _ReadTimeout(Exception):
+    pass
+
+
+class _LocalSource:
+    """bulk の download に渡すローカルの代役。呼び出しを記録し、指定した銘柄で失敗する"""
+
+    def __init__(self, tickers, bad=(), failures=0, error=RuntimeError("temporary failure"), delay=0.0):
+        rng = np.random.default_rng(10)
+        self.frames = {t: make_frame(rng, 5) for t in tickers}
+        self.bad = set(bad)
+        self.failures = failures
+        self.error = error
+        self.delay = delay
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, chunk):
+        with self.lock:
+            self.calls.append(list(chunk))
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            fail = self.failures > 0
+            self.failures -= 1
+        try:
+            time.sleep(self.delay)
+            if fail:
+                raise self.error
+            bad = self.bad.intersection(chunk)
+            if bad:
+                raise ValueError(f"unknown symbol(s) {sorted(bad)}")
+            return {t: self.frames[t] for t in chunk}
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+@pytest.mark.parametrize("error, expected", [
+    (_HTTPError(429), True),
+    (_HTTPError(404), False),
+    (RuntimeError("Too Many Requests. Rate limited. Try after a while."), True),
+    (RuntimeError("HTTP Error 429: Too Many Requests"), True),
+    (RuntimeError("4290.T: No data found, symbol may be delisted"), False),
+    (RuntimeError("['429.T']: possibly delisted"), False),
+])
+def test_is_rate_limited(error, expected):
+    assert is_rate_limited(error) is expected
+
+
+@pytest.mark.parametrize("error, expected", [
+    (ConnectionResetError("reset by peer"), True),
+    (_ReadTimeout("read timed out"), True),
+    (RuntimeError("Failed to perform, curl: (28) Operation timed out after 30000 ms"), True),
+    (RuntimeError("Failed to perform, curl: (22) The requested URL returned error: 404"), False),
+    (ValueError("Connection Holdings Inc: no price data"), False),
+    (KeyError("NETWORK.T timeout"), False),
+])
+def test_is_transport_error(error, expected):
+    assert is_transport_error(error) is expected
+
+
+def test_retries_with_backoff_then_succeeds():
+    tickers = [f"T{k}" for k in range(4)]
+    source = _LocalSource(tickers, failures=2)
+    sleeps = []
+    data, failed = bulk_download(tickers, source, chunk_size=10, retries=3, backoff=2.0, sleep=sleeps.append)
+    assert sorted(data) == tickers and failed == {}
+    assert len(source.calls) == 3
+    # 指数バックオフ（2, 4 秒）に ±50% のゆらぎ
+    assert len(sleeps) == 2
+    assert 1.0 <= sleeps[0] <= 3.0 and 2.0 <= sleeps[1] <= 6.0
+
+
+def test_rate_limit_waits_longer_and_fails_whole_chunk():
+    tickers = [f"T{k}" for k in range(4)]
+    source = _LocalSource(tickers, failures=100, error=_HTTPError(429))
+    sleeps = []
+    data, failed = bulk_download(tickers, source, chunk_size=10, retries=2, backoff=1.0,
+                                 max_backoff=5.0, sleep=sleeps.append)
+    assert data == {} and sorted(failed) == tickers
+    # 分割せずにチャンクごと失敗とする
+    assert len(source.calls) == 3
+    assert 2.0 <= sleeps[0] <= 6.0 and sleeps[1] <= 7.5
+
+
+def test_bisection_isolates_bad_ticker():
+    tickers = [f"T{k}" for k in range(8)] + ["4290.T"]
+    source = _LocalSource(tickers, bad=["T5"])
+    sleeps = []
+    data, failed = bulk_download(tickers, source, chunk_size=len(tickers), retries=1, sleep=sleeps.append)
+    assert sorted(data) == sorted(set(tickers) - {"T5"})
+    assert list(failed) == ["T5"] and "unknown symbol" in failed["T5"]
+    for ticker, df in data.items():
+        assert df is source.frames[ticker]
+
+
+def test_transport_error_is_not_bisected():
+    tickers = [f"T{k}" for k in range(8)]
+    source = _LocalSource(tickers, failures=100, error=ConnectionResetError("reset by peer"))
+    data, failed = bulk_download(tickers, source, chunk_size=8, retries=1, sleep=lambda s: None)
+    assert data == {} and sorted(failed) == tickers
+    assert len(source.calls) == 2
+
+
+def test_in_flight_chunks_are_bounded():
+    tickers = [f"T{k}" for k in range(60)]
+    source = _LocalSource(tickers, delay=0.01)
+    received = []
+    for data, failed in iter_bulk_download(tickers, source, chunk_size=3, max_workers=3):
+        # 消費が遅くても、取得済みで未消費のチャンクは max_workers を超えない
+        time.sleep(0.02)
+        assert len(source.calls) - len(received) <= 3
+        received.append(sorted(data))
+        assert failed == {}
+    assert source.max_in_flight <= 3
+    assert sorted(t for chunk in received for t in chunk) == sorted(tickers)
+    assert len(received) == 20
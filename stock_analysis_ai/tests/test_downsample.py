@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import make_frame
+from src.downsample import chart_data, downsample_ohlc, downsample_series, lttb_indices, minmax_indices
+
+
+def _frame(n=10_000):
+    return make_frame(np.random.default_rng(16), n, freq="min", nan_ratio=0.02)
+
+
+@pytest.mark.parametrize("max_points", [1, 7, 1500])
+def test_downsample_ohlc_keeps_endpoints_and_extremes(max_points):
+    df = _frame()
+    out = downsample_ohlc(df, max_points)
+    assert len(out) <= max_points
+    assert out.index[0] == df.index[0]
+    assert out.index.is_monotonic_increasing
+    assert out["Open"].iloc[0] == df["Open"].iloc[0]
+    assert out["Close"].iloc[-1] == df["Close"].iloc[-1]
+    assert out["High"].max() == df["High"].max()
+    assert out["Low"].min() == df["Low"].min()
+    assert out["Volume"].sum() == pytest.approx(df["Volume"].sum())
+
+
+def test_downsample_ohlc_returns_small_frames_unchanged():
+    df = _frame(100)
+    assert downsample_ohlc(df, 100) is df
+
+
+@pytest.mark.parametrize("n_out", [3, 10, 500])
+def test_lttb_keeps_endpoints_and_spike(n_out):
+    y = np.sin(np.linspace(0, 20, 5000))
+    y[2345] = 50.0
+    positions = lttb_indices(y, n_out)
+    assert len(positions) == n_out
+    assert positions[0] == 0 and positions[-1] == len(y) - 1
+    assert (np.diff(positions) > 0).all()
+    assert 2345 in positions
+
+
+@pytest.mark.parametrize("n_out", [2, 11, 500])
+def test_minmax_keeps_every_extreme(n_out):
+    y = np.random.default_rng(17).normal(size=5000).cumsum()
+    positions = minmax_indices(y, n_out)
+    assert len(positions) <= n_out
+    assert (np.diff(positions) > 0).all()
+    assert int(np.argmax(y)) in positions and int(np.argmin(y)) in positions
+
+
+@pytest.mark.parametrize("method", ["lttb", "minmax"])
+def test_downsample_series_drops_warmup_nans(method):
+    series = _frame()["Close"].rolling(50).mean()
+    out = downsample_series(series, 300, method=method)
+    assert len(out) <= 300 and not out.isna().any()
+    assert out.index.isin(series.index).all()
+    if method == "minmax":
+        assert out.max() == series.max() and out.min() == series.min()
+    else:
+        valid = series.dropna()
+        assert out.index[0] == valid.index[0] and out.index[-1] == valid.index[-1]
+
+
+def test_chart_data_downsamples_only_the_visible_range():
+    df = _frame()
+    df["SMA_5"] = df["Close"].rolling(5).mean()
+    start, end = df.index[1000], df.index[2999]
+    ohlc, lines = chart_data(df, ["SMA_5", "Missing"], start, end, max_points=400)
+    assert len(ohlc) <= 400 and ohlc.index[0] == start
+    assert ohlc["Close"].iloc[-1] == df.loc[end, "Close"]
+    assert list(lines) == ["SMA_5"]
+    assert lines["SMA_5"].index[0] >= start and lines["SMA_5"].index[-1] == end
+
+    # 上限より少ない範囲はそのまま返す
+    ohlc, lines = chart_data(df, ["SMA_5"], start, df.index[1099], max_points=400)
+    pd.testing.assert_frame_equal(ohlc, df.loc[start:df.index[1099]])
@@ -0,0 +1,137 @@
+import asyncio
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from conftest import make_frame
+from src import fetcher
+from src.cache import OHLCVCache
+from src.fetcher import _fetch_with_cache, afetch_stock_data
+from src.providers import DataProvider
+
+
+class _StubProvider(DataProvider):
+    """手元の DataFrame を返すローカルの代役。呼び出し (銘柄, period, start) を記録する"""
+
+    name = "stub"
+    cacheable = True
+
+    def __init__(self, frames):
+        self.frames = frames
+        self.calls = []
+
+    def download(self, tickers, period=None, start=None, interval="1d"):
+        self.calls.append((sorted(tickers), period, start))
+        data = {}
+        for ticker in tickers:
+            df = self.frames[ticker]
+            if start is not None:
+                df = df[df.index >= pd.Timestamp(start)]
+            data[ticker] = df.copy()
+        return data
+
+
+def _frames(days=60):
+    rng = np.random.default_rng(1)
+    start = (pd.Timestamp.now().normalize() - pd.Timedelta(days=days - 1)).strftime("%Y-%m-%d")
+    return {t: make_frame(rng, days, start=start) for t in ("A", "B")}
+
+
+def _assert_cached(data, frames, period="1mo"):
+    start = (pd.Timestamp.now() - pd.Timedelta(days=31)).normalize()
+    for ticker, df in data.items():
+        expected = frames[ticker][frames[ticker].index >= start]
+        pd.testing.assert_frame_equal(df, expected, check_freq=False, check_names=False, check_index_type=False)
+
+
+def test_second_call_fetches_only_the_delta(tmp_path):
+    frames = _frames()
+    provider = _StubProvider(frames)
+    cache = OHLCVCache(str(tmp_path / "ohlcv.sqlite"))
+
+    data = _fetch_with_cache(["A", "B"], "1mo", "1d", cache, provider)
+    assert provider.calls == [(["A", "B"], "1mo", None)]
+    _assert_cached(data, frames)
+
+    # 最終バーの更新と新しいバーが1本
+    for ticker, df in frames.items():
+        df.iloc[-1, df.columns.get_loc("Close")] += 1.0
+        bar = df.iloc[[-1]].copy()
+        bar.index = bar.index + pd.Timedelta(days=1)
+        frames[ticker] = pd.concat([df, bar])
+    provider.calls.clear()
+    data = _fetch_with_cache(["A", "B"], "1mo", "1d", cache, provider)
+
+    # 確定済みの最終バーの1本前から取り直す（period 全体は取らない）
+    since = frames["A"].index[-3].date()
+    assert provider.calls == [(["A", "B"], None, since)]
+    _assert_cached(data, frames)
+
+
+def test_changed_anchor_close_refetches_full_period(tmp_path):
+    frames = _frames()
+    provider = _StubProvider(frames)
+    cache = OHLCVCache(str(tmp_path / "ohlcv.sqlite"))
+    _fetch_with_cache(["A", "B"], "1mo", "1d", cache, provider)
+
+    # 配当で B の過去の価格が調整し直された
+    frames["B"] = frames["B"].copy()
+    frames["B"][["Open", "High", "Low", "Close"]] *= 0.98
+    provider.calls.clear()
+    data = _fetch_with_cache(["A", "B"], "1mo", "1d", cache, provider)
+
+    assert provider.calls == [(["A", "B"], None, frames["A"].index[-2].date()), (["B"], "1mo", None)]
+    _assert_cached(data, frames)
+    # 置き換えた銘柄は period 全体を取得済みとして記録される
+    assert cache.covers("B", "1d", pd.Timestamp.now(tz="UTC") - pd.Timedelta(days=31))
+
+
+def test_evict_drops_bars_outside_the_provider_window(tmp_path):
+    cache = OHLCVCache(str(tmp_path / "ohlcv.sqlite"))
+    now = pd.Timestamp("2024-06-01", tz="UTC")
+    df = make_frame(np.random.default_rng(2), 90, start="2024-03-04", tz="UTC")
+    cache.store("A", "5m", df, covered_from=df.index[0])
+    cache.store("A", "1d", df, covered_from=df.index[0])
+
+    # 5分足の取得可能期間は60日
+    cutoff = now - pd.Timedelta(days=60)
+    assert cache.evict("5m", now) == int((df.index < cutoff).sum())
+    assert cache.load("A", "5m").index[0] >= cutoff
+    assert not cache.covers("A", "5m", df.index[0])
+    assert cache.covers("A", "5m", cutoff)
+    # 日足は削除しない
+    assert cache.evict("1d", now) == 0
+    assert len(cache.load("A", "1d")) == 90
+
+
+class _SlowProvider(DataProvider):
+    """SLOW を含むチャンクだけ release が呼ばれるまで返さない代役"""
+
+    name = "slow"
+    timeout = 0.05
+
+    def __init__(self, frames):
+        self.frames = frames
+        self.release = threading.Event()
+
+    def download(self, tickers, period=None, start=None, interval="1d"):
+        if "SLOW" in tickers:
+            self.release.wait(10)
+        return {t: self.frames[t] for t in tickers if t in self.frames}
+
+
+def test_afetch_stock_data_gives_up_on_slow_chunks(monkeypatch):
+    monkeypatch.setattr(fetcher, "DOWNLOAD_CHUNK_SIZE", 1)
+    frames = {t: make_frame(np.random.default_rng(3), 10) for t in ("A", "SLOW", "B")}
+    provider = _SlowProvider(frames)
+    started = time.perf_counter()
+    try:
+        data, names = asyncio.run(afetch_stock_data(["A", "SLOW", "B"], provider=provider, names_timeout=0))
+    finally:
+        provider.release.set()
+    # 待つのは 1リクエストのタイムアウト × FETCH_TIMEOUT_FACTOR まで
+    assert time.perf_counter() - started < 5
+    assert list(data) == ["A", "B"]
+    assert names == {"A": "A", "SLOW": "SLOW", "B": "B"}
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+from src.history import ALERT_FLIP, ALERT_NEW_BUY, ALERT_SCORE_JUMP, ResultHistory, diff_snapshots
+
+SETTINGS = dict(ma_short=5, ma_long=25, rsi_window=14, macd_fast=12, macd_slow=26, macd_signal=9)
+
+
+def _row(ticker, score, signal, close=100.0):
+    return {"Ticker": ticker, "Close": close, "Score": score, "Signal": signal, "ReasonCode": 0}
+
+
+def test_diff_snapshots():
+    previous = {"A": {"Score": 50, "Signal": "WAIT"}, "B": {"Score": 80, "Signal": "BUY"},
+                "C": {"Score": 50, "Signal": "WAIT"}, "D": {"Score": 60, "Signal": "WAIT"}}
+    current = {"A": {"Score": 70, "Signal": "BUY"}, "B": {"Score": 30, "Signal": "SELL"},
+               "C": {"Score": 60, "Signal": "WAIT"}, "D": {"Score": 60, "Signal": "WAIT"},
+               "NEW": {"Score": 80, "Signal": "BUY"}, "NEW2": {"Score": 50, "Signal": "WAIT"}}
+    alerts = {(a["Ticker"], a["Kind"]) for a in diff_snapshots(previous, current)}
+    assert alerts == {("A", ALERT_NEW_BUY), ("A", ALERT_SCORE_JUMP), ("B", ALERT_FLIP),
+                      ("B", ALERT_SCORE_JUMP), ("NEW", ALERT_NEW_BUY)}
+
+
+def test_diff_snapshots_score_jump_threshold():
+    previous = {"A": {"Score": 50, "Signal": "WAIT"}}
+    assert diff_snapshots(previous, {"A": {"Score": 60, "Signal": "WAIT"}}, score_jump=10)
+    assert not diff_snapshots(previous, {"A": {"Score": 59, "Signal": "WAIT"}}, score_jump=10)
+
+
+def test_append_records_alerts_and_rows(tmp_path):
+    history = ResultHistory("1d", "1y", ["A", "B"], SETTINGS, root=str(tmp_path))
+    assert history.append([_row("A", 50, "WAIT"), _row("B", 50, "WAIT")], scanned_at=1_000) == []
+    alerts = history.append([_row("A", 80, "BUY"), _row("B", 50, "WAIT")], scanned_at=2_000)
+    assert {(a["Ticker"], a["Kind"]) for a in alerts} == {("A", ALERT_NEW_BUY), ("A", ALERT_SCORE_JUMP)}
+
+    rows = history.query()
+    assert len(history) == len(rows) == 4
+    assert list(rows["Score"]) == [50, 50, 80, 50]
+    assert list(history.query(tickers=["B"])["Ticker"]) == ["B", "B"]
+    assert history.latest()["A"]["Signal"] == "BUY"
+
+
+def test_alerts_are_filtered_before_the_limit(tmp_path):
+    history = ResultHistory("1d", "1y", ["A", "B"], SETTINGS, root=str(tmp_path))
+    history.append([_row("A", 50, "WAIT"), _row("B", 50, "WAIT")])
+    history.append([_row("A", 80, "BUY")])
+    for score in (10, 50, 10, 50):
+        history.append([_row("B", score, "WAIT")])
+    alerts = history.alerts(limit=2, tickers=["A"])
+    assert list(alerts["Ticker"]) == ["A", "A"]
+    assert list(history.alerts(limit=3)["Ticker"]) == ["B", "B", "B"]
+
+
+def test_history_is_kept_per_watchlist_and_period(tmp_path):
+    a = ResultHistory("1d", "1y", ["A", "B"], SETTINGS, root=str(tmp_path))
+    assert ResultHistory("1d", "1y", ["B", "A"], SETTINGS, root=str(tmp_path)).path == a.path
+    assert ResultHistory("1d", "6mo", ["A", "B"], SETTINGS, root=str(tmp_path)).path != a.path
+    assert ResultHistory("1d", "1y", ["A"], SETTINGS, root=str(tmp_path)).path != a.path
@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import baseline_indicators, make_frame
+from src import kernels
+from src.indicators import (IndicatorState, IndicatorStateStore, PackedClose, calculate_indicators,
+                            calculate_indicators_batch, calculate_indicators_panel, indicator_columns,
+                            packed_indicators)
+
+
+def assert_same(actual, expected):
+    """NaN の位置も含めて値が完全に一致すること"""
+    np.testing.assert_array_equal(np.asarray(actual, dtype=np.float64), np.asarray(expected, dtype=np.float64))
+
+
+def test_calculate_indicators_matches_baseline(frames, settings, use_numba):
+    for df in frames.values():
+        expected = baseline_indicators(df.copy(), settings)
+        actual = calculate_indicators(df.copy(), settings)
+        assert list(actual.columns) == list(expected.columns)
+        for col in expected.columns:
+            assert_same(actual[col], expected[col])
+
+
+def test_calculate_indicators_sorts_unsorted_input(settings, use_numba):
+    df = make_frame(np.random.default_rng(1), 50)
+    shuffled = df.sample(frac=1.0, random_state=3)
+    expected = baseline_indicators(df.copy(), settings)
+    actual = calculate_indicators(shuffled, settings)
+    assert actual.index.equals(expected.index)
+    for col in indicator_columns(settings).values():
+        assert_same(actual[col], expected[col])
+
+
+def test_kernels_on_2d_panel_match_pandas(settings, use_numba):
+    rng = np.random.default_rng(11)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (200, 6)), axis=0))
+    close[rng.random(close.shape) < 0.05] = np.nan
+    close[:, 5] = np.nan
+    frame = pd.DataFrame(close)
+
+    sma_short, sma_long, rsi, macd, macd_signal = kernels.indicators(close, settings)
+    assert_same(sma_short, frame.rolling(settings['ma_short']).mean())
+    assert_same(sma_long, frame.rolling(settings['ma_long']).mean())
+    assert_same(kernels.ewm_mean(close, settings['macd_fast']),
+                frame.ewm(span=settings['macd_fast'], adjust=False).mean())
+    expected_macd = (frame.ewm(span=settings['macd_fast'], adjust=False).mean()
+                     - frame.ewm(span=settings['macd_slow'], adjust=False).mean())
+    assert_same(macd, expected_macd)
+    assert_same(macd_signal, expected_macd.ewm(span=settings['macd_signal'], adjust=False).mean())
+    for j in range(close.shape[1]):
+        expected = baseline_indicators(pd.DataFrame({"Close": close[:, j]}), settings)
+        assert_same(rsi[:, j], expected[f"RSI_{settings['rsi_window']}"])
+
+
+def test_panel_matches_per_ticker_after_dropna(frames, settings, use_numba):
+    close = pd.concat({t: df['Close'] for t, df in frames.items()}, axis=1)
+    panel = calculate_indicators_panel(close, settings)
+    for ticker, df in frames.items():
+        expected = baseline_indicators(df.dropna(subset=['Close']).copy(), settings)
+        for col in indicator_columns(settings).values():
+            actual = panel[col][ticker].dropna()
+            assert_same(actual, expected[col].dropna())
+            assert actual.index.equals(expected[col].dropna().index)
+
+
+# 時刻の揃わない銘柄の結合で pandas の警告が出ないこと
+@pytest.mark.filterwarnings("error")
+def test_batch_matches_calculate_indicators(settings, use_numba):
+    rng = np.random.default_rng(3)
+    data = {f"T{k}": make_frame(rng, n, start=f"2024-0{3 - k}-01") for k, n in enumerate([5, 80, 250])}
+    result = calculate_indicators_batch(data, settings)
+    for ticker, df in data.items():
+        expected = baseline_indicators(df.copy(), settings)
+        for col in expected.columns:
+            assert_same(result[ticker][col], expected[col])
+
+
+def test_packed_close_parts_match_fused_kernel(settings, use_numba):
+    rng = np.random.default_rng(5)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (120, 4)), axis=0))
+    close[rng.random(close.shape) < 0.1] = np.nan
+    panel = PackedClose(close)
+    fused = packed_indicators(panel, settings)
+    cols = indicator_columns(settings)
+    assert_same(panel.sma(settings['ma_short']), fused[cols["sma_short"]])
+    assert_same(panel.sma(settings['ma_long']), fused[cols["sma_long"]])
+    assert_same(panel.rsi(settings['rsi_window']), fused[cols["rsi"]])
+    macd, signal = PackedClose.macd(panel.ema(settings['macd_fast']), panel.ema(settings['macd_slow']),
+                                    settings['macd_signal'])
+    assert_same(macd, fused[cols["macd"]])
+    assert_same(signal, fused[cols["macd_signal"]])
+
+
+def test_indicator_state_streams_the_full_history_values(settings):
+    df = make_frame(np.random.default_rng(9), 150)
+    expected = baseline_indicators(df.copy(), settings).iloc[-1]
+    state = IndicatorState.from_history(df.iloc[:100], settings)
+    # 未確定の最終バーを書き換えてから、残りのバーを流す
+    state.update(df.index[99], df['Close'].iloc[99] * 1.05)
+    values = state.update_frame(df)
+    for col, value in values.items():
+        assert_same(value, expected[col])
+
+
+def test_indicator_state_store_rebuilds_on_readjusted_history(settings):
+    df = make_frame(np.random.default_rng(2), 120)
+    store = IndicatorStateStore()
+    store.update("X", df.iloc[:100], settings)
+    # 期間の窓がずれても状態は使い回す
+    values = store.update("X", df.iloc[10:], settings)
+    expected = baseline_indicators(df.copy(), settings).iloc[-1]
+    for col, value in values.items():
+        assert_same(value, expected[col])
+
+    adjusted = df.copy()
+    adjusted[["Open", "High", "Low", "Close"]] *= 0.9
+    values = store.update("X", adjusted, settings)
+    expected = baseline_indicators(adjusted.copy(), settings).iloc[-1]
+    for col, value in values.items():
+        assert_same(value, expected[col])
@@ -0,0 +1,119 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src import fetcher
+from src.cache import NameCache
+from src.providers import DataProvider
+
+
+class _StubProvider(DataProvider):
+    """会社名だけを返すローカルの代役。gate が開くまで問い合わせを止められる"""
+
+    cacheable = True
+
+    def __init__(self, names, name="stub"):
+        self.name = name
+        self.names = names
+        self.calls = []
+        self.lock = threading.Lock()
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def download(self, tickers, period=None, start=None, interval="1d"):
+        return {}
+
+    def company_name(self, ticker):
+        with self.lock:
+            self.calls.append(ticker)
+        self.gate.wait(5)
+        return self.names.get(ticker)
+
+
+@pytest.fixture
+def name_cache(tmp_path, monkeypatch):
+    cache = NameCache(str(tmp_path / "names.json"))
+    monkeypatch.setattr(fetcher, "_name_cache", cache)
+    return cache
+
+
+def test_name_cache_ttl_and_providers(tmp_path):
+    path = str(tmp_path / "names.json")
+    cache = NameCache(path, ttl=100)
+    cache.set_many("yfinance", {"7203.T": "Toyota"}, now=1000)
+    cache.set_many("local", {"7203.T": "7203 local"}, now=1000)
+    assert cache.get("yfinance", "7203.T", now=1100) == "Toyota"
+    assert cache.get("local", "7203.T", now=1100) == "7203 local"
+    assert cache.get("yfinance", "7203.T", now=1101) is None
+    assert cache.get("other", "7203.T", now=1000) is None
+
+
+def test_name_cache_merges_writes_from_other_instances(tmp_path):
+    path = str(tmp_path / "names.json")
+    # 古い形式（プロバイダー名のないキー）のエントリは使わない
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"AAPL": {"name": "old", "fetched": 0}}, f)
+    first, second = NameCache(path), NameCache(path)
+    assert first.get("yfinance", "AAPL", now=0) is None
+    first.set_many("yfinance", {"AAPL": "Apple"}, now=0)
+    second.set_many("yfinance", {"NVDA": "NVIDIA"}, now=0)
+    reopened = NameCache(path)
+    assert reopened.get("yfinance", "AAPL", now=0) == "Apple"
+    assert reopened.get("yfinance", "NVDA", now=0) == "NVIDIA"
+    assert not [p for p in tmp_path.iterdir() if p.name.endswith(".tmp")]
+
+
+def test_fallback_names_are_not_cached(name_cache):
+    provider = _StubProvider({"AAPL": "Apple"})
+    names = fetcher.fetch_company_names(["AAPL", "MISSING"], timeout=5, provider=provider)
+    assert names == {"AAPL": "Apple", "MISSING": "MISSING"}
+    assert name_cache.get("stub", "AAPL") == "Apple"
+    assert name_cache.get("stub", "MISSING") is None
+
+    # キャッシュにある名前は問い合わせない
+    fetcher.fetch_company_names(["AAPL", "MISSING"], timeout=5, provider=provider)
+    assert sorted(provider.calls) == ["AAPL", "MISSING", "MISSING"]
+
+
+def test_in_flight_lookups_are_shared(name_cache):
+    provider = _StubProvider({"AAPL": "Apple", "NVDA": "NVIDIA"})
+    provider.gate.clear()
+    first, first_futures = fetcher._start_name_lookup(["AAPL", "NVDA"], provider)
+    second, second_futures = fetcher._start_name_lookup(["AAPL"], provider)
+    assert second_futures["AAPL"] is first_futures["AAPL"]
+    # 別のプロバイダーの同じ銘柄は別に問い合わせる
+    other = _StubProvider({"AAPL": "Apple (other)"}, name="other")
+    other_names, other_futures = fetcher._start_name_lookup(["AAPL"], other)
+    assert other_futures["AAPL"] is not first_futures["AAPL"]
+
+    provider.gate.set()
+    assert fetcher._collect_names(first, first_futures, provider, timeout=5) == {"AAPL": "Apple", "NVDA": "NVIDIA"}
+    assert fetcher._collect_names(other_names, other_futures, other, timeout=5) == {"AAPL": "Apple (other)"}
+    assert sorted(provider.calls) == ["AAPL", "NVDA"]
+    assert name_cache.get("stub", "AAPL") == "Apple"
+    assert name_cache.get("other", "AAPL") == "Apple (other)"
+
+
+def test_late_names_are_written_in_one_batch(name_cache, monkeypatch):
+    # 1スレッドにすると、保存は残りの問い合わせの後ろに並ぶ
+    executor = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(fetcher, "_name_executor", executor)
+    writes = []
+    set_many = name_cache.set_many
+    monkeypatch.setattr(name_cache, "set_many",
+                        lambda provider, names, now=None: (writes.append(dict(names)), set_many(provider, names, now)))
+    tickers = [f"T{k}" for k in range(6)]
+    provider = _StubProvider({t: f"Name {t}" for t in tickers})
+    provider.gate.clear()
+    names = fetcher.fetch_company_names(tickers, timeout=0, provider=provider)
+    assert names == {t: t for t in tickers}
+    futures = [fetcher._pending_names[("stub", t)] for t in tickers]
+    provider.gate.set()
+    for future in futures:
+        future.result(timeout=5)
+    executor.shutdown(wait=True)
+    late = [w for w in writes if w]
+    assert len(late) == 1 and sorted(late[0]) == tickers
+    assert all(name_cache.get("stub", t) == f"Name {t}" for t in tickers)
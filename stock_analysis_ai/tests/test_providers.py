@@ -0,0 +1,64 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import make_frame
+from src.providers import LocalProvider
+
+
+def _assert_same_bars(actual, expected):
+    assert str(actual.index.tz) == str(expected.index.tz)
+    assert actual.index.as_unit("ns").equals(expected.index.as_unit("ns"))
+    np.testing.assert_array_equal(actual[list(expected.columns)].to_numpy(), expected.to_numpy())
+
+
+@pytest.mark.parametrize("fmt", ["npy", "csv"])
+@pytest.mark.parametrize("tz", [None, "Asia/Tokyo", "America/New_York"])
+def test_local_provider_round_trip(tmp_path, fmt, tz):
+    provider = LocalProvider(str(tmp_path))
+    # 夏時間をまたぐ期間（America/New_York は UTC オフセットが途中で変わる）
+    df = make_frame(np.random.default_rng(11), 300, start="2023-01-02", freq="B", tz=tz, nan_ratio=0.05)
+    path = provider.write("7203.T", "1d", df, fmt=fmt)
+    assert path.endswith(f".{fmt}")
+    assert os.path.exists(tmp_path / "1d" / "7203.T.meta.json") == (tz is not None)
+
+    data = provider.download(["7203.T", "MISSING"], interval="1d")
+    assert list(data) == ["7203.T"]
+    _assert_same_bars(data["7203.T"], df.dropna(subset=["Close"]))
+    assert provider.tickers("1d") == ["7203.T"]
+
+    # tz なしで書き直すとメタデータは消える
+    provider.write("7203.T", "1d", df.tz_localize(None) if tz else df, fmt=fmt)
+    assert not os.path.exists(tmp_path / "1d" / "7203.T.meta.json")
+
+
+@pytest.mark.parametrize("fmt", ["npy", "csv"])
+def test_period_is_measured_back_from_the_last_bar(tmp_path, fmt):
+    provider = LocalProvider(str(tmp_path))
+    df = make_frame(np.random.default_rng(12), 400, start="2020-01-01", tz="Asia/Tokyo")
+    provider.write("A", "1d", df, fmt=fmt)
+
+    # 最終バーは 2021-02-03。現在の日付によらず、そこから 1mo (31日) 遡る
+    got = provider.download(["A"], period="1mo", interval="1d")["A"]
+    start = (df.index[-1].tz_convert("UTC") - pd.Timedelta(days=31)).normalize()
+    _assert_same_bars(got, df[df.index >= start])
+    assert got.index[-1] == df.index[-1]
+
+
+@pytest.mark.parametrize("tz", [None, "Asia/Tokyo"])
+def test_start_naive_and_aware(tmp_path, tz):
+    provider = LocalProvider(str(tmp_path))
+    df = make_frame(np.random.default_rng(13), 24, start="2024-03-01", freq="h", tz=tz)
+    provider.write("A", "1h", df, fmt="npy")
+
+    # tz なしの start は UTC とみなし、tz 付きの start は UTC に直して比べる
+    naive = pd.Timestamp("2024-03-01 10:00")
+    aware = pd.Timestamp("2024-03-01 19:00", tz="Asia/Tokyo")
+    expected_utc = pd.Timestamp("2024-03-01 10:00", tz="UTC")
+    index_utc = df.index.tz_localize("UTC") if tz is None else df.index.tz_convert("UTC")
+    expected = df[index_utc >= expected_utc]
+    for start in (naive, aware):
+        got = provider.download(["A"], start=start, interval="1h")["A"]
+        _assert_same_bars(got, expected)
@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.resample import base_interval, can_resample, market_of, resample_frames, resample_ohlcv
+
+
+def _bars(index):
+    n = len(index)
+    values = np.arange(1, n + 1, dtype=np.float64)
+    return pd.DataFrame({"Open": values, "High": values + 0.5, "Low": values - 0.5,
+                         "Close": values + 0.25, "Volume": np.ones(n)}, index=index)
+
+
+def _tse_15m(day):
+    # 東証の 15 分足（前場 9:00-11:15、後場 12:30-15:15 の開始時刻）
+    morning = pd.date_range(f"{day} 09:00", f"{day} 11:15", freq="15min", tz="Asia/Tokyo")
+    afternoon = pd.date_range(f"{day} 12:30", f"{day} 15:15", freq="15min", tz="Asia/Tokyo")
+    return morning.append(afternoon)
+
+
+def _expected(df, labels):
+    grouped = df.groupby(labels, sort=True)
+    out = pd.DataFrame({"Open": grouped["Open"].first(), "High": grouped["High"].max(),
+                        "Low": grouped["Low"].min(), "Close": grouped["Close"].last(),
+                        "Volume": grouped["Volume"].sum()})
+    out.index = pd.DatetimeIndex(out.index, name=df.index.name).as_unit("ns")
+    return out
+
+
+def test_market_of():
+    assert market_of("7203.T") == "TSE"
+    assert market_of("AAPL") == "US"
+    assert market_of("^N225") is None
+    assert market_of("JPY=X") is None
+
+
+def test_tse_hourly_bars_start_at_each_session_open():
+    df = _bars(_tse_15m("2024-03-04").append(_tse_15m("2024-03-05")))
+    result = resample_ohlcv(df, "1h", "TSE")
+    hours = sorted({t.strftime("%H:%M") for t in result.index})
+    assert hours == ["09:00", "10:00", "11:00", "12:30", "13:30", "14:30"]
+
+    local = df.index
+    session_open = np.where(local.hour * 60 + local.minute >= 12 * 60 + 30, 12 * 60 + 30, 9 * 60)
+    minutes = local.hour * 60 + local.minute
+    start = session_open + (minutes - session_open) // 60 * 60
+    labels = local.normalize() + pd.to_timedelta(start, unit="min")
+    pd.testing.assert_frame_equal(result, _expected(df, labels), check_freq=False)
+
+
+def test_daily_bars_follow_the_exchange_calendar():
+    # 米国の 15 分足を UTC で持っていても、日足はニューヨークの日付で区切る
+    index = pd.date_range("2024-03-04 14:30", periods=26 * 2, freq="15min", tz="UTC")
+    df = _bars(index)
+    result = resample_ohlcv(df, "1d", "US")
+    labels = index.tz_convert("America/New_York").normalize()
+    pd.testing.assert_frame_equal(result, _expected(df, labels), check_freq=False)
+    assert str(result.index.tz) == "America/New_York"
+
+
+def test_naive_intraday_bars_stay_naive_utc():
+    index = pd.date_range("2024-03-04 14:30", periods=8, freq="15min")
+    result = resample_ohlcv(_bars(index), "1h", "US")
+    assert result.index.tz is None
+    assert result.index[0] == pd.Timestamp("2024-03-04 14:30")
+
+
+def test_weekly_bars_start_on_monday():
+    index = pd.bdate_range("2024-03-06", periods=10, name="Date")
+    df = _bars(index)
+    result = resample_ohlcv(df, "1wk", "US")
+    labels = index - pd.to_timedelta(index.dayofweek, unit="D")
+    pd.testing.assert_frame_equal(result, _expected(df, labels), check_freq=False)
+
+
+def test_unknown_market_uses_utc_days():
+    index = pd.date_range("2024-03-04", periods=96 * 2, freq="15min", tz="UTC")
+    result = resample_ohlcv(_bars(index), "1d", None)
+    assert list(result.index) == list(pd.date_range("2024-03-04", periods=2, freq="D", tz="UTC"))
+
+
+def test_missing_close_and_empty_input():
+    index = pd.date_range("2024-03-04 14:30", periods=4, freq="15min", tz="UTC")
+    df = _bars(index)
+    df.loc[index[-1], "Close"] = np.nan
+    assert resample_ohlcv(df, "1h", "US")["Close"].iloc[0] == df["Close"].iloc[2]
+    assert resample_ohlcv(df.iloc[:0], "1h", "US").empty
+    with pytest.raises(ValueError):
+        resample_ohlcv(df, "7m", "US")
+
+
+def test_base_interval_and_resample_frames():
+    assert base_interval(["1d", "15m", "1h"]) == "15m"
+    assert can_resample("15m", "1h") and not can_resample("1h", "15m")
+    with pytest.raises(ValueError):
+        base_interval(["1d", "90m", "1h"])
+    data = {"7203.T": _bars(_tse_15m("2024-03-04"))}
+    assert resample_frames(data, "15m", "15m") is data
+    assert len(resample_frames(data, "1d", "15m")["7203.T"]) == 1
@@ -0,0 +1,62 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import SETTINGS, make_frame
+from src import scheduler
+from src.scheduler import is_market_open, load_snapshot, save_snapshot
+
+
+def _ts(text, tz):
+    return pd.Timestamp(text, tz=tz).timestamp()
+
+
+@pytest.mark.parametrize("market, local_time, grace, expected", [
+    ("TSE", "2024-07-01 08:59", 0, False),
+    ("TSE", "2024-07-01 09:00", 0, True),
+    ("TSE", "2024-07-01 11:45", 0, False),   # 昼休み
+    ("TSE", "2024-07-01 12:30", 0, True),
+    ("TSE", "2024-07-01 15:31", 0, False),
+    ("TSE", "2024-07-01 15:31", 120, True),  # 引けの後の猶予
+    ("TSE", "2024-07-06 10:00", 0, False),   # 土曜日
+    ("US", "2024-01-02 09:30", 0, True),     # 冬時間（UTC 14:30）
+    ("US", "2024-07-01 09:30", 0, True),     # 夏時間（UTC 13:30）
+    ("US", "2024-07-01 16:01", 0, False),
+    ("US", "2024-07-07 12:00", 0, False),    # 日曜日
+])
+def test_is_market_open(market, local_time, grace, expected):
+    tz = {"TSE": "Asia/Tokyo", "US": "America/New_York"}[market]
+    assert is_market_open(market, _ts(local_time, tz), grace=grace) is expected
+
+
+def test_is_market_open_follows_daylight_saving():
+    # 米国市場の寄り付きは夏時間で UTC 13:30、冬時間で UTC 14:30
+    assert is_market_open("US", _ts("2024-07-01 13:45", "UTC"))
+    assert not is_market_open("US", _ts("2024-01-02 13:45", "UTC"))
+    # 取引時間の分からない市場は常に開いているとみなす
+    assert is_market_open(None, _ts("2024-07-06 03:00", "UTC"))
+
+
+def test_save_snapshot_keeps_two_store_versions(tmp_path, monkeypatch):
+    monkeypatch.setattr(scheduler, "get_cache_dir", lambda: str(tmp_path))
+    monkeypatch.setattr(scheduler, "_loaded", {})
+    rng = np.random.default_rng(9)
+    tickers, settings = ["A", "B"], SETTINGS["default"]
+    newest = []
+    for version in range(4):
+        data = {t: make_frame(rng, 30 + version) for t in tickers}
+        key = save_snapshot({"data": data, "version": version}, tickers, "1d", "1y", settings)
+        prefix = f"{key}.store."
+        stores = [name for name in os.listdir(tmp_path / "snapshots") if name.startswith(prefix)]
+        newest.append(max(stores, key=lambda name: int(name[len(prefix):])))
+        # 更新時刻が同じでも読み直されるよう、プロセス内の保持を捨てる
+        scheduler._loaded.clear()
+        loaded = load_snapshot(tickers, "1d", "1y", settings)
+        assert loaded["version"] == version
+        assert len(loaded["data"].frame("A")) == 30 + version
+
+    # 残るのは最新と直前の版だけ
+    stores = [name for name in os.listdir(tmp_path / "snapshots") if name.startswith(prefix)]
+    assert sorted(stores) == sorted(newest[-2:])
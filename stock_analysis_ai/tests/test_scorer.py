@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+from conftest import baseline_indicators, make_frame
+from src.scorer import SIGNAL_NAMES, evaluate_stock, latest_values, render_reasons, score_batch
+
+
+def test_score_batch_and_render_reasons_match_evaluate_stock(frames, settings):
+    data = {t: baseline_indicators(df.copy(), settings) for t, df in frames.items()}
+    scores = score_batch(latest_values(data, settings), settings)
+    reasons = render_reasons(scores["ReasonCode"])
+    for (ticker, df), reason in zip(data.items(), reasons):
+        score, signal, expected_reason = evaluate_stock(df, settings)
+        assert scores.at[ticker, "Score"] == score
+        assert scores.at[ticker, "Signal"] == signal
+        assert reason == expected_reason
+
+
+def test_score_batch_covers_every_signal():
+    settings = dict(ma_short=2, ma_long=3, rsi_window=2, macd_fast=2, macd_slow=3, macd_signal=2)
+    rng = np.random.default_rng(4)
+    data = {}
+    for k in range(200):
+        df = make_frame(rng, 30)
+        data[f"T{k}"] = baseline_indicators(df, settings)
+    latest = latest_values(data, settings)
+    # RSI の条件も両側に振れるよう、一部の銘柄は値を直接置き換える
+    rsi_col = f"RSI_{settings['rsi_window']}"
+    latest.iloc[::3, latest.columns.get_loc(rsi_col)] = 10.0
+    latest.iloc[1::3, latest.columns.get_loc(rsi_col)] = np.nan
+    scores = score_batch(latest, settings)
+    for ticker, row in latest.iterrows():
+        df = pd.DataFrame([row])
+        score, signal, reason = evaluate_stock(df, settings)
+        assert scores.at[ticker, "Score"] == score
+        assert scores.at[ticker, "Signal"] == signal
+        assert render_reasons([scores.at[ticker, "ReasonCode"]]) == [reason]
+    assert set(scores["Signal"]) <= set(SIGNAL_NAMES)
+
+
+def test_latest_values_skips_empty_frames(settings):
+    df = baseline_indicators(make_frame(np.random.default_rng(0), 10), settings)
+    latest = latest_values({"A": df, "EMPTY": df.iloc[:0]}, settings)
+    assert list(latest.index) == ["A"]
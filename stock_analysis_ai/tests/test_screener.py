@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from conftest import SETTINGS, make_frame
+from src.screener import ScreenerIndex, validate_expr
+
+
+def _index():
+    rng = np.random.default_rng(21)
+    index = ScreenerIndex("1d", SETTINGS["short"])
+    index.update({f"T{k}": make_frame(rng, 60) for k in range(20)})
+    return index
+
+
+def test_query_filters_with_allowed_expressions():
+    index = _index()
+    table = index.table
+    got = index.query("RSI < 60 and not GoldenCross or Signal == 'HOLD'")
+    expected = table[((table["RSI"] < 60) & ~table["GoldenCross"].astype(bool)) | (table["Signal"] == "HOLD")]
+    assert sorted(got.index) == sorted(expected.index)
+    assert list(got["Score"]) == sorted(got["Score"], reverse=True)
+    assert len(index.ranking("Close > -1e9 & MACDBullish | ~MACDBullish")) == len(index)
+
+
+@pytest.mark.parametrize("expr", [
+    "@table.to_csv('leak.csv')",
+    "Close.to_csv('leak.csv') > 0",
+    "Close[0] > 1",
+    "abs(Close) > 1",
+    "Close * 2 > 1",
+    "Foo > 1",
+    "__import__('os').system('true')",
+    "Close > ",
+])
+def test_query_rejects_unsafe_expressions(expr, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    index = _index()
+    with pytest.raises(ValueError):
+        index.ranking(expr)
+    with pytest.raises(ValueError):
+        validate_expr(expr)
+    assert not (tmp_path / "leak.csv").exists()
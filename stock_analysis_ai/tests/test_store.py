@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+
+from conftest import baseline_indicators, make_frame
+from src.indicators import indicator_columns
+from src.store import PriceStore
+
+
+def _ns(df):
+    """PriceStore の時刻はナノ秒単位なので、比較する側もそろえる"""
+    return df.set_axis(df.index.as_unit("ns"))
+
+
+def _frames():
+    rng = np.random.default_rng(8)
+    return {
+        "US": make_frame(rng, 50, freq="h", start="2024-03-01 14:30", tz="America/New_York"),
+        "JP": make_frame(rng, 30, freq="h", start="2024-03-01 00:00", tz="Asia/Tokyo"),
+        "NAIVE": make_frame(rng, 20),
+        "ONE": make_frame(rng, 1),
+    }
+
+
+def test_from_frames_round_trip():
+    frames = _frames()
+    store = PriceStore.from_frames(frames)
+    assert list(store) == list(frames)
+    assert len(store) == len(frames)
+    for ticker, df in frames.items():
+        pd.testing.assert_frame_equal(store[ticker], _ns(df), check_freq=False)
+    np.testing.assert_array_equal(store.lengths, [len(df) for df in frames.values()])
+
+
+def test_empty_frames_are_left_out():
+    frames = _frames()
+    frames["EMPTY"] = frames["ONE"].iloc[:0]
+    store = PriceStore.from_frames(frames)
+    assert "EMPTY" not in store
+
+
+def test_save_and_open_round_trip(tmp_path):
+    frames = _frames()
+    store = PriceStore.from_frames(frames)
+    store.set_column("Extra", np.arange(store.offsets[-1], dtype=np.float64))
+    opened = PriceStore.open(store.save(str(tmp_path / "store")))
+    assert opened.tickers == store.tickers
+    for ticker in frames:
+        pd.testing.assert_frame_equal(opened[ticker], store[ticker])
+
+
+def test_latest_returns_the_last_bar():
+    frames = _frames()
+    store = PriceStore.from_frames(frames)
+    latest = store.latest(["Close", "Missing"])
+    for ticker, df in frames.items():
+        assert latest.at[ticker, "Close"] == df["Close"].iloc[-1]
+    assert latest["Missing"].isna().all()
+
+
+def test_price_store_indicators_match_baseline(frames, settings, use_numba):
+    data = {t: df.dropna(subset=['Close']) for t, df in frames.items()}
+    store = PriceStore.from_frames(data).add_indicators(settings)
+    for ticker, df in data.items():
+        expected = baseline_indicators(df.copy(), settings)
+        for col in indicator_columns(settings).values():
+            np.testing.assert_array_equal(store[ticker][col].to_numpy(), expected[col].to_numpy())
@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+from multiprocessing import shared_memory
+
+from conftest import make_frame
+from src import sweep
+from src.backtest import run_backtest
+from src.sweep import build_grid, run_sweep
+
+
+def _close():
+    rng = np.random.default_rng(7)
+    frames = {
+        "A": make_frame(rng, 120),
+        "B": make_frame(rng, 90, start="2024-02-05"),
+        "C": make_frame(rng, 120, nan_ratio=0.1),
+    }
+    return pd.concat({t: df["Close"] for t, df in frames.items()}, axis=1, sort=True)
+
+
+def test_process_pool_matches_run_backtest():
+    close = _close()
+    combos = build_grid({"ma_short": [2, 5], "ma_long": [5, 10], "rsi_window": [3, 7],
+                         "macd_fast": [3], "macd_slow": [6, 9], "macd_signal": [2]})
+    ranking = run_sweep(close, combos, cost=0.002, workers=2, max_cached=2)
+    assert len(ranking) == len(combos)
+    assert list(ranking["Total Return"]) == sorted(ranking["Total Return"], reverse=True)
+
+    for row in ranking.to_dict("records"):
+        settings = {k: int(row[k]) for k in sweep.SETTING_KEYS}
+        _, portfolio, _ = run_backtest(close, settings, cost=0.002)
+        for metric, value in portfolio.items():
+            assert row[metric] == pytest.approx(value, nan_ok=True), (settings, metric)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_shared_memory_is_unlinked_when_a_worker_fails(workers, monkeypatch):
+    shared = []
+    share = sweep._share
+
+    def recording_share(arrays):
+        handles, specs = share(arrays)
+        shared.extend(name for name, _, _ in specs)
+        return handles, specs
+
+    monkeypatch.setattr(sweep, "_share", recording_share)
+    # 窓の長さが数値でない組み合わせはワーカーの中で失敗する
+    bad = dict(ma_short="x", ma_long=5, rsi_window=3, macd_fast=3, macd_slow=6, macd_signal=2)
+    with pytest.raises(Exception):
+        run_sweep(_close(), [bad], workers=workers)
+
+    assert len(shared) == 5
+    for name in shared:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=name)
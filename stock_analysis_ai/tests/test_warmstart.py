@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from conftest import SETTINGS, make_frame
+from src import warmstart
+from src.warmstart import TAIL_BARS, load_warm_start, load_warm_tails, request_key, save_warm_start
+
+TICKERS = ["7203.T", "AAPL"]
+SETTINGS_DEFAULT = SETTINGS["default"]
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(warmstart, "get_cache_dir", lambda: str(tmp_path))
+    return tmp_path
+
+
+def _rows():
+    return [
+        {"Ticker": "AAPL", "Name": "Apple", "Close": np.float64(190.5), "Score": np.int64(40),
+         "Signal": "BUY", "ReasonCode": np.int64(42)},
+        {"Ticker": "7203.T", "Name": "トヨタ自動車", "Close": 2800.0, "Score": 10, "Signal": "WAIT", "ReasonCode": 4},
+    ]
+
+
+def test_request_key_ignores_order():
+    key = request_key(TICKERS, "1d", "1y", SETTINGS_DEFAULT)
+    assert request_key(TICKERS[::-1], "1d", "1y", dict(reversed(list(SETTINGS_DEFAULT.items())))) == key
+
+
+@pytest.mark.parametrize("tickers, interval, period, settings", [
+    (TICKERS + ["NVDA"], "1d", "1y", SETTINGS_DEFAULT),
+    (TICKERS[:1], "1d", "1y", SETTINGS_DEFAULT),
+    (TICKERS, "1h", "1y", SETTINGS_DEFAULT),
+    (TICKERS, "1d", "6mo", SETTINGS_DEFAULT),
+    (TICKERS, "1d", "1y", {**SETTINGS_DEFAULT, "rsi_window": 7}),
+    (TICKERS, "1d", "1y", {**SETTINGS_DEFAULT, "ma_long": "25"}),
+])
+def test_mismatched_request_is_not_loaded(tickers, interval, period, settings):
+    rng = np.random.default_rng(24)
+    save_warm_start(_rows(), TICKERS, "1d", "1y", SETTINGS_DEFAULT,
+                    tails={t: make_frame(rng, 200) for t in TICKERS})
+    assert request_key(tickers, interval, period, settings) != request_key(TICKERS, "1d", "1y", SETTINGS_DEFAULT)
+    assert load_warm_start(tickers, interval, period, settings) is None
+    assert load_warm_tails(tickers, interval, period, settings) == {}
+    assert load_warm_start(TICKERS, "1d", "1y", SETTINGS_DEFAULT) is not None
+
+
+def test_round_trip(cache_dir):
+    rng = np.random.default_rng(25)
+    tails = {t: make_frame(rng, 200) for t in TICKERS}
+    save_warm_start(_rows(), TICKERS[::-1], "1d", "1y", SETTINGS_DEFAULT, tails=tails)
+
+    warm = load_warm_start(TICKERS, "1d", "1y", SETTINGS_DEFAULT)
+    assert warm["tails"] is True
+    assert [row["Ticker"] for row in warm["ranking"]] == ["AAPL", "7203.T"]
+    assert warm["ranking"][0]["Score"] == 40 and warm["ranking"][0]["Close"] == 190.5
+    assert warm["ranking"][1]["Name"] == "トヨタ自動車"
+    # 理由は保存時に文字にしておく（起動時に scorer を読み込まない）
+    assert warm["ranking"][0]["Reasons"] == "RSI Oversold (<30), MACD Bullish Cross, Golden Cross / Bullish Trend"
+
+    loaded = load_warm_tails(TICKERS, "1d", "1y", SETTINGS_DEFAULT)
+    for ticker, df in tails.items():
+        assert len(loaded[ticker]) == TAIL_BARS
+        assert loaded[ticker].equals(df.iloc[-TAIL_BARS:])
+    assert not [p for p in (cache_dir / "warmstart").iterdir() if p.name.endswith(".tmp")]
+
+
+def test_empty_ranking_is_not_saved():
+    save_warm_start([], TICKERS, "1d", "1y", SETTINGS_DEFAULT)
+    assert load_warm_start(TICKERS, "1d", "1y", SETTINGS_DEFAULT) is None